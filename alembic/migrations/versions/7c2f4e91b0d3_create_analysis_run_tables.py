@@ -0,0 +1,42 @@
+"""Create analysis run tables
+
+Revision ID: 7c2f4e91b0d3
+Revises: 418e9783e47d
+Create Date: 2026-10-18 16:02:11.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2f4e91b0d3'
+down_revision: Union[str, None] = '418e9783e47d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_run',
+    sa.Column('id', sa.UUID(), nullable=False, comment='The unique identifier assigned to an analysis run.'),
+    sa.Column('status', sa.String(length=32), nullable=False, comment='The status of the run: running, completed or failed.'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='The start date of the analysis run.'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, comment='The date the analysis run was last updated.'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_table('analysis_run_group',
+    sa.Column('run_id', sa.UUID(), nullable=False, comment='The analysis run that completed the group.'),
+    sa.Column('group_hash', sa.String(length=64), nullable=False, comment='SHA-256 of the sorted questions of the group.'),
+    sa.Column('question_count', sa.Integer(), nullable=False, comment='The number of questions in the group.'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='The date the group was stored.'),
+    sa.ForeignKeyConstraint(['run_id'], ['analysis_run.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('run_id', 'group_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analysis_run_group')
+    op.drop_table('analysis_run')
@@ -1,4 +1,6 @@
+import asyncio
 import json
+import time
 import httpx
 import re
 
@@ -6,19 +8,53 @@ OLLAMA_API_BASE = "http://localhost:11434"
 DEFAULT_MODEL = "llama3.1:latest"
 
 class OllamaLlama:
-    def __init__(self, base_url=OLLAMA_API_BASE):
+    def __init__(self, base_url=OLLAMA_API_BASE, model=DEFAULT_MODEL, cache=None):
         self.client = httpx.Client(timeout=60.0)  # Increase timeout to 60 seconds
         self.base_url = base_url
+        self.model = model
+        # Optional ResponseCache consulted before sending a prompt
+        self.cache = cache
+
+    def _cache_key(self, prompt, cache_key):
+        return cache_key or self.cache.prompt_key(self.model, prompt)
+
+    def _cached(self, key, parse):
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        try:
+            return parse(cached)
+        except ValueError:
+            # Cached before responses were validated, ask the model again
+            self.cache.delete(key)
+            return None
+
+    def chat(self, prompt, cache_key=None, parse=None):
+        """
+        :param parse: Turns the response text into the returned result and
+            raises ValueError when it is unusable; only responses it accepts
+            are cached
+        """
+        parse = parse or (lambda content: content)
+        if self.cache is not None:
+            key = self._cache_key(prompt, cache_key)
+            result = self._cached(key, parse)
+            if result is not None:
+                return result
 
-    def chat(self, prompt):
         url = f"{self.base_url}/v1/chat/completions"
         data = {
-            "model": "llama3.1:latest",
+            "model": self.model,
             "messages": [{"role": "user", "content": prompt}]
         }
         response = self.client.post(url, json=data, timeout=60.0)  # Specify timeout here as well
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        content = response.json()["choices"][0]["message"]["content"]
+        result = parse(content)
+
+        if self.cache is not None:
+            self.cache.set(key, self.model, content)
+        return result
 
     def parse_json_response(self, response):
         try:
@@ -33,3 +69,90 @@ class OllamaLlama:
                     pass
             # If no valid JSON found, return the original response
             return response
+
+    def parse_json_array_response(self, response, key="group_id"):
+        """
+        Collect the JSON objects of a batched response, keyed by ``str(obj[key])``.
+
+        Every top-level object is decoded on its own, so one malformed entry
+        (or prose around the array) does not lose the others.
+        """
+        decoder = json.JSONDecoder()
+        results = {}
+        position = response.find('{')
+        while position != -1:
+            try:
+                obj, end = decoder.raw_decode(response, position)
+            except json.JSONDecodeError:
+                position = response.find('{', position + 1)
+                continue
+            if isinstance(obj, dict):
+                if key in obj:
+                    results[str(obj[key])] = obj
+                else:
+                    # Arrays wrapped in an object, e.g. {"analyses": [...]}
+                    for value in obj.values():
+                        if isinstance(value, list):
+                            for item in value:
+                                if isinstance(item, dict) and key in item:
+                                    results[str(item[key])] = item
+            position = response.find('{', end)
+        return results
+
+
+class AsyncOllamaLlama(OllamaLlama):
+    """
+    Non-blocking variant of OllamaLlama on a pooled httpx.AsyncClient.
+
+    Request starts are spaced to at most ``max_requests_per_second`` against
+    the single host this client talks to.
+    """
+
+    def __init__(self, base_url=OLLAMA_API_BASE, model=DEFAULT_MODEL, cache=None, max_connections=8,
+                 max_requests_per_second=None):
+        self.client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.base_url = base_url
+        self.model = model
+        self.cache = cache
+        self.min_interval = 1.0 / max_requests_per_second if max_requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._rate_lock = asyncio.Lock()
+
+    async def _wait_for_rate_limit(self):
+        if not self.min_interval:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def chat(self, prompt, cache_key=None, parse=None):
+        parse = parse or (lambda content: content)
+        if self.cache is not None:
+            key = self._cache_key(prompt, cache_key)
+            result = self._cached(key, parse)
+            if result is not None:
+                return result
+
+        await self._wait_for_rate_limit()
+        url = f"{self.base_url}/v1/chat/completions"
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        response = await self.client.post(url, json=data)
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        result = parse(content)
+
+        if self.cache is not None:
+            self.cache.set(key, self.model, content)
+        return result
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,87 @@
+"""
+Batched writer for QuestionAnalysis rows
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from models.sqlalchemy.analysis_run import AnalysisRunGroup
+from models.sqlalchemy.question_analyzer import QuestionAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionAnalysisWriter:
+    """
+    Accumulates QuestionAnalysis rows and writes them with a single multi-row
+    INSERT and one commit per flush instead of one round-trip per question.
+
+    :param flush_size: Flush automatically once this many rows are buffered;
+        ``None`` leaves flushing to the caller (e.g. once per group)
+    :param checkpoint: Optional RunCheckpoint; groups added through
+        ``add_group`` are recorded as completed in the same transaction
+    :param table: Table to insert into, QuestionAnalysis by default
+    """
+
+    def __init__(self, db_session, flush_size: Optional[int] = 500, checkpoint=None, table=None):
+        self.db_session = db_session
+        self.table = table if table is not None else QuestionAnalysis.__table__
+        self.flush_size = flush_size
+        self.checkpoint = checkpoint
+        self.rows: List[Dict[str, Any]] = []
+        self.group_rows: List[Dict[str, Any]] = []
+        self.written = 0
+
+    def _buffer(self, question: str, analysis: Dict[str, Any]):
+        self.rows.append({
+            "question_text": question,
+            "category": analysis['category'],
+            "expertise_rating": analysis['expertise_level'],
+            "knowledge_gaps": analysis['knowledge_gaps'],
+            "recommendations": analysis['recommendations'],
+        })
+
+    def _flush_if_full(self):
+        if self.flush_size and len(self.rows) >= self.flush_size:
+            self.flush()
+
+    def add(self, question: str, analysis: Dict[str, Any]):
+        self._buffer(question, analysis)
+        self._flush_if_full()
+
+    def add_group(self, questions: List[str], analysis: Dict[str, Any]):
+        # A group is never split across flushes so its checkpoint stays accurate
+        for question in questions:
+            self._buffer(question, analysis)
+        if self.checkpoint is not None:
+            group_row = self.checkpoint.group_row(questions)
+            pending = {row["group_hash"] for row in self.group_rows}
+            if group_row["group_hash"] not in self.checkpoint.completed | pending:
+                self.group_rows.append(group_row)
+        self._flush_if_full()
+
+    def flush(self) -> int:
+        """Write all buffered rows in one transaction and return how many were written."""
+        if not self.rows and not self.group_rows:
+            return 0
+        rows, self.rows = self.rows, []
+        group_rows, self.group_rows = self.group_rows, []
+        try:
+            if rows:
+                self.db_session.execute(insert(self.table), rows)
+            if group_rows:
+                self.db_session.execute(insert(AnalysisRunGroup), group_rows)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            # Keep the rows so a later flush can retry them
+            self.rows = rows + self.rows
+            self.group_rows = group_rows + self.group_rows
+            raise
+        if self.checkpoint is not None:
+            self.checkpoint.completed.update(row["group_hash"] for row in group_rows)
+        self.written += len(rows)
+        logger.info(f"Stored {len(rows)} question analyses")
+        return len(rows)
@@ -0,0 +1,191 @@
+"""
+Approximate nearest-neighbour grouping for very large question sets
+"""
+
+import logging
+from typing import Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import AgglomerativeClustering
+
+try:
+    import hnswlib
+except ImportError:  # Optional: the IVF index below needs nothing beyond NumPy
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+# Oversized components above this many questions are split by leader grouping
+# instead, as average linkage needs O(n^2) memory
+AGGLOMERATIVE_LIMIT = 5000
+
+
+class IVFIndex:
+    """
+    Inverted-file index over normalized vectors.
+
+    A k-means coarse quantizer splits the vectors into ``n_lists`` cells. The
+    neighbours of every vector in a cell are searched among the vectors of
+    the ``n_probe`` cells whose centroids are closest to that cell's centroid,
+    so each search block is a dense matrix product of bounded size.
+    """
+
+    def __init__(self, n_lists: int = None, n_probe: int = 8, n_iter: int = 10, seed: int = 42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+
+    def _kmeans(self, vectors: np.ndarray, n_lists: int) -> Tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cell in range(n_lists):
+                members = vectors[assignments == cell]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[cell] = centroid / (np.linalg.norm(centroid) or 1)
+        return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+    def knn(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: ``(indices, distances)`` of the ``k`` nearest vectors to each
+            vector (itself included), by cosine distance
+        """
+        n = len(vectors)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        n_probe = min(self.n_probe, n_lists)
+        centroids, assignments = self._kmeans(vectors, n_lists)
+        probes = np.argsort(-(centroids @ centroids.T), axis=1)[:, :n_probe]
+        members = [np.flatnonzero(assignments == cell) for cell in range(n_lists)]
+
+        indices = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf, dtype=np.float32)
+        for cell in range(n_lists):
+            queries = members[cell]
+            if not len(queries):
+                continue
+            candidates = np.concatenate([members[probe] for probe in probes[cell]])
+            similarities = vectors[queries] @ vectors[candidates].T
+            top = min(k, len(candidates))
+            nearest = np.argpartition(-similarities, top - 1, axis=1)[:, :top]
+            nearest_similarities = np.take_along_axis(similarities, nearest, axis=1)
+            order = np.argsort(-nearest_similarities, axis=1)
+            indices[queries, :top] = candidates[np.take_along_axis(nearest, order, axis=1)]
+            distances[queries, :top] = 1 - np.take_along_axis(nearest_similarities, order, axis=1)
+        return indices, distances
+
+
+class HNSWIndex:
+    """HNSW graph index backed by hnswlib."""
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for the HNSW grouping index: pip install hnswlib")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+    def knn(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        index = hnswlib.Index(space='cosine', dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), ef_construction=self.ef_construction, M=self.m)
+        index.add_items(vectors, np.arange(len(vectors)))
+        index.set_ef(max(self.ef_search, k))
+        k = min(k, len(vectors))
+        indices, distances = index.knn_query(vectors, k=k)
+        return indices.astype(np.int64), distances.astype(np.float32)
+
+
+def make_index(backend: str = "auto"):
+    if backend == "hnsw" or (backend == "auto" and hnswlib is not None):
+        return HNSWIndex()
+    if backend in ("ivf", "auto"):
+        return IVFIndex()
+    raise ValueError(f"Unknown ANN index backend: {backend}")
+
+
+def group_embeddings(embeddings: np.ndarray, threshold: float, k: int = 10, method: str = "components",
+                     index=None, max_component_size: int = 16) -> np.ndarray:
+    """
+    Group normalized embeddings through their k-nearest-neighbour graph.
+
+    Only neighbour pairs closer than ``threshold`` (cosine distance) are linked.
+
+    :param method: ``"components"`` uses the connected components of the
+        thresholded graph; ``"leader"`` lets each ungrouped vector join its
+        closest linked leader or become one, which gives tighter but smaller groups
+    :param max_component_size: Components larger than this may chain distinct
+        topics through intermediate questions and are split by average-linkage
+        clustering of their members
+    :return: Group label per embedding
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    index = index or make_index()
+    indices, distances = index.knn(embeddings, k + 1)
+    linked = (distances < threshold) & (indices >= 0)
+
+    if method == "components":
+        rows = np.repeat(np.arange(n), indices.shape[1])[linked.ravel()]
+        cols = indices.ravel()[linked.ravel()]
+        graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        return _split_components(embeddings, labels, threshold, max_component_size, indices, linked)
+
+    if method == "leader":
+        return _leader_labels(indices, linked)
+
+    raise ValueError(f"Unknown ANN grouping method: {method}")
+
+
+def _leader_labels(indices: np.ndarray, linked: np.ndarray) -> np.ndarray:
+    n = len(indices)
+    labels = np.full(n, -1, dtype=np.int64)
+    is_leader = np.zeros(n, dtype=bool)
+    next_label = 0
+    for i in range(n):
+        if labels[i] >= 0:
+            continue
+        # Neighbours are sorted by distance, so the first leader is the closest
+        neighbours = indices[i][linked[i]]
+        leaders = neighbours[is_leader[neighbours]]
+        if len(leaders):
+            labels[i] = labels[leaders[0]]
+            continue
+        is_leader[i] = True
+        labels[i] = next_label
+        unassigned = neighbours[labels[neighbours] < 0]
+        labels[unassigned] = next_label
+        next_label += 1
+    return labels
+
+
+def _split_components(embeddings: np.ndarray, labels: np.ndarray, threshold: float, max_size: int,
+                      indices: np.ndarray, linked: np.ndarray) -> np.ndarray:
+    labels = labels.astype(np.int64)
+    sizes = np.bincount(labels)
+    next_label = len(sizes)
+    for label in np.flatnonzero(sizes > max_size):
+        members = np.flatnonzero(labels == label)
+        if len(members) <= AGGLOMERATIVE_LIMIT:
+            sub_labels = AgglomerativeClustering(
+                n_clusters=None, distance_threshold=threshold, metric='cosine', linkage='average'
+            ).fit(embeddings[members]).labels_
+        else:
+            # Restrict the neighbour graph to the component's members
+            local = np.full(len(labels), -1, dtype=np.int64)
+            local[members] = np.arange(len(members))
+            sub_indices = local[np.maximum(indices[members], 0)]
+            sub_labels = _leader_labels(sub_indices, linked[members] & (sub_indices >= 0))
+        logger.debug(f"Split a component of {len(members)} questions into {sub_labels.max() + 1} groups")
+
+        labels[members] = np.where(sub_labels == 0, label, next_label + sub_labels - 1)
+        next_label += int(sub_labels.max())
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64)
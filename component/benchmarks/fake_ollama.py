@@ -0,0 +1,89 @@
+"""
+Local stand-in for Ollama's OpenAI-compatible chat endpoint
+
+Answers POST /v1/chat/completions after a configurable delay with a canned
+analysis, so the pipeline can be measured without a model server.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANALYSIS = {
+    "category": "Benchmark Category",
+    "expertise_level": 3,
+    "knowledge_gaps": ["Synthetic gap one", "Synthetic gap two"],
+    "recommendations": ["Synthetic recommendation one", "Synthetic recommendation two"],
+}
+
+_GROUP_LINE = re.compile(r"^\s*Group (\S+): ", re.MULTILINE)
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server answering chat completions in a background thread.
+
+    :param latency: Seconds to wait before answering each request
+    :param jitter: Extra uniformly random delay of up to this many seconds
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != "/v1/chat/completions":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][-1]["content"]
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+
+                payload = json.dumps({
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": server.answer(prompt)}}],
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        # Batched prompts list their groups as "Group <id>: [...]"
+        group_ids = _GROUP_LINE.findall(prompt)
+        if group_ids:
+            return json.dumps([dict(ANALYSIS, group_id=group_id) for group_id in group_ids])
+        return json.dumps(ANALYSIS)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,148 @@
+"""
+Compare the ANN and incremental grouping engines against agglomerative clustering
+
+Runs on synthetic clustered embeddings so it needs neither a sentence
+transformer model nor a question export. The "overlapping" dataset adds
+questions between neighbouring topics, which single-linkage grouping chains
+into oversized groups:
+
+    python component/benchmarks/grouping_benchmark.py --sizes 1000 5000 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.metrics import adjusted_rand_score
+
+# Add the component directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ann_grouping import HNSWIndex, IVFIndex, group_embeddings, hnswlib
+from centroid_store import CentroidStore
+
+
+def synthetic_embeddings(n, dim=384, n_topics=None, noise=0.6, seed=0):
+    """Normalized vectors scattered around ``n_topics`` random topic directions."""
+    rng = np.random.default_rng(seed)
+    n_topics = n_topics or max(2, n // 20)
+    topics = rng.standard_normal((n_topics, dim))
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    truth = rng.integers(0, n_topics, n)
+    vectors = topics[truth] + noise * rng.standard_normal((n, dim)) / np.sqrt(dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), truth
+
+
+def overlapping_embeddings(n, dim=384, n_topics=None, bridges=0.3, noise=0.6, seed=0):
+    """Like ``synthetic_embeddings``, but a ``bridges`` share of the vectors lies between a topic and the next."""
+    rng = np.random.default_rng(seed)
+    n_topics = n_topics or max(2, n // 20)
+    topics = rng.standard_normal((n_topics, dim))
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    truth = rng.integers(0, n_topics, n)
+    following = (truth + 1) % n_topics
+    weights = np.where(rng.random(n) < bridges, rng.random(n), 0.0)[:, None]
+    centers = (1 - weights) * topics[truth] + weights * topics[following]
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    truth = np.where(weights[:, 0] > 0.5, following, truth)
+    vectors = centers + noise * rng.standard_normal((n, dim)) / np.sqrt(dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), truth
+
+
+DATASETS = {"separated": synthetic_embeddings, "overlapping": overlapping_embeddings}
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def group_incrementally(embeddings, threshold, chunk_size=1000):
+    """Labels from the centroid store, fed ``chunk_size`` questions at a time."""
+    with tempfile.TemporaryDirectory() as path:
+        store = CentroidStore(path, threshold=threshold)
+        questions = [str(i) for i in range(len(embeddings))]
+        for start in range(0, len(embeddings), chunk_size):
+            store.assign(questions[start:start + chunk_size], embeddings[start:start + chunk_size])
+            if store.consolidation_due:
+                store.consolidate()
+
+    labels = np.zeros(len(embeddings), dtype=np.int64)
+    for label, (_, members) in enumerate(store.groups.items()):
+        labels[[int(question) for question in members]] = label
+    return labels
+
+
+def run(sizes, threshold, agglomerative_limit, datasets=tuple(DATASETS)):
+    engines = {"ivf": IVFIndex}
+    if hnswlib is not None:
+        engines["hnsw"] = HNSWIndex
+
+    report = []
+    for dataset, n in ((dataset, n) for dataset in datasets for n in sizes):
+        embeddings, truth = DATASETS[dataset](n)
+        row = {"dataset": dataset, "questions": n}
+
+        reference = None
+        if n <= agglomerative_limit:
+            clustering, seconds = timed(lambda: AgglomerativeClustering(
+                n_clusters=None, distance_threshold=threshold, metric='cosine', linkage='average'
+            ).fit(embeddings))
+            reference = clustering.labels_
+            row["agglomerative"] = {
+                "seconds": round(seconds, 3),
+                "groups": int(reference.max() + 1),
+                "ari_vs_truth": round(adjusted_rand_score(truth, reference), 4),
+            }
+
+        for name, index_cls in engines.items():
+            for method in ("leader", "components"):
+                labels, seconds = timed(lambda: group_embeddings(
+                    embeddings, threshold, method=method, index=index_cls()
+                ))
+                result = {
+                    "seconds": round(seconds, 3),
+                    "groups": int(labels.max() + 1),
+                    "ari_vs_truth": round(adjusted_rand_score(truth, labels), 4),
+                }
+                if reference is not None:
+                    result["ari_vs_agglomerative"] = round(adjusted_rand_score(reference, labels), 4)
+                row[f"{name}-{method}"] = result
+
+        labels, seconds = timed(lambda: group_incrementally(embeddings, threshold))
+        result = {
+            "seconds": round(seconds, 3),
+            "groups": int(labels.max() + 1),
+            "ari_vs_truth": round(adjusted_rand_score(truth, labels), 4),
+        }
+        if reference is not None:
+            result["ari_vs_agglomerative"] = round(adjusted_rand_score(reference, labels), 4)
+        row["incremental"] = result
+
+        print(json.dumps(row, indent=2))
+        report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--agglomerative-limit", type=int, default=20000,
+                        help="Skip agglomerative clustering above this many questions (O(n^2) memory)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.threshold, args.agglomerative_limit, args.datasets)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
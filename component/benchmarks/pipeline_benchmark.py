@@ -0,0 +1,213 @@
+"""
+Stage-by-stage benchmark of the question analysis pipeline
+
+Measures extraction, embedding, clustering, LLM analysis and storage on
+synthetic question sets against a local fake Ollama server and an in-memory
+SQLite copy of the question_analysis table, then emits a JSON report:
+
+    python component/benchmarks/pipeline_benchmark.py --sizes 1000 10000 100000 --output report.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import ARRAY, JSON, MetaData, Uuid, create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import sessionmaker
+
+# Add the component directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analysis_writer import QuestionAnalysisWriter
+from ann_grouping import group_embeddings
+from fake_ollama import ANALYSIS, FakeOllamaServer
+from main import AsyncQuestionAnalyzer, QuestionAnalyzer
+from models.sqlalchemy.question_analyzer import QuestionAnalysis
+from OllamaLlama import AsyncOllamaLlama, OllamaLlama
+from questions_extractor import iter_user_questions
+
+TOPICS = ["Python", "Docker", "Git", "Kubernetes", "SQL", "React", "Rust", "Linux", "AWS", "pandas"]
+ACTIONS = ["install", "configure", "debug", "optimize", "test", "deploy", "profile", "upgrade"]
+OBJECTS = ["a list", "a container", "a branch", "a query", "a component", "a service", "a module", "a cluster"]
+TEMPLATES = [
+    "How do I {action} {object} in {topic}?",
+    "What is the best way to {action} {object} with {topic}?",
+    "Why does my {topic} setup fail when I {action} {object}?",
+]
+
+
+def synthetic_questions(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(action=rng.choice(ACTIONS), object=rng.choice(OBJECTS),
+                                     topic=rng.choice(TOPICS)) + f" (case {i})"
+        for i in range(n)
+    ]
+
+
+def write_conversations(path, questions, per_conversation=10):
+    """Write questions as a ChatGPT export with assistant replies in between."""
+    with open(path, "w") as file:
+        file.write("[")
+        for start in range(0, len(questions), per_conversation):
+            mapping = {}
+            for i, question in enumerate(questions[start:start + per_conversation]):
+                mapping[f"u{i}"] = {"message": {"author": {"role": "user"}, "content": {"parts": [question]}}}
+                mapping[f"a{i}"] = {"message": {"author": {"role": "assistant"},
+                                                "content": {"parts": ["An answer. " * 20]}}}
+            if start:
+                file.write(",")
+            json.dump({"title": f"Conversation {start}", "mapping": mapping}, file)
+        file.write("]")
+
+
+def hashed_embeddings(questions, dim=384):
+    """Deterministic stand-in vectors for runs without a sentence transformer model."""
+    vectors = np.empty((len(questions), dim), dtype=np.float32)
+    for i, question in enumerate(questions):
+        seed = int.from_bytes(hashlib.sha256(question.split(" (case")[0].encode()).digest()[:8], "little")
+        vectors[i] = np.random.default_rng(seed).standard_normal(dim)
+    vectors += 0.3 * np.random.default_rng(0).standard_normal(vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def sqlite_session():
+    """In-memory SQLite copy of question_analysis with ARRAY/UUID columns swapped for portable types."""
+    metadata = MetaData()
+    table = QuestionAnalysis.__table__.to_metadata(metadata)
+    for column in table.columns:
+        if isinstance(column.type, ARRAY):
+            column.type = JSON()
+        elif isinstance(column.type, UUID):
+            column.type = Uuid()
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    return sessionmaker(bind=engine)(), table
+
+
+def stage(report, name, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    report[name] = {"seconds": round(seconds, 4), "items": count,
+                    "items_per_second": round(count / seconds, 2) if seconds else None}
+    print(f"  {name:<11} {seconds:9.3f}s  ({count} items)")
+    return result
+
+
+def run_size(n, args, server, model):
+    print(f"\n{n} questions")
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "conversations.json")
+        write_conversations(path, synthetic_questions(n))
+        questions = stage(report, "extraction", n, lambda: list(iter_user_questions(path)))
+
+    if model is None:
+        embeddings = stage(report, "embedding", n, lambda: hashed_embeddings(questions))
+    else:
+        embeddings = stage(report, "embedding", n, lambda: model.encode(
+            questions, normalize_embeddings=True, batch_size=args.batch_size))
+
+    if n <= args.agglomerative_limit:
+        from sklearn.cluster import AgglomerativeClustering
+        labels = stage(report, "clustering", n, lambda: AgglomerativeClustering(
+            n_clusters=None, distance_threshold=args.threshold, metric='cosine', linkage='average'
+        ).fit(embeddings).labels_)
+        report["clustering"]["engine"] = "agglomerative"
+    else:
+        labels = stage(report, "clustering", n, lambda: group_embeddings(embeddings, args.threshold))
+        report["clustering"]["engine"] = "ann"
+
+    grouped_questions = {}
+    for question, label in zip(questions, labels):
+        grouped_questions.setdefault(int(label), []).append(question)
+    report["clustering"]["groups"] = len(grouped_questions)
+
+    sample = dict(list(grouped_questions.items())[:args.llm_groups])
+    if args.concurrency > 1:
+        async def analyze():
+            adapter = AsyncOllamaLlama(base_url=server.base_url, max_connections=args.concurrency)
+            try:
+                analyzer = AsyncQuestionAnalyzer(adapter, None, concurrency=args.concurrency)
+                return await analyzer.analyze_groups(sample, batch_small_groups=args.batch_small_groups)
+            finally:
+                await adapter.aclose()
+        requests_before = server.requests
+        stage(report, "llm", len(sample), lambda: asyncio.run(analyze()))
+    else:
+        analyzer = QuestionAnalyzer(OllamaLlama(base_url=server.base_url), None)
+        requests_before = server.requests
+        if args.batch_small_groups:
+            stage(report, "llm", len(sample), lambda: analyzer.analyze_groups_batched(sample))
+        else:
+            stage(report, "llm", len(sample), lambda: [
+                analyzer.analyze_questions_and_recommend_concepts(group) for group in sample.values()
+            ])
+    report["llm"]["requests"] = server.requests - requests_before
+
+    session, table = sqlite_session()
+    writer = QuestionAnalysisWriter(session, flush_size=args.flush_size, table=table)
+
+    def store():
+        for group in grouped_questions.values():
+            writer.add_group(group, ANALYSIS)
+        writer.flush()
+
+    stage(report, "storage", n, store)
+    session.close()
+    return {"questions": n, "stages": report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence transformer used for embedding")
+    parser.add_argument("--synthetic-embeddings", action="store_true",
+                        help="Use hashed random vectors instead of loading the sentence transformer")
+    parser.add_argument("--batch-size", type=int, default=64, help="Embedding batch size")
+    parser.add_argument("--agglomerative-limit", type=int, default=20000,
+                        help="Use the ANN grouping engine above this many questions")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake Ollama response delay in seconds")
+    parser.add_argument("--llm-groups", type=int, default=200, help="Number of groups sent to the fake Ollama")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-small-groups", action="store_true")
+    parser.add_argument("--flush-size", type=int, default=500)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    # Per-request and per-flush logs would drown the stage timings
+    for name in ("analysis_writer", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    model = None
+    if not args.synthetic_embeddings:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+
+    with FakeOllamaServer(latency=args.llm_latency) as server:
+        results = [run_size(n, args, server, model) for n in args.sizes]
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("sizes", "output")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
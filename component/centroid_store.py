@@ -0,0 +1,313 @@
+"""
+Persisted cluster centroids for incremental question grouping
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CentroidStore:
+    """
+    Keeps one running centroid per question group on disk and assigns new
+    embeddings to the closest group (or opens a new one).
+
+    Candidate centroids are looked up in ``n_tables`` random-hyperplane LSH
+    tables, probing the exact bucket plus every bucket at Hamming distance one
+    in each, so assigning a question only compares it with the centroids that
+    share a probed bucket. A probe that misses a close group opens a new one.
+
+    Before ``assign`` returns, the groups it touched are merged with the close
+    groups among their own LSH candidates. The full pass that also catches
+    groups the probes missed is ``consolidate``, which the caller runs between
+    chunks once ``consolidation_due``.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.7, n_planes: int = 12, n_tables: int = 8,
+                 consolidate_every: int = 1000, seed: int = 42):
+        self.path = path
+        self.threshold = threshold
+        self.n_planes = n_planes
+        self.n_tables = n_tables
+        self.consolidate_every = consolidate_every
+        self.seed = seed
+
+        self.dim: Optional[int] = None
+        self.sums = np.zeros((0, 0), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self.groups: Dict[int, List[str]] = {}
+        self.known_questions = set()
+
+        self._planes: Optional[np.ndarray] = None
+        self._buckets: List[Dict[int, List[int]]] = []
+        self._signatures: Dict[int, Tuple[int, ...]] = {}
+        self._since_consolidation = 0
+        self._lock = threading.RLock()
+
+        self.load()
+
+    # Persistence
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+
+        with open(meta_path, "r") as file:
+            meta = json.load(file)
+        with open(self._file("groups.json"), "r") as file:
+            groups = json.load(file)
+
+        with self._lock:
+            self.dim = meta["dim"]
+            self._since_consolidation = meta.get("since_consolidation", 0)
+            self.sums = np.load(self._file("centroids.npy"))
+            self.counts = np.load(self._file("counts.npy"))
+            self._size = len(self.counts)
+            self.groups = {int(label): members for label, members in groups.items()}
+            self.known_questions = {q for members in self.groups.values() for q in members}
+            self._init_planes()
+            self._rebuild_buckets()
+
+        logger.info(f"Loaded {len(self.groups)} question groups from {self.path}")
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            np.save(self._file("centroids.npy"), self.sums[:self._size])
+            np.save(self._file("counts.npy"), self.counts[:self._size])
+            with open(self._file("groups.json"), "w") as file:
+                json.dump({str(label): members for label, members in self.groups.items()}, file)
+            with open(self._file("meta.json"), "w") as file:
+                json.dump({
+                    "dim": self.dim,
+                    "threshold": self.threshold,
+                    "since_consolidation": self._since_consolidation,
+                }, file)
+
+    # LSH index over centroids
+
+    def _init_planes(self):
+        rng = np.random.default_rng(self.seed)
+        self._planes = rng.standard_normal((self.n_tables * self.n_planes, self.dim)).astype(np.float32)
+        self._buckets = [{} for _ in range(self.n_tables)]
+
+    def _signature(self, vector: np.ndarray) -> Tuple[int, ...]:
+        bits = ((self._planes @ vector) > 0).reshape(self.n_tables, self.n_planes)
+        return tuple(int(signature) for signature in bits.dot(1 << np.arange(self.n_planes, dtype=np.int64)))
+
+    def _centroid(self, row: int) -> np.ndarray:
+        vector = self.sums[row]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _index(self, row: int):
+        signature = self._signature(self._centroid(row))
+        previous = self._signatures.get(row)
+        if previous == signature:
+            return
+        if previous is not None:
+            self._unindex(row)
+        for buckets, table_signature in zip(self._buckets, signature):
+            buckets.setdefault(table_signature, []).append(row)
+        self._signatures[row] = signature
+
+    def _unindex(self, row: int):
+        previous = self._signatures.pop(row, None)
+        if previous is not None:
+            for buckets, table_signature in zip(self._buckets, previous):
+                buckets[table_signature].remove(row)
+
+    def _rebuild_buckets(self):
+        self._buckets = [{} for _ in range(self.n_tables)]
+        self._signatures = {}
+        for row in np.flatnonzero(self.counts):
+            self._index(int(row))
+
+    def _candidates(self, vector: np.ndarray) -> List[int]:
+        candidates = set()
+        for buckets, signature in zip(self._buckets, self._signature(vector)):
+            candidates.update(buckets.get(signature, []))
+            for bit in range(self.n_planes):
+                candidates.update(buckets.get(signature ^ (1 << bit), []))
+        return list(candidates)
+
+    def _closest(self, vector: np.ndarray, rows) -> Optional[int]:
+        """The closest of ``rows`` if it is within the threshold."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return None
+        centroids = self.sums[rows]
+        norms = np.linalg.norm(centroids, axis=1)
+        distances = 1 - (centroids @ vector) / np.where(norms == 0, 1, norms)
+        best = int(np.argmin(distances))
+        return int(rows[best]) if distances[best] < self.threshold else None
+
+    # Assignment
+
+    def _open_group(self) -> int:
+        row = self._size
+        if row == len(self.counts):
+            # Grow geometrically so opening many groups stays amortized O(1)
+            capacity = max(16, 2 * row)
+            sums = np.zeros((capacity, self.dim), dtype=np.float32)
+            sums[:row] = self.sums[:row]
+            counts = np.zeros(capacity, dtype=np.int64)
+            counts[:row] = self.counts[:row]
+            self.sums, self.counts = sums, counts
+        self._size += 1
+        self.groups[row] = []
+        return row
+
+    def assign(self, questions: List[str], embeddings: np.ndarray) -> Dict[int, List[str]]:
+        """
+        Assign normalized question embeddings to the stored groups.
+
+        :return: The newly assigned questions, keyed by persistent group label
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        assigned: Dict[int, List[str]] = {}
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self.sums = np.zeros((0, self.dim), dtype=np.float32)
+                self._init_planes()
+
+            for question, vector in zip(questions, embeddings):
+                if question in self.known_questions:
+                    continue
+
+                row = self._closest(vector, self._candidates(vector))
+                if row is None:
+                    row = self._open_group()
+
+                self.sums[row] += vector
+                self.counts[row] += 1
+                self.groups[row].append(question)
+                self.known_questions.add(question)
+                self._index(row)
+                assigned.setdefault(row, []).append(question)
+
+            self._since_consolidation += sum(len(group) for group in assigned.values())
+
+            # Merge before returning so no fragment goes out as its own group
+            merged_into = self._merge_touched(list(assigned))
+
+            result: Dict[int, List[str]] = {}
+            for row, members in assigned.items():
+                while row in merged_into:
+                    row = merged_into[row]
+                result.setdefault(row, []).extend(members)
+
+        return result
+
+    # Re-consolidation
+
+    @property
+    def consolidation_due(self) -> bool:
+        """Whether ``consolidate_every`` questions were assigned since the last full pass."""
+        return self._since_consolidation >= self.consolidate_every
+
+    def _merge_touched(self, rows: List[int]) -> Dict[int, int]:
+        """
+        Merge each of ``rows`` with the groups among its LSH candidates that
+        are within the threshold.
+
+        :return: The group each merged group was merged into
+        """
+        merged_into: Dict[int, int] = {}
+        # Larger groups absorb smaller ones
+        for row in sorted(rows, key=lambda r: -self.counts[r]):
+            while row in merged_into:
+                row = merged_into[row]
+            centroid = self._centroid(row)
+            candidates = np.asarray([
+                candidate for candidate in self._candidates(centroid)
+                if candidate != row and candidate not in merged_into
+            ], dtype=np.int64)
+            if not len(candidates):
+                continue
+            centroids = self.sums[candidates]
+            norms = np.linalg.norm(centroids, axis=1)
+            close = candidates[1 - (centroids @ centroid) / np.where(norms == 0, 1, norms) < self.threshold]
+            if not len(close):
+                continue
+            target = max([row] + close.tolist(), key=lambda r: self.counts[r])
+            for source in [row] + close.tolist():
+                if source != target:
+                    self._merge(target, source)
+                    merged_into[source] = target
+            self._index(target)
+        return merged_into
+
+    def consolidate(self, block_size: int = 1024) -> int:
+        """
+        Merge groups whose centroids ended up within the threshold of each other.
+
+        :return: Number of merged groups
+        """
+        with self._lock:
+            merges = len(self._consolidate(block_size=block_size))
+
+        if merges:
+            logger.info(f"Re-consolidation merged {merges} question groups")
+        return merges
+
+    def _consolidate(self, block_size: int = 1024) -> Dict[int, int]:
+        """
+        Merge all groups within the threshold of each other.
+
+        :return: The group each merged group was merged into
+        """
+        self._since_consolidation = 0
+        live = np.flatnonzero(self.counts[:self._size])
+        if len(live) < 2:
+            return {}
+
+        # Larger groups absorb smaller ones
+        queries = live[np.argsort(-self.counts[live], kind="stable")]
+        centroids = self.sums[live]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids = centroids / np.where(norms == 0, 1, norms)
+        position = {int(row): i for i, row in enumerate(live)}
+
+        merged_into: Dict[int, int] = {}
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            similarities = centroids[[position[int(row)] for row in block]] @ centroids.T
+            for row, row_similarities in zip(block, similarities):
+                row = int(row)
+                if row in merged_into:
+                    continue
+                close = [
+                    int(live[j]) for j in np.flatnonzero(1 - row_similarities < self.threshold)
+                    if int(live[j]) != row and int(live[j]) not in merged_into
+                ]
+                if not close:
+                    continue
+                target = max([row] + close, key=lambda r: self.counts[r])
+                for source in [row] + close:
+                    if source != target:
+                        self._merge(target, source)
+                        merged_into[source] = target
+                self._index(target)
+        return merged_into
+
+    def _merge(self, target: int, source: int):
+        self.sums[target] += self.sums[source]
+        self.counts[target] += self.counts[source]
+        self.groups[target].extend(self.groups.pop(source))
+        self.sums[source] = 0
+        self.counts[source] = 0
+        self._unindex(source)
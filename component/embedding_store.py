@@ -0,0 +1,165 @@
+"""
+On-disk cache of question embeddings
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """SHA-256 of the model name and the whitespace-normalized question text."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Memory-mapped float32 matrix of embeddings plus a key -> row index.
+
+    New vectors are appended to the end of the matrix file in bulk; rows that
+    are no longer referenced by the index are dropped by ``compact``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dim: Optional[int] = None
+        self.index = {}
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self._matrix: Optional[np.memmap] = None
+        self.load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def load(self):
+        index_path = self._file("index.json")
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as file:
+            meta = json.load(file)
+        self.dim = meta["dim"]
+        self.rows = meta["rows"]
+        self.index = meta["index"]
+        self._map()
+
+    def _map(self):
+        if self.rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self._file("embeddings.f32"), dtype=np.float32, mode="r",
+                                 shape=(self.rows, self.dim))
+
+    def _save_index(self):
+        tmp_path = self._file("index.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"dim": self.dim, "rows": self.rows, "index": self.index}, file)
+        os.replace(tmp_path, self._file("index.json"))
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        rows = [self.index.get(key) for key in keys]
+        hits = [i for i, row in enumerate(rows) if row is not None]
+        result: List[Optional[np.ndarray]] = [None] * len(keys)
+        if hits:
+            # One fancy-indexed read from the mapping instead of a slice per key
+            block = np.array(self._matrix[[rows[i] for i in hits]])
+            for vector, i in zip(block, hits):
+                result[i] = vector
+        return result
+
+    def append(self, keys: List[str], embeddings: np.ndarray):
+        """Append a batch of embeddings with a single write to the matrix file."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match store dimension {self.dim}")
+
+        os.makedirs(self.path, exist_ok=True)
+        # Drop the mapping before growing the file underneath it
+        self._matrix = None
+        with open(self._file("embeddings.f32"), "ab") as file:
+            # Drop rows written by an append that died before saving the index
+            file.truncate(self.rows * self.dim * 4)
+            file.write(embeddings.tobytes())
+        for offset, key in enumerate(keys):
+            self.index[key] = self.rows + offset
+        self.rows += len(keys)
+        self._save_index()
+        self._map()
+
+    def encode(self, model_name: str, texts: List[str],
+               encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return embeddings for ``texts``, calling ``encoder`` only for texts
+        that are not in the store yet.
+        """
+        keys = [embedding_key(model_name, text) for text in texts]
+        cached = self.get_many(keys)
+
+        # Key -> row in the batch sent to the encoder, so duplicates encode once
+        missing = {}
+        missing_texts = []
+        for key, vector, text in zip(keys, cached, texts):
+            if vector is None and key not in missing:
+                missing[key] = len(missing_texts)
+                missing_texts.append(text)
+        self.hits += sum(vector is not None for vector in cached)
+        self.misses += len(missing_texts)
+        logger.info(f"Embedding store: {len(texts) - len(missing_texts)} cached, {len(missing_texts)} to encode")
+
+        if missing_texts:
+            new_embeddings = np.asarray(encoder(missing_texts), dtype=np.float32)
+            self.append(list(missing), new_embeddings)
+            cached = [
+                vector if vector is not None else new_embeddings[missing[key]]
+                for key, vector in zip(keys, cached)
+            ]
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.vstack(cached)
+
+    def compact(self, keep: Optional[Iterable[str]] = None) -> int:
+        """
+        Rewrite the matrix so it only holds rows referenced by the index.
+
+        :param keep: Optional keys to retain; everything else is evicted
+        :return: Number of rows removed
+        """
+        if keep is not None:
+            keep = set(keep)
+            self.index = {key: row for key, row in self.index.items() if key in keep}
+        if self.rows == len(self.index):
+            return 0
+
+        keys = sorted(self.index, key=self.index.get)
+        matrix = np.array(self._matrix[[self.index[key] for key in keys]]) if keys else None
+
+        tmp_path = self._file("embeddings.f32.tmp")
+        with open(tmp_path, "wb") as file:
+            if matrix is not None:
+                file.write(matrix.tobytes())
+        self._matrix = None
+        os.replace(tmp_path, self._file("embeddings.f32"))
+
+        removed = self.rows - len(keys)
+        self.index = {key: row for row, key in enumerate(keys)}
+        self.rows = len(keys)
+        self._save_index()
+        self._map()
+        logger.info(f"Embedding store compaction removed {removed} rows")
+        return removed
@@ -1,12 +1,21 @@
-from typing import List, Dict, TypedDict, Any
-from OllamaLlama import OllamaLlama
+from typing import Iterable, List, Dict, TypedDict, Any
+from OllamaLlama import OllamaLlama, AsyncOllamaLlama
+import asyncio
+import time
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sklearn.cluster import AgglomerativeClustering
+from ann_grouping import group_embeddings, make_index
 from sentence_transformers import SentenceTransformer
 import json
 import os
-from questions_extractor import extract_user_questions
+from questions_extractor import iter_question_chunks, iter_user_questions
+from centroid_store import CentroidStore
+from embedding_store import EmbeddingStore
+from analysis_writer import QuestionAnalysisWriter
+from response_cache import ResponseCache
+from run_checkpoint import RunCheckpoint
+import argparse
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models.sqlalchemy.question_analyzer import QuestionAnalysis, Base
@@ -26,6 +35,13 @@ def retry_with_exponential_backoff(max_retries: int = 3, base_wait: float = 1):
         reraise=True
     )
 
+# Bump whenever build_prompt changes so cached responses for the old prompt are not reused
+PROMPT_VERSION = 1
+
+# Keys every analysis needs before it is cached or stored
+ANALYSIS_KEYS = {"category", "expertise_level", "knowledge_gaps", "recommendations"}
+
+
 class QuestionAnalyzer:
     def __init__(self, adapter: OllamaLlama, db_session):
         self.adapter = adapter
@@ -33,7 +49,33 @@ class QuestionAnalyzer:
 
     @retry_with_exponential_backoff()
     def analyze_questions_and_recommend_concepts(self, question_group: List[str]) -> Dict[str, Any]:
-        prompt = f"""
+        return self.adapter.chat(self.build_prompt(question_group), cache_key=self.cache_key(question_group),
+                                 parse=self.parse_analysis)
+
+    def parse_analysis(self, response: str) -> Dict[str, Any]:
+        # Raising makes the adapter skip caching and the retry ask again
+        analysis = self.adapter.parse_json_response(response)
+        if not isinstance(analysis, dict) or not ANALYSIS_KEYS <= analysis.keys():
+            raise ValueError(f"Malformed analysis response: {response[:200]!r}")
+        return analysis
+
+    def parse_batch_analyses(self, response: str) -> Dict[str, Dict[str, Any]]:
+        analyses = {
+            group_id: analysis for group_id, analysis in self.adapter.parse_json_array_response(response).items()
+            if ANALYSIS_KEYS <= analysis.keys()
+        }
+        if not analyses:
+            raise ValueError(f"Malformed batched analysis response: {response[:200]!r}")
+        return analyses
+
+    def cache_key(self, question_group: List[str]):
+        if self.adapter.cache is None:
+            return None
+        return self.adapter.cache.make_key(self.adapter.model, PROMPT_VERSION, question_group)
+
+    @staticmethod
+    def build_prompt(question_group: List[str]) -> str:
+        return f"""
         Based on the following group of questions:
         {question_group}
 
@@ -63,7 +105,104 @@ class QuestionAnalyzer:
             "recommendations": ["MRI and CT scan interpretation", "Diagnostic algorithms for rare diseases", "Latest advancements in medical imaging"]
         }}
         """
-        return self.adapter.parse_json_response(self.adapter.chat(prompt))
+
+    @staticmethod
+    def build_batch_prompt(batch: Dict[Any, List[str]]) -> str:
+        groups = "\n".join(f"        Group {group_id}: {questions}" for group_id, questions in batch.items())
+        return f"""
+        Analyze each of the following groups of questions separately:
+{groups}
+
+        For each group:
+        1. Identify the main topic or subject of its questions.
+        2. Assess the user's expertise level on a scale of 1-5 (1 = Beginner, 3 = Intermediate, 5 = Expert).
+        3. Identify knowledge gaps based on the complexity and depth of the questions.
+        4. Recommend 2-3 key concepts or topics to study, foundational for levels 1-2 and advanced for levels 4-5.
+
+        Respond with a JSON array containing one object per group with the following keys:
+        - "group_id": The group number given above
+        - "category": Name of the identified category
+        - "expertise_level": Assessed expertise level (1-5)
+        - "knowledge_gaps": List of identified knowledge gaps
+        - "recommendations": List of recommended concepts to study
+
+        Example response:
+        [
+            {{
+                "group_id": 7,
+                "category": "Medical Diagnosis",
+                "expertise_level": 3,
+                "knowledge_gaps": ["Advanced imaging techniques", "Rare disease identification"],
+                "recommendations": ["MRI and CT scan interpretation", "Diagnostic algorithms for rare diseases"]
+            }}
+        ]
+        """
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # Roughly four characters per token for English text
+        return len(text) // 4 + 1
+
+    def pack_groups(self, grouped_questions: Dict[Any, List[str]], max_batch_group_size: int = 2,
+                    token_budget: int = 1500) -> List[Dict[Any, List[str]]]:
+        """
+        Split groups into request units: groups larger than
+        ``max_batch_group_size`` get their own request, smaller ones are packed
+        together while the batch prompt stays within ``token_budget`` tokens.
+        """
+        units = []
+        batch, batch_tokens = {}, self.estimate_tokens(self.build_batch_prompt({}))
+        overhead = batch_tokens
+        for group_id, questions in grouped_questions.items():
+            if len(questions) > max_batch_group_size:
+                units.append({group_id: questions})
+                continue
+            group_tokens = self.estimate_tokens(f"Group {group_id}: {questions}\n")
+            if batch and batch_tokens + group_tokens > token_budget:
+                units.append(batch)
+                batch, batch_tokens = {}, overhead
+            batch[group_id] = questions
+            batch_tokens += group_tokens
+        if batch:
+            units.append(batch)
+        return units
+
+    @retry_with_exponential_backoff()
+    def _chat_batch(self, batch: Dict[Any, List[str]]) -> Dict[str, Dict[str, Any]]:
+        return self.adapter.chat(self.build_batch_prompt(batch), parse=self.parse_batch_analyses)
+
+    def analyze_batch(self, batch: Dict[Any, List[str]]) -> Dict[Any, Dict[str, Any]]:
+        """Analyze a packed unit; groups missing from a batched answer are retried on their own."""
+        if len(batch) == 1:
+            (group_id, questions), = batch.items()
+            return {group_id: self.analyze_questions_and_recommend_concepts(questions)}
+
+        try:
+            parsed = self._chat_batch(batch)
+        except ValueError as e:
+            logger.info(f"Unusable batched response, analyzing its groups alone: {e}")
+            parsed = {}
+        analyses = {}
+        for group_id, questions in batch.items():
+            analysis = parsed.get(str(group_id))
+            if analysis is None:
+                logger.info(f"Group {group_id} missing from batched response, analyzing it alone")
+                analysis = self.analyze_questions_and_recommend_concepts(questions)
+            else:
+                analysis.pop("group_id", None)
+            analyses[group_id] = analysis
+        return analyses
+
+    def analyze_groups_batched(self, grouped_questions: Dict[Any, List[str]], **packing) -> Dict[Any, Dict[str, Any]]:
+        units = self.pack_groups(grouped_questions, **packing)
+        logger.info(f"Analyzing {len(grouped_questions)} groups in {len(units)} requests")
+        analyses = {}
+        for unit in units:
+            try:
+                analyses.update(self.analyze_batch(unit))
+            except Exception as e:
+                logger.error(f"Batch analysis failed for groups {list(unit)}: {e}")
+        return analyses
 
     def store_analysis(self, question: str, analysis: Dict[str, Any]):
         question_analysis = QuestionAnalysis(
@@ -76,14 +215,146 @@ class QuestionAnalyzer:
         self.db_session.add(question_analysis)
         self.db_session.commit()
 
+class AsyncQuestionAnalyzer(QuestionAnalyzer):
+    """Analyzes many question groups concurrently over an AsyncOllamaLlama adapter."""
+
+    def __init__(self, adapter: AsyncOllamaLlama, db_session, concurrency: int = 4):
+        super().__init__(adapter, db_session)
+        self.concurrency = concurrency
+
+    @retry_with_exponential_backoff()
+    async def analyze_questions_and_recommend_concepts(self, question_group: List[str]) -> Dict[str, Any]:
+        return await self.adapter.chat(self.build_prompt(question_group), cache_key=self.cache_key(question_group),
+                                       parse=self.parse_analysis)
+
+    @retry_with_exponential_backoff()
+    async def _chat_batch(self, batch: Dict[Any, List[str]]) -> Dict[str, Dict[str, Any]]:
+        return await self.adapter.chat(self.build_batch_prompt(batch), parse=self.parse_batch_analyses)
+
+    async def analyze_batch(self, batch: Dict[Any, List[str]]) -> Dict[Any, Dict[str, Any]]:
+        if len(batch) == 1:
+            (group_id, questions), = batch.items()
+            return {group_id: await self.analyze_questions_and_recommend_concepts(questions)}
+
+        try:
+            parsed = await self._chat_batch(batch)
+        except ValueError as e:
+            logger.info(f"Unusable batched response, analyzing its groups alone: {e}")
+            parsed = {}
+        analyses = {}
+        for group_id, questions in batch.items():
+            analysis = parsed.get(str(group_id))
+            if analysis is None:
+                logger.info(f"Group {group_id} missing from batched response, analyzing it alone")
+                analysis = await self.analyze_questions_and_recommend_concepts(questions)
+            else:
+                analysis.pop("group_id", None)
+            analyses[group_id] = analysis
+        return analyses
+
+    async def analyze_groups(self, grouped_questions: Dict[int, List[str]], batch_small_groups: bool = False,
+                             **packing) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze every group with at most ``concurrency`` requests in flight.
+
+        With ``batch_small_groups`` small groups are packed into shared prompts
+        (see ``pack_groups``). Groups that still fail after retries are logged
+        and left out of the result.
+        """
+        if batch_small_groups:
+            units = self.pack_groups(grouped_questions, **packing)
+        else:
+            units = [{group_id: questions} for group_id, questions in grouped_questions.items()]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+
+        async def analyze(unit):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return await self.analyze_batch(unit)
+                finally:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(analyze(unit) for unit in units), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+        analyses = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"Group analysis failed: {result}")
+                continue
+            analyses.update(result)
+
+        self._log_stats(len(analyses), len(grouped_questions) - len(analyses), elapsed, latencies)
+        return analyses
+
+    @staticmethod
+    def _log_stats(succeeded: int, failed: int, elapsed: float, latencies: List[float]):
+        if not latencies:
+            return
+        latencies = sorted(latencies)
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+        logger.info(
+            f"Analyzed {succeeded} groups ({failed} failed) with {len(latencies)} requests in {elapsed:.1f}s: "
+            f"{succeeded / elapsed:.2f} groups/s, latency p50 {percentile(0.5):.2f}s, "
+            f"p95 {percentile(0.95):.2f}s, max {latencies[-1]:.2f}s"
+        )
+
 class QuestionGrouper:
-    def __init__(self, model_name='all-MiniLM-L6-v2', threshold=0.7):
+    def __init__(self, model_name='all-MiniLM-L6-v2', threshold=0.7, centroid_store_path=None,
+                 embedding_store_path=None, grouping='agglomerative', ann_backend='auto'):
         self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
         self.threshold = threshold
+        # 'agglomerative' needs the full distance matrix; 'ann' groups through a
+        # k-nearest-neighbour graph and scales to 100k+ questions
+        if grouping not in ('agglomerative', 'ann'):
+            raise ValueError(f"Unknown grouping engine: {grouping}")
+        self.grouping = grouping
+        self.ann_backend = ann_backend
+        self.embedding_store = EmbeddingStore(embedding_store_path) if embedding_store_path else None
+        # With a centroid store, only questions not seen on a previous run are
+        # encoded and they are assigned to the persisted groups
+        self.centroid_store = CentroidStore(centroid_store_path, threshold=threshold) if centroid_store_path else None
 
     @retry_with_exponential_backoff()
     def group_similar_questions(self, questions: List[str]) -> Dict[int, List[str]]:
-        embeddings = self.model.encode(questions)
+        if self.centroid_store is not None:
+            grouped_questions = self._group_incrementally(questions)
+        elif self.grouping == 'ann':
+            grouped_questions = self._group_by_ann(questions)
+        else:
+            grouped_questions = self._group_by_clustering(questions)
+
+        print("\n" + "="*50)
+        print("Question Grouping Results:")
+        print("="*50)
+        for label, group in grouped_questions.items():
+            print(f"\nGroup {label}:")
+            for question in group:
+                print(f"  - {question}")
+        print("="*50 + "\n")
+        
+        return grouped_questions
+
+    def _encode(self, questions: List[str]):
+        # Normalized so cached vectors serve both the cosine clustering and the
+        # centroid assignment
+        def encode(texts):
+            return self.model.encode(texts, normalize_embeddings=True)
+
+        if self.embedding_store is None:
+            return encode(questions)
+        return self.embedding_store.encode(self.model_name, questions, encode)
+
+    def _group_by_clustering(self, questions: List[str]) -> Dict[int, List[str]]:
+        # Clustering needs at least two questions, e.g. a chunk of one at the end of the stream
+        if len(questions) < 2:
+            return {0: questions} if questions else {}
+
+        embeddings = self._encode(questions)
         clustering = AgglomerativeClustering(
             n_clusters=None, 
             distance_threshold=self.threshold, 
@@ -94,18 +365,39 @@ class QuestionGrouper:
         grouped_questions = {}
         for i, label in enumerate(clustering.labels_):
             grouped_questions.setdefault(label, []).append(questions[i])
-        
-        print("\n" + "="*50)
-        print("Question Grouping Results:")
-        print("="*50)
-        for label, group in grouped_questions.items():
-            print(f"\nGroup {label}:")
-            for question in group:
-                print(f"  - {question}")
-        print("="*50 + "\n")
-        
         return grouped_questions
 
+    def _group_by_ann(self, questions: List[str]) -> Dict[int, List[str]]:
+        if len(questions) < 2:
+            return {0: questions} if questions else {}
+
+        embeddings = self._encode(questions)
+        labels = group_embeddings(embeddings, self.threshold, index=make_index(self.ann_backend))
+
+        grouped_questions = {}
+        for i, label in enumerate(labels):
+            grouped_questions.setdefault(int(label), []).append(questions[i])
+        return grouped_questions
+
+    def _group_incrementally(self, questions: List[str]) -> Dict[int, List[str]]:
+        new_questions = list(dict.fromkeys(
+            q for q in questions if q not in self.centroid_store.known_questions
+        ))
+        logger.info(f"Incremental grouping: {len(new_questions)} new of {len(questions)} questions")
+        if not new_questions:
+            return {}
+
+        embeddings = self._encode(new_questions)
+        # Persisted by the caller once the groups are stored, so a failed run
+        # does not mark its questions as already grouped
+        return self.centroid_store.assign(new_questions, embeddings)
+
+    def consolidate(self):
+        """Run a blocking re-consolidation pass over the persisted groups."""
+        if self.centroid_store is not None:
+            self.centroid_store.consolidate()
+            self.centroid_store.save()
+
 
 def get_database_uri():
     host = os.environ.get("PG_HOST", "localhost")
@@ -117,46 +409,120 @@ def get_database_uri():
     return f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{database_name}?options=-csearch_path%3D{database_schema}"
 
 
-def main(questions: List[str]) -> None:
+async def analyze_groups_concurrently(grouped_questions: Dict[int, List[str]], db_session, concurrency: int,
+                                      max_requests_per_second: float = None,
+                                      cache: ResponseCache = None,
+                                      batch_small_groups: bool = False) -> Dict[int, Dict[str, Any]]:
+    adapter = AsyncOllamaLlama(cache=cache, max_connections=concurrency,
+                               max_requests_per_second=max_requests_per_second)
+    try:
+        analyzer = AsyncQuestionAnalyzer(adapter, db_session, concurrency=concurrency)
+        return await analyzer.analyze_groups(grouped_questions, batch_small_groups=batch_small_groups)
+    finally:
+        await adapter.aclose()
+
+
+def main(questions: Iterable[str], centroid_store_path: str = None, embedding_store_path: str = None,
+         concurrency: int = 1, max_requests_per_second: float = None, flush_size: int = 500,
+         chunk_size: int = None, response_cache_path: str = None, resume_run_id: str = None,
+         grouping: str = 'agglomerative', batch_small_groups: bool = False) -> None:
     # Database setup
     engine = create_engine(get_database_uri())
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     db_session = Session()
 
-    adapter = OllamaLlama()
+    response_cache = ResponseCache(response_cache_path) if response_cache_path else None
+    adapter = OllamaLlama(cache=response_cache)
     analyzer = QuestionAnalyzer(adapter, db_session)
-    grouper = QuestionGrouper()
+    checkpoint = RunCheckpoint(db_session, run_id=resume_run_id)
+    print(f"Analysis run: {checkpoint.run_id} (resume with --resume {checkpoint.run_id})")
+    writer = QuestionAnalysisWriter(db_session, flush_size=flush_size, checkpoint=checkpoint)
+    grouper = QuestionGrouper(centroid_store_path=centroid_store_path, embedding_store_path=embedding_store_path,
+                              grouping=grouping)
     
     try:
-        grouped_questions = grouper.group_similar_questions(questions)
-        print(f"\nNumber of question groups: {len(grouped_questions)}\n")
+        # Without a chunk size the whole question list is grouped in one pass;
+        # with one, each chunk is grouped, analyzed and stored before the next is read
+        chunks = iter_question_chunks(questions, chunk_size) if chunk_size else [list(questions)]
+        for chunk in chunks:
+            grouped_questions = grouper.group_similar_questions(chunk)
+            print(f"\nNumber of question groups: {len(grouped_questions)}\n")
+
+            # Groups stored by an earlier attempt of this run are not analyzed again
+            remaining = {
+                group_id: group for group_id, group in grouped_questions.items()
+                if not checkpoint.is_completed(group)
+            }
+            if len(remaining) < len(grouped_questions):
+                print(f"Skipping {len(grouped_questions) - len(remaining)} groups completed earlier in this run\n")
+            grouped_questions = remaining
+
+            analyses = None
+            if concurrency > 1:
+                analyses = asyncio.run(analyze_groups_concurrently(
+                    grouped_questions, db_session, concurrency, max_requests_per_second, response_cache,
+                    batch_small_groups
+                ))
+            elif batch_small_groups:
+                analyses = analyzer.analyze_groups_batched(grouped_questions)
         
-        for group_id, questions in grouped_questions.items():
-            print(f"\n{'='*50}")
-            print(f"Analyzing Group {group_id}:")
-            print(f"{'='*50}")
-            print("Questions in this group:")
-            for question in questions:
-                print(f"  - {question}")
-            print("\nRecommendations:")
-            recommended_concepts = analyzer.analyze_questions_and_recommend_concepts(questions)
-            print(json.dumps(recommended_concepts, indent=2))
+            for group_id, group in grouped_questions.items():
+                print(f"\n{'='*50}")
+                print(f"Analyzing Group {group_id}:")
+                print(f"{'='*50}")
+                print("Questions in this group:")
+                for question in group:
+                    print(f"  - {question}")
+                print("\nRecommendations:")
+                if analyses is None:
+                    recommended_concepts = analyzer.analyze_questions_and_recommend_concepts(group)
+                elif group_id in analyses:
+                    recommended_concepts = analyses[group_id]
+                else:
+                    print("Analysis failed for this group, skipping.")
+                    continue
+                print(json.dumps(recommended_concepts, indent=2))
             
-            # Store each question's analysis in the database
-            for question in questions:
-                analyzer.store_analysis(question, recommended_concepts)
+                # Buffer each question's analysis; rows are written in batches of flush_size
+                writer.add_group(group, recommended_concepts)
             
-            print(f"{'='*50}\n")
+                print(f"{'='*50}\n")
+
+            # Between chunks so assigning questions never waits on the full pass; saved
+            # with the rest of the store once the run's analyses are written
+            if grouper.centroid_store is not None and grouper.centroid_store.consolidation_due:
+                grouper.centroid_store.consolidate()
         
+        writer.flush()
+        if grouper.centroid_store is not None:
+            grouper.centroid_store.save()
+        checkpoint.finish("completed")
     except Exception as e:
         print(f"\nError: An error occurred: {str(e)}")
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"\nError: Failed to store analyses: {str(e)}")
+        checkpoint.finish("failed")
+        print(f"Resume this run with --resume {checkpoint.run_id}")
     finally:
+        if response_cache is not None:
+            print(f"LLM response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+            response_cache.close()
         db_session.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group user questions and recommend concepts to study")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an earlier run, skipping its completed groups")
+    parser.add_argument("--grouping", choices=["agglomerative", "ann"], default="agglomerative",
+                        help="Question grouping engine; use 'ann' for very large question sets")
+    parser.add_argument("--batch-small-groups", action="store_true",
+                        help="Pack groups of one or two questions into shared LLM prompts")
+    args = parser.parse_args()
+
     json_file = 'component/data/conversations.json'
-    questions = extract_user_questions(json_file)
+    chunk_size = int(os.environ["QUESTION_CHUNK_SIZE"]) if os.environ.get("QUESTION_CHUNK_SIZE") else None
 
     # Add some sample hard-coded questions with similar themes
     sample_questions = [
@@ -195,5 +561,20 @@ if __name__ == "__main__":
 
     # Combine extracted questions with sample questions
     all_questions = sample_questions
+    if chunk_size:
+        # Stream the export instead of loading it, deduplicated and without trivial one-word prompts
+        all_questions = iter_user_questions(json_file, dedup=True, min_length=10)
 
-    main(all_questions)
+    main(
+        all_questions,
+        centroid_store_path=os.environ.get("QUESTION_CENTROID_STORE"),
+        embedding_store_path=os.environ.get("QUESTION_EMBEDDING_STORE"),
+        concurrency=int(os.environ.get("ANALYSIS_CONCURRENCY", "1")),
+        max_requests_per_second=float(os.environ["OLLAMA_MAX_RPS"]) if os.environ.get("OLLAMA_MAX_RPS") else None,
+        flush_size=int(os.environ.get("ANALYSIS_FLUSH_SIZE", "500")),
+        chunk_size=chunk_size,
+        response_cache_path=os.environ.get("LLM_RESPONSE_CACHE"),
+        resume_run_id=args.resume,
+        grouping=args.grouping,
+        batch_small_groups=args.batch_small_groups,
+    )
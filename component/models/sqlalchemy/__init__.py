@@ -1,4 +1,5 @@
 from .base import Base
 from .question_analyzer import QuestionAnalysis
+from .analysis_run import AnalysisRun, AnalysisRunGroup
 
-__all__ = ['Base', 'QuestionAnalysis']
\ No newline at end of file
+__all__ = ['Base', 'QuestionAnalysis', 'AnalysisRun', 'AnalysisRunGroup']
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+SQLAlchemy mapping of AnalysisRun and AnalysisRunGroup tables
+"""
+
+import datetime
+from uuid import UUID as UUID4
+from uuid import uuid4
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, validates
+
+from .question_analyzer import Base
+
+
+class AnalysisRun(Base):
+    """AnalysisRun table represents one invocation of the analysis pipeline."""
+
+    __tablename__ = 'analysis_run'
+    caption = "Analysis Run"
+    description = "Holds the status of analysis pipeline runs"
+
+    STATUSES = ("running", "completed", "failed")
+
+    id: Mapped[UUID4] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        unique=True,
+        nullable=False,
+        default=uuid4,
+        comment="The unique identifier assigned to an analysis run.",
+        info={"verbose_name": "ID"},
+    )
+    status: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        default="running",
+        comment="The status of the run: running, completed or failed.",
+        info={"verbose_name": "Status"},
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=func.now(),
+        comment="The start date of the analysis run.",
+        info={"verbose_name": "Created At"},
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=func.now(),
+        onupdate=func.now(),
+        comment="The date the analysis run was last updated.",
+        info={"verbose_name": "Updated At"},
+    )
+
+    @validates("status")
+    def validate_status(self, key, value):
+        if value not in self.STATUSES:
+            raise ValueError(f"{key}: {value} is not one of {', '.join(self.STATUSES)}")
+        return value
+
+
+class AnalysisRunGroup(Base):
+    """AnalysisRunGroup table records a question group analyzed and stored by a run."""
+
+    __tablename__ = 'analysis_run_group'
+    caption = "Analysis Run Group"
+    description = "Holds the question groups completed by each analysis run"
+
+    run_id: Mapped[UUID4] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("analysis_run.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="The analysis run that completed the group.",
+        info={"verbose_name": "Run ID"},
+    )
+    group_hash: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True,
+        comment="SHA-256 of the sorted questions of the group.",
+        info={"verbose_name": "Group Hash"},
+    )
+    question_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="The number of questions in the group.",
+        info={"verbose_name": "Question Count"},
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=func.now(),
+        comment="The date the group was stored.",
+        info={"verbose_name": "Created At"},
+    )
@@ -1,27 +1,107 @@
 import json
 import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
 
-def extract_user_questions(json_file):
-    # Get the absolute path to the project root directory
+_decoder = json.JSONDecoder()
+
+
+def resolve_conversations_path(json_file):
+    # Relative paths are resolved against the project root directory
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    
-    # Construct the absolute path to the JSON file
-    json_file_path = os.path.join(project_root, 'component', 'data', 'conversations.json')
-    
+    return os.path.join(project_root, json_file)
+
+
+def iter_conversations(json_file_path, read_size=1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the conversations of a ChatGPT export one at a time.
+
+    The top-level JSON array is decoded incrementally, so memory use is
+    bounded by the largest single conversation rather than the whole file.
+    """
+    with open(json_file_path, 'r') as file:
+        buffer = ""
+        position = 0
+        started = False
+        eof = False
+
+        while True:
+            # Skip whitespace and the array punctuation between conversations
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError("Expected a JSON array of conversations")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                if position >= len(buffer):
+                    raise ValueError("buffer exhausted")
+                conversation, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The next conversation is not fully buffered yet
+                if eof:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                # Grow reads with the buffer so a huge conversation is not re-parsed once per read_size
+                chunk = file.read(max(read_size, len(buffer) - position))
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield conversation
+            position = end
+
+
+def iter_user_questions(json_file, dedup=False, min_length=0, max_length=None) -> Iterator[str]:
+    """
+    Yield user questions conversation-by-conversation.
+
+    :param dedup: Skip questions already yielded earlier in the stream
+    :param min_length: Skip questions shorter than this many characters
+    :param max_length: Skip questions longer than this many characters
+    """
+    seen = set()
+    for conversation in iter_conversations(resolve_conversations_path(json_file)):
+        for node_id, node in conversation['mapping'].items():
+            message = node.get('message')
+            if not message or message['author']['role'] != 'user':
+                continue
+            parts = message['content'].get('parts') or []
+            if not parts or not isinstance(parts[0], str):
+                continue
+
+            content = parts[0]
+            if len(content) < min_length or (max_length is not None and len(content) > max_length):
+                continue
+            if dedup:
+                if content in seen:
+                    continue
+                seen.add(content)
+            yield content
+
+
+def iter_question_chunks(questions: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """Group a question stream into lists of at most ``chunk_size`` questions."""
+    questions = iter(questions)
+    while True:
+        chunk = list(islice(questions, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def extract_user_questions(json_file):
+    json_file_path = resolve_conversations_path(json_file)
+
     try:
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        user_questions = []
-        
-        for conversation in data:
-            for node_id, node in conversation['mapping'].items():
-                message = node.get('message')
-                if message and message['author']['role'] == 'user':
-                    content = message['content']['parts'][0]
-                    user_questions.append(content)
-        
-        return user_questions
+        return list(iter_user_questions(json_file))
     except FileNotFoundError:
         print(f"Error: File not found at {json_file_path}")
         return []
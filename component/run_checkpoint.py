@@ -0,0 +1,62 @@
+"""
+Checkpointing of analysis runs so a restarted run skips completed groups
+"""
+
+import hashlib
+import json
+import logging
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+
+from models.sqlalchemy.analysis_run import AnalysisRun, AnalysisRunGroup
+
+logger = logging.getLogger(__name__)
+
+
+def group_hash(questions: List[str]) -> str:
+    """SHA-256 of a question group that does not depend on question order."""
+    return hashlib.sha256(json.dumps(sorted(questions), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RunCheckpoint:
+    """
+    Tracks which question groups a run has analyzed and stored.
+
+    Completed groups are recorded by QuestionAnalysisWriter in the same
+    transaction as their QuestionAnalysis rows, so a group is either fully
+    stored and checkpointed or neither.
+    """
+
+    def __init__(self, db_session, run_id: Optional[str] = None):
+        self.db_session = db_session
+
+        if run_id is None:
+            run = AnalysisRun(status="running")
+            db_session.add(run)
+            db_session.commit()
+            self.completed = set()
+        else:
+            run = db_session.get(AnalysisRun, UUID(run_id))
+            if run is None:
+                raise ValueError(f"Analysis run {run_id} does not exist")
+            run.status = "running"
+            db_session.commit()
+            self.completed = set(db_session.scalars(
+                select(AnalysisRunGroup.group_hash).where(AnalysisRunGroup.run_id == run.id)
+            ))
+            logger.info(f"Resuming run {run.id}: {len(self.completed)} groups already completed")
+
+        self.run_id = run.id
+
+    def is_completed(self, questions: List[str]) -> bool:
+        return group_hash(questions) in self.completed
+
+    def group_row(self, questions: List[str]):
+        return {"run_id": self.run_id, "group_hash": group_hash(questions), "question_count": len(questions)}
+
+    def finish(self, status: str):
+        run = self.db_session.get(AnalysisRun, self.run_id)
+        run.status = status
+        self.db_session.commit()
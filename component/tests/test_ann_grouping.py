@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from ann_grouping import IVFIndex, group_embeddings
+
+
+def arc(n, start, end):
+    angles = np.linspace(start, end, n)
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1).astype(np.float32)
+
+
+def test_chained_questions_are_split():
+    # Neighbours along the half circle are close, its ends are opposite
+    embeddings = arc(40, 0, np.pi)
+
+    labels = group_embeddings(embeddings, 0.3, index=IVFIndex())
+
+    assert labels.max() > 0
+    for label in np.unique(labels):
+        members = embeddings[labels == label]
+        assert (1 - members @ members.T).max() < 1
+
+
+@pytest.mark.parametrize("method", ["components", "leader"])
+def test_distinct_topics_are_grouped_apart(method):
+    embeddings = np.concatenate([arc(10, 0, 0.1), arc(10, np.pi, np.pi + 0.1)])
+
+    labels = group_embeddings(embeddings, 0.3, method=method, index=IVFIndex())
+
+    assert sorted(np.bincount(labels)) == [10, 10]
+    assert len(set(labels[:10])) == 1
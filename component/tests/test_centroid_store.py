@@ -0,0 +1,58 @@
+import numpy as np
+
+from centroid_store import CentroidStore
+
+
+def topic_vectors(n_topics, per_topic, dim=64, noise=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim))
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    truth = np.repeat(np.arange(n_topics), per_topic)
+    vectors = topics[truth] + noise * rng.standard_normal((len(truth), dim)) / np.sqrt(dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), truth
+
+
+def test_questions_of_a_topic_share_a_group(tmp_path):
+    vectors, truth = topic_vectors(20, 10)
+    questions = [f"question {i}" for i in range(len(vectors))]
+    store = CentroidStore(str(tmp_path), threshold=0.5)
+
+    assigned = store.assign(questions, vectors)
+
+    labels = {question: label for label, members in assigned.items() for question in members}
+    assert len(assigned) == 20
+    for topic in range(20):
+        assert len({labels[questions[i]] for i in np.flatnonzero(truth == topic)}) == 1
+
+
+def test_known_questions_are_skipped_after_reload(tmp_path):
+    vectors, _ = topic_vectors(3, 4)
+    questions = [f"question {i}" for i in range(len(vectors))]
+    store = CentroidStore(str(tmp_path), threshold=0.5)
+    store.assign(questions, vectors)
+    store.save()
+
+    reloaded = CentroidStore(str(tmp_path), threshold=0.5)
+
+    assert reloaded.assign(questions, vectors) == {}
+    assert reloaded.groups == store.groups
+
+
+def test_full_consolidation_runs_only_when_called(tmp_path):
+    vectors, _ = topic_vectors(3, 2, noise=0.5)
+    store = CentroidStore(str(tmp_path), threshold=0.01, consolidate_every=4)
+    store.assign(["a", "b"], vectors[:2])
+    assert len(store.groups) == 2
+
+    # The two groups are now close enough to merge, but only the full pass
+    # looks at groups the assigned questions did not touch
+    store.threshold = 0.5
+    store.assign(["c", "d"], vectors[2:4])
+
+    assert store.consolidation_due
+    assert sum("a" in members or "b" in members for members in store.groups.values()) == 2
+
+    assert store.consolidate() >= 1
+    assert not store.consolidation_due
+    assert any({"a", "b"} <= set(members) for members in store.groups.values())
@@ -0,0 +1,36 @@
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+
+def test_append_after_interrupted_write(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    first = np.arange(8, dtype=np.float32).reshape(2, 4)
+    store.append(["a", "b"], first)
+
+    # An append that wrote its rows but died before saving the index
+    with open(tmp_path / "embeddings.f32", "ab") as file:
+        file.write(np.full((3, 4), -1, dtype=np.float32).tobytes())
+
+    store = EmbeddingStore(str(tmp_path))
+    second = np.arange(8, 16, dtype=np.float32).reshape(2, 4)
+    store.append(["c", "d"], second)
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    np.testing.assert_array_equal(np.vstack(reloaded.get_many(["a", "b", "c", "d"])), np.vstack([first, second]))
+    assert (tmp_path / "embeddings.f32").stat().st_size == 4 * 4 * 4
+
+
+def test_encode_only_encodes_missing_texts(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    encoded = []
+
+    def encoder(texts):
+        encoded.extend(texts)
+        return np.array([[len(text), 1] for text in texts], dtype=np.float32)
+
+    store.encode("model", ["a", "bb"], encoder)
+    vectors = store.encode("model", ["bb", "ccc", "ccc"], encoder)
+
+    assert encoded == ["a", "bb", "ccc"]
+    np.testing.assert_array_equal(vectors, [[2, 1], [3, 1], [3, 1]])
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from main import QuestionGrouper
+
+
+def make_grouper(grouping):
+    # Skip loading the sentence transformer, questions are encoded below
+    grouper = QuestionGrouper.__new__(QuestionGrouper)
+    grouper.threshold = 0.7
+    grouper.grouping = grouping
+    grouper.ann_backend = 'ivf'
+    grouper.embedding_store = None
+    grouper.centroid_store = None
+    grouper._encode = lambda questions: np.eye(len(questions), 8, dtype=np.float32)
+    return grouper
+
+
+@pytest.mark.parametrize("grouping", ['agglomerative', 'ann'])
+def test_single_question_chunk_is_its_own_group(grouping):
+    grouper = make_grouper(grouping)
+
+    assert grouper.group_similar_questions(["What is a monad?"]) == {0: ["What is a monad?"]}
+
+
+@pytest.mark.parametrize("grouping", ['agglomerative', 'ann'])
+def test_empty_chunk_has_no_groups(grouping):
+    assert make_grouper(grouping).group_similar_questions([]) == {}
+
+
+@pytest.mark.parametrize("grouping", ['agglomerative', 'ann'])
+def test_distinct_questions_are_grouped_apart(grouping):
+    questions = ["What is a monad?", "How do I center a div?"]
+
+    groups = make_grouper(grouping).group_similar_questions(questions)
+
+    assert sorted(sorted(group) for group in groups.values()) == [[questions[1]], [questions[0]]]
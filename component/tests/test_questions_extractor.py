@@ -0,0 +1,20 @@
+import pytest
+
+from questions_extractor import iter_question_chunks
+
+
+@pytest.mark.parametrize("n, chunk_size, sizes", [
+    (0, 3, []),
+    (1, 3, [1]),
+    (3, 3, [3]),
+    (4, 3, [3, 1]),
+    (6, 3, [3, 3]),
+    (7, 3, [3, 3, 1]),
+])
+def test_iter_question_chunks_boundaries(n, chunk_size, sizes):
+    questions = [f"question {i}" for i in range(n)]
+
+    chunks = list(iter_question_chunks(iter(questions), chunk_size))
+
+    assert [len(chunk) for chunk in chunks] == sizes
+    assert [question for chunk in chunks for question in chunk] == questions
@@ -0,0 +1,62 @@
+import json
+
+import httpx
+import pytest
+
+from OllamaLlama import DEFAULT_MODEL, OllamaLlama
+from response_cache import ResponseCache
+
+
+def parse_analysis(response):
+    analysis = json.loads(response)
+    if "category" not in analysis:
+        raise ValueError("missing category")
+    return analysis
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"), max_entries=3, evict_every=2)
+    yield cache
+    cache.close()
+
+
+def make_adapter(cache, responses):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": responses.pop(0)}}]})
+
+    adapter = OllamaLlama(cache=cache)
+    adapter.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return adapter, requests
+
+
+def test_unparseable_response_is_not_cached(cache):
+    adapter, requests = make_adapter(cache, ["Sorry, I cannot help.", '{"category": "Math"}'])
+
+    with pytest.raises(ValueError):
+        adapter.chat("prompt", cache_key="group", parse=parse_analysis)
+    assert cache.get("group") is None
+
+    assert adapter.chat("prompt", cache_key="group", parse=parse_analysis) == {"category": "Math"}
+    assert adapter.chat("prompt", cache_key="group", parse=parse_analysis) == {"category": "Math"}
+    assert len(requests) == 2
+
+
+def test_cached_unparseable_response_is_replaced(cache):
+    cache.set("group", DEFAULT_MODEL, "not json")
+    adapter, requests = make_adapter(cache, ['{"category": "Math"}'])
+
+    assert adapter.chat("prompt", cache_key="group", parse=parse_analysis) == {"category": "Math"}
+    assert len(requests) == 1
+    assert cache.get("group") == '{"category": "Math"}'
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i in range(4):
+        cache.set(f"key {i}", "model", f"response {i}")
+
+    assert cache.get("key 0") is None
+    assert [cache.get(f"key {i}") for i in range(1, 4)] == ["response 1", "response 2", "response 3"]
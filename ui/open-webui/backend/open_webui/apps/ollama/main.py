@@ -2,14 +2,15 @@ import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Union
 from urllib.parse import urlparse
 
 import aiohttp
 import requests
+from open_webui.apps.ollama.router import OllamaRouter
 from open_webui.apps.webui.models.models import Models
 from open_webui.config import (
     CORS_ALLOW_ORIGIN,
@@ -17,10 +18,18 @@ from open_webui.config import (
     ENABLE_OLLAMA_API,
     MODEL_FILTER_LIST,
     OLLAMA_BASE_URLS,
+    OLLAMA_EMBEDDING_API,
+    OLLAMA_EMBEDDING_BATCH_SIZE,
+    OLLAMA_EMBEDDING_CONCURRENCY,
+    OLLAMA_EMBEDDING_TIMEOUT,
+    OLLAMA_ROUTER_COOLDOWN,
+    OLLAMA_ROUTER_FAILURE_THRESHOLD,
+    OLLAMA_ROUTER_HEALTH_CHECK_INTERVAL,
+    OLLAMA_ROUTER_MODEL_LOAD_PENALTY,
     UPLOAD_DIR,
     AppConfig,
 )
-from open_webui.env import AIOHTTP_CLIENT_TIMEOUT
+from open_webui.env import AIOHTTP_CLIENT_METADATA_TIMEOUT, AIOHTTP_CLIENT_TIMEOUT
 
 
 from open_webui.constants import ERROR_MESSAGES
@@ -32,6 +41,7 @@ from pydantic import BaseModel, ConfigDict
 from starlette.background import BackgroundTask
 
 
+from open_webui.utils.http import HTTP_SESSIONS, cleanup_response
 from open_webui.utils.misc import (
     calculate_sha256,
 )
@@ -63,10 +73,16 @@ app.state.config.ENABLE_OLLAMA_API = ENABLE_OLLAMA_API
 app.state.config.OLLAMA_BASE_URLS = OLLAMA_BASE_URLS
 app.state.MODELS = {}
 
-
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
+# Spreads requests over the instances serving a model, see OllamaRouter
+app.state.ROUTER = OllamaRouter(
+    get_urls=lambda: (
+        app.state.config.OLLAMA_BASE_URLS if app.state.config.ENABLE_OLLAMA_API else []
+    ),
+    interval=OLLAMA_ROUTER_HEALTH_CHECK_INTERVAL,
+    failure_threshold=OLLAMA_ROUTER_FAILURE_THRESHOLD,
+    cooldown=OLLAMA_ROUTER_COOLDOWN,
+    load_penalty=OLLAMA_ROUTER_MODEL_LOAD_PENALTY,
+)
 
 
 @app.middleware("http")
@@ -118,61 +134,82 @@ async def update_ollama_api_url(form_data: UrlUpdateForm, user=Depends(get_admin
     return {"OLLAMA_BASE_URLS": app.state.config.OLLAMA_BASE_URLS}
 
 
+@app.get("/router")
+async def get_router_stats(user=Depends(get_admin_user)):
+    return app.state.ROUTER.stats()
+
+
 async def fetch_url(url):
     timeout = aiohttp.ClientTimeout(total=3)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(url) as response:
-                return await response.json()
+        session = HTTP_SESSIONS.get(url)
+        async with session.get(url, timeout=timeout) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
+async def release_response(
+    response: Optional[aiohttp.ClientResponse], base_url: Optional[str]
 ):
-    if response:
-        response.close()
-    if session:
-        await session.close()
+    await cleanup_response(response)
+    if base_url:
+        app.state.ROUTER.release(base_url)
 
 
 async def post_streaming_url(
-    url: str, payload: Union[str, bytes], stream: bool = True, content_type=None
+    url: str,
+    payload: Union[str, bytes],
+    stream: bool = True,
+    content_type=None,
+    base_url: Optional[str] = None,
 ):
+    # Requests to a routed instance (base_url) count towards its load until
+    # the response is fully sent
     r = None
+    streaming = False
+    if base_url:
+        app.state.ROUTER.acquire(base_url)
+        start = time.monotonic()
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = HTTP_SESSIONS.get(url)
         r = await session.post(
             url,
             data=payload,
             headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
+        if base_url:
+            # Only streamed responses measure the time to the first token
+            app.state.ROUTER.record_response(
+                base_url, r.status, time.monotonic() - start if stream else None
+            )
         r.raise_for_status()
 
         if stream:
             headers = dict(r.headers)
             if content_type:
                 headers["Content-Type"] = content_type
+            streaming = True
             return StreamingResponse(
                 r.content,
                 status_code=r.status,
                 headers=headers,
                 background=BackgroundTask(
-                    cleanup_response, response=r, session=session
+                    release_response, response=r, base_url=base_url
                 ),
             )
         else:
             res = await r.json()
-            await cleanup_response(r, session)
+            await cleanup_response(r)
             return res
 
     except Exception as e:
+        if base_url and r is None:
+            app.state.ROUTER.record_failure(base_url)
+
         error_detail = "Open WebUI: Server Connection Error"
         if r is not None:
             try:
@@ -181,6 +218,51 @@ async def post_streaming_url(
                     error_detail = f"Ollama: {res['error']}"
             except Exception:
                 error_detail = f"Ollama: {e}"
+            await cleanup_response(r)
+
+        raise HTTPException(
+            status_code=r.status if r else 500,
+            detail=error_detail,
+        )
+    finally:
+        if base_url and not streaming:
+            app.state.ROUTER.release(base_url)
+
+
+async def send_request(
+    url: str,
+    method: str = "GET",
+    payload: Optional[Union[str, bytes]] = None,
+    timeout: Optional[float] = AIOHTTP_CLIENT_METADATA_TIMEOUT,
+    parse_json: bool = True,
+):
+    # Non-blocking call to an Ollama endpoint over the shared session pool,
+    # errors are raised as HTTPException like post_streaming_url does
+    r = None
+    try:
+        session = HTTP_SESSIONS.get(url)
+        async with session.request(
+            method,
+            url,
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as r:
+            text = await r.text()
+            r.raise_for_status()
+
+            log.debug(f"r.text: {text}")
+            return json.loads(text) if parse_json else text
+    except Exception as e:
+        log.exception(e)
+        error_detail = "Open WebUI: Server Connection Error"
+        if r is not None:
+            try:
+                res = json.loads(text)
+                if "error" in res:
+                    error_detail = f"Ollama: {res['error']}"
+            except Exception:
+                error_detail = f"Ollama: {e}"
 
         raise HTTPException(
             status_code=r.status if r else 500,
@@ -188,6 +270,13 @@ async def post_streaming_url(
         )
 
 
+def choose_url_idx(model: str) -> int:
+    url_idxs = app.state.MODELS[model]["urls"]
+    urls = [app.state.config.OLLAMA_BASE_URLS[idx] for idx in url_idxs]
+    url = app.state.ROUTER.choose(urls, model)
+    return url_idxs[urls.index(url)]
+
+
 def merge_models_lists(model_lists):
     merged_models = {}
 
@@ -250,28 +339,7 @@ async def get_ollama_tags(
         return models
     else:
         url = app.state.config.OLLAMA_BASE_URLS[url_idx]
-
-        r = None
-        try:
-            r = requests.request(method="GET", url=f"{url}/api/tags")
-            r.raise_for_status()
-
-            return r.json()
-        except Exception as e:
-            log.exception(e)
-            error_detail = "Open WebUI: Server Connection Error"
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "error" in res:
-                        error_detail = f"Ollama: {res['error']}"
-                except Exception:
-                    error_detail = f"Ollama: {e}"
-
-            raise HTTPException(
-                status_code=r.status_code if r else 500,
-                detail=error_detail,
-            )
+        return await send_request(f"{url}/api/tags")
 
 
 @app.get("/api/version")
@@ -303,28 +371,7 @@ async def get_ollama_versions(url_idx: Optional[int] = None):
                 )
         else:
             url = app.state.config.OLLAMA_BASE_URLS[url_idx]
-
-            r = None
-            try:
-                r = requests.request(method="GET", url=f"{url}/api/version")
-                r.raise_for_status()
-
-                return r.json()
-            except Exception as e:
-                log.exception(e)
-                error_detail = "Open WebUI: Server Connection Error"
-                if r is not None:
-                    try:
-                        res = r.json()
-                        if "error" in res:
-                            error_detail = f"Ollama: {res['error']}"
-                    except Exception:
-                        error_detail = f"Ollama: {e}"
-
-                raise HTTPException(
-                    status_code=r.status_code if r else 500,
-                    detail=error_detail,
-                )
+            return await send_request(f"{url}/api/version")
     else:
         return {"version": False}
 
@@ -421,34 +468,13 @@ async def copy_model(
 
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
-    r = requests.request(
+    await send_request(
+        f"{url}/api/copy",
         method="POST",
-        url=f"{url}/api/copy",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        parse_json=False,
     )
-
-    try:
-        r.raise_for_status()
-
-        log.debug(f"r.text: {r.text}")
-
-        return True
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=error_detail,
-        )
+    return True
 
 
 @app.delete("/api/delete")
@@ -470,33 +496,13 @@ async def delete_model(
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    r = requests.request(
+    await send_request(
+        f"{url}/api/delete",
         method="DELETE",
-        url=f"{url}/api/delete",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        parse_json=False,
     )
-    try:
-        r.raise_for_status()
-
-        log.debug(f"r.text: {r.text}")
-
-        return True
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=error_detail,
-        )
+    return True
 
 
 @app.post("/api/show")
@@ -507,35 +513,15 @@ async def show_model_info(form_data: ModelNameForm, user=Depends(get_verified_us
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.name),
         )
 
-    url_idx = random.choice(app.state.MODELS[form_data.name]["urls"])
+    url_idx = choose_url_idx(form_data.name)
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    r = requests.request(
+    return await send_request(
+        f"{url}/api/show",
         method="POST",
-        url=f"{url}/api/show",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
     )
-    try:
-        r.raise_for_status()
-
-        return r.json()
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=error_detail,
-        )
 
 
 class GenerateEmbeddingsForm(BaseModel):
@@ -567,7 +553,7 @@ async def generate_embeddings(
             model = f"{model}:latest"
 
         if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
+            url_idx = choose_url_idx(model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -577,31 +563,12 @@ async def generate_embeddings(
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    r = requests.request(
+    return await send_request(
+        f"{url}/api/embed",
         method="POST",
-        url=f"{url}/api/embed",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        timeout=AIOHTTP_CLIENT_TIMEOUT,
     )
-    try:
-        r.raise_for_status()
-
-        return r.json()
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=error_detail,
-        )
 
 
 @app.post("/api/embeddings")
@@ -618,7 +585,7 @@ async def generate_embeddings(
             model = f"{model}:latest"
 
         if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
+            url_idx = choose_url_idx(model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -628,31 +595,12 @@ async def generate_embeddings(
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    r = requests.request(
+    return await send_request(
+        f"{url}/api/embeddings",
         method="POST",
-        url=f"{url}/api/embeddings",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        timeout=AIOHTTP_CLIENT_TIMEOUT,
     )
-    try:
-        r.raise_for_status()
-
-        return r.json()
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=error_detail,
-        )
 
 
 def generate_ollama_embeddings(
@@ -668,7 +616,7 @@ def generate_ollama_embeddings(
             model = f"{model}:latest"
 
         if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
+            url_idx = choose_url_idx(model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -709,6 +657,113 @@ def generate_ollama_embeddings(
         raise Exception(error_detail)
 
 
+# Shared by the embedding threads so connections to Ollama are reused
+EMBEDDING_SESSION = requests.Session()
+EMBEDDING_SESSION.mount(
+    "http://",
+    requests.adapters.HTTPAdapter(pool_maxsize=OLLAMA_EMBEDDING_CONCURRENCY * 4),
+)
+EMBEDDING_SESSION.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_maxsize=OLLAMA_EMBEDDING_CONCURRENCY * 4),
+)
+
+
+def generate_ollama_batch_embeddings(
+    model: str,
+    texts: list[str],
+    batch_size: int = OLLAMA_EMBEDDING_BATCH_SIZE,
+    concurrency: int = OLLAMA_EMBEDDING_CONCURRENCY,
+) -> list[list[float]]:
+    # Embed texts in batches through OLLAMA_EMBEDDING_API, spread over every
+    # Ollama instance serving the model with `concurrency` batches in flight
+    # on each
+    log.info(f"generate_ollama_batch_embeddings {model} ({len(texts)} texts)")
+
+    model_id = model if ":" in model else f"{model}:latest"
+    if model_id not in app.state.MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
+        )
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(batches) == 0:
+        return []
+    if len(batches) == 1:
+        return embed_batch(model, batches[0], choose_url_idx(model_id))
+
+    # Skip the instances that are currently failing
+    url_idxs = app.state.MODELS[model_id]["urls"]
+    urls = [app.state.config.OLLAMA_BASE_URLS[idx] for idx in url_idxs]
+    available = app.state.ROUTER.available(urls)
+    url_idxs = [idx for idx, url in zip(url_idxs, urls) if url in available]
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(batches), concurrency * len(url_idxs))
+    ) as executor:
+        results = executor.map(
+            lambda idx: embed_batch(model, batches[idx], url_idxs[idx % len(url_idxs)]),
+            range(len(batches)),
+        )
+        return [embedding for result in results for embedding in result]
+
+
+def embed_batch(model: str, texts: list[str], url_idx: int) -> list[list[float]]:
+    url = app.state.config.OLLAMA_BASE_URLS[url_idx]
+
+    if OLLAMA_EMBEDDING_API == "embed":
+        r = post_embedding_request(url, "embed", {"model": model, "input": texts})
+        if not (r.status_code == 404 and "model" not in r.text):
+            return embedding_response(r)["embeddings"]
+
+    embeddings = [
+        embedding_response(
+            post_embedding_request(url, "embeddings", {"model": model, "prompt": text})
+        )["embedding"]
+        for text in texts
+    ]
+    if OLLAMA_EMBEDDING_API == "embed":
+        # Ollama before 0.3.4 only has /api/embeddings, whose vectors are not
+        # normalised like the /api/embed ones
+        embeddings = [
+            [value / (sum(v * v for v in embedding) ** 0.5 or 1) for value in embedding]
+            for embedding in embeddings
+        ]
+    return embeddings
+
+
+def post_embedding_request(url: str, api: str, payload: dict) -> requests.Response:
+    app.state.ROUTER.acquire(url)
+    try:
+        r = EMBEDDING_SESSION.post(
+            f"{url}/api/{api}", json=payload, timeout=OLLAMA_EMBEDDING_TIMEOUT
+        )
+        app.state.ROUTER.record_response(url, r.status_code)
+        return r
+    except Exception:
+        app.state.ROUTER.record_failure(url)
+        raise
+    finally:
+        app.state.ROUTER.release(url)
+
+
+def embedding_response(r: requests.Response) -> dict:
+    try:
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        log.exception(e)
+        error_detail = "Open WebUI: Server Connection Error"
+        try:
+            res = r.json()
+            if "error" in res:
+                error_detail = f"Ollama: {res['error']}"
+        except Exception:
+            error_detail = f"Ollama: {e}"
+
+        raise Exception(error_detail)
+
+
 class GenerateCompletionForm(BaseModel):
     model: str
     prompt: str
@@ -737,7 +792,7 @@ async def generate_completion(
             model = f"{model}:latest"
 
         if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
+            url_idx = choose_url_idx(model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -748,7 +803,9 @@ async def generate_completion(
     log.info(f"url: {url}")
 
     return await post_streaming_url(
-        f"{url}/api/generate", form_data.model_dump_json(exclude_none=True).encode()
+        f"{url}/api/generate",
+        form_data.model_dump_json(exclude_none=True).encode(),
+        base_url=url,
     )
 
 
@@ -775,7 +832,7 @@ def get_ollama_url(url_idx: Optional[int], model: str):
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(app.state.MODELS[model]["urls"])
+        url_idx = choose_url_idx(model)
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url
 
@@ -831,6 +888,7 @@ async def generate_chat_completion(
         json.dumps(payload),
         stream=form_data.stream,
         content_type="application/x-ndjson",
+        base_url=url,
     )
 
 
@@ -897,6 +955,7 @@ async def generate_openai_chat_completion(
         f"{url}/v1/chat/completions",
         json.dumps(payload),
         stream=payload.get("stream", False),
+        base_url=url,
     )
 
 
@@ -934,40 +993,20 @@ async def get_openai_models(
 
     else:
         url = app.state.config.OLLAMA_BASE_URLS[url_idx]
-        try:
-            r = requests.request(method="GET", url=f"{url}/api/tags")
-            r.raise_for_status()
-
-            models = r.json()
+        models = await send_request(f"{url}/api/tags")
 
-            return {
-                "data": [
-                    {
-                        "id": model["model"],
-                        "object": "model",
-                        "created": int(time.time()),
-                        "owned_by": "openai",
-                    }
-                    for model in models["models"]
-                ],
-                "object": "list",
-            }
-
-        except Exception as e:
-            log.exception(e)
-            error_detail = "Open WebUI: Server Connection Error"
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "error" in res:
-                        error_detail = f"Ollama: {res['error']}"
-                except Exception:
-                    error_detail = f"Ollama: {e}"
-
-            raise HTTPException(
-                status_code=r.status_code if r else 500,
-                detail=error_detail,
-            )
+        return {
+            "data": [
+                {
+                    "id": model["model"],
+                    "object": "model",
+                    "created": int(time.time()),
+                    "owned_by": "openai",
+                }
+                for model in models["models"]
+            ],
+            "object": "list",
+        }
 
 
 class UrlForm(BaseModel):
@@ -1024,11 +1063,11 @@ async def download_file_stream(
 
                 if done:
                     file.seek(0)
-                    hashed = calculate_sha256(file)
+                    hashed = await asyncio.to_thread(calculate_sha256, file)
                     file.seek(0)
 
                     url = f"{ollama_url}/api/blobs/sha256:{hashed}"
-                    response = requests.post(url, data=file)
+                    response = await asyncio.to_thread(requests.post, url, data=file)
 
                     if response.ok:
                         res = {
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import aiohttp
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.http import HTTP_SESSIONS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
+
+
+# Assumed seconds to first byte for an instance with no requests measured yet
+DEFAULT_LATENCY = 1.0
+
+
+class NodeState:
+    def __init__(self):
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.loaded_models: set[str] = set()
+
+
+class OllamaRouter:
+    """
+    Picks which of the Ollama instances serving a model gets a request.
+
+    Each instance costs its requests in flight times its EWMA latency to the
+    first byte, plus ``load_penalty`` seconds when the model is not loaded in
+    its memory (per /api/ps), so requests stick to the instances that already
+    have the model resident until those get busy.
+
+    An instance failing ``failure_threshold`` times in a row (connection
+    errors, timeouts, 5xx or failed health checks) is skipped for ``cooldown``
+    seconds, after which a single trial request decides whether it is back.
+
+    Thread-safe, the embedding threads route through it as well.
+    """
+
+    def __init__(
+        self,
+        get_urls: Callable[[], list[str]],
+        interval: float = 10,
+        failure_threshold: int = 3,
+        cooldown: float = 30,
+        load_penalty: float = 5,
+        alpha: float = 0.3,
+    ):
+        self.get_urls = get_urls
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.load_penalty = load_penalty
+        self.alpha = alpha
+
+        self._nodes: dict[str, NodeState] = {}
+        self._lock = threading.Lock()
+
+    def _node(self, url: str) -> NodeState:
+        node = self._nodes.get(url)
+        if node is None:
+            node = self._nodes[url] = NodeState()
+        return node
+
+    def _is_available(self, node: NodeState, now: float) -> bool:
+        if node.open_until == 0:
+            return True
+        # Half-open: let a single trial request through once cooled down
+        return now >= node.open_until and not node.probing
+
+    def _cost(self, node: NodeState, model: Optional[str]) -> float:
+        latency = node.latency if node.latency is not None else DEFAULT_LATENCY
+        cost = (node.in_flight + 1) * latency
+        if model and model not in node.loaded_models:
+            cost += self.load_penalty
+        return cost
+
+    def available(self, urls: list[str]) -> list[str]:
+        # Instances that are not skipped, or all of them if every one is
+        with self._lock:
+            now = time.monotonic()
+            healthy = [url for url in urls if self._is_available(self._node(url), now)]
+        return healthy or urls
+
+    def choose(self, urls: list[str], model: Optional[str] = None) -> str:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                url for url in urls if self._is_available(self._node(url), now)
+            ] or urls
+
+            costs = {url: self._cost(self._node(url), model) for url in candidates}
+            lowest = min(costs.values())
+            url = random.choice([url for url, cost in costs.items() if cost == lowest])
+
+            node = self._node(url)
+            if node.open_until and now >= node.open_until:
+                node.probing = True
+            if model:
+                # Ollama loads it there now, keep the next requests on it
+                node.loaded_models.add(model)
+            return url
+
+    def acquire(self, url: str):
+        with self._lock:
+            self._node(url).in_flight += 1
+
+    def release(self, url: str):
+        with self._lock:
+            node = self._node(url)
+            node.in_flight = max(node.in_flight - 1, 0)
+
+    def record_response(self, url: str, status: int, latency: Optional[float] = None):
+        if status >= 500:
+            self.record_failure(url)
+            return
+
+        with self._lock:
+            node = self._node(url)
+            if latency is not None:
+                node.latency = (
+                    latency
+                    if node.latency is None
+                    else self.alpha * latency + (1 - self.alpha) * node.latency
+                )
+            self._close(url, node)
+
+    def record_failure(self, url: str):
+        with self._lock:
+            node = self._node(url)
+            node.failures += 1
+            node.probing = False
+            if node.failures >= self.failure_threshold:
+                if node.open_until == 0:
+                    log.warning(
+                        f"Ollama {url} failed {node.failures} times, skipping it for {self.cooldown}s"
+                    )
+                node.open_until = time.monotonic() + self.cooldown
+
+    def _close(self, url: str, node: NodeState):
+        if node.open_until:
+            log.info(f"Ollama {url} is back")
+        node.failures = 0
+        node.open_until = 0.0
+        node.probing = False
+
+    async def check(self, url: str):
+        try:
+            session = HTTP_SESSIONS.get(url)
+            async with session.get(
+                f"{url}/api/ps", timeout=aiohttp.ClientTimeout(total=5)
+            ) as r:
+                if r.status == 404:
+                    # Ollama before 0.1.38 has no /api/ps, only check it is up
+                    loaded_models = None
+                else:
+                    r.raise_for_status()
+                    res = await r.json()
+                    loaded_models = {
+                        model.get("model", model.get("name"))
+                        for model in res.get("models", [])
+                    }
+        except Exception as e:
+            log.debug(f"Health check of {url} failed: {e!r}")
+            self.record_failure(url)
+            return
+
+        with self._lock:
+            node = self._node(url)
+            if loaded_models is not None:
+                node.loaded_models = loaded_models
+            self._close(url, node)
+
+    async def refresh(self):
+        urls = self.get_urls()
+        with self._lock:
+            for url in list(self._nodes):
+                if url not in urls:
+                    del self._nodes[url]
+
+        await asyncio.gather(*[self.check(url) for url in urls])
+
+    async def run(self):
+        while self.interval > 0:
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.exception(f"Ollama health check failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                url: {
+                    "in_flight": node.in_flight,
+                    "latency": node.latency,
+                    "failures": node.failures,
+                    "available": self._is_available(node, time.monotonic()),
+                    "loaded_models": sorted(node.loaded_models),
+                }
+                for url, node in self._nodes.items()
+            }
@@ -0,0 +1,302 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import numpy as np
+
+from open_webui.config import (
+    ENABLE_RAG_QUERY_EMBEDDING_DISK_CACHE,
+    OLLAMA_EMBEDDING_API,
+    RAG_CHUNK_EMBEDDING_CACHE_MAX_ENTRIES,
+    RAG_CHUNK_EMBEDDING_CACHE_PATH,
+    RAG_QUERY_EMBEDDING_CACHE_PATH,
+    RAG_QUERY_EMBEDDING_CACHE_SIZE,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def embedding_cache_key(engine: str, model: str, text: str) -> str:
+    if engine == "ollama":
+        # Ollama's two embedding endpoints return different vectors for a text
+        engine = f"ollama/{OLLAMA_EMBEDDING_API}"
+    return hashlib.sha256(f"{engine}\0{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of query embeddings with an optional SQLite tier on disk.
+
+    Concurrent lookups of the same missing key wait for a single computation,
+    so a query searched in several collections at once is embedded only once.
+    """
+
+    def __init__(self, max_size: int = 1024, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, list[float]] = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embedding "
+                    "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _load(self, key: str) -> Optional[list[float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT vector FROM query_embedding WHERE key = ?", (key,)
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32).tolist() if row else None
+
+    def _store(self, key: str, embedding: list[float]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embedding (key, vector) VALUES (?, ?)",
+                (key, np.asarray(embedding, dtype=np.float32).tobytes()),
+            )
+
+    def _remember(self, key: str, embedding: list[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self, engine: str, model: str, text: str, compute: Callable[[str], list]
+    ) -> list[float]:
+        if self.max_size <= 0:
+            return compute(text)
+
+        key = embedding_cache_key(engine, model, text)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+
+        if not owner:
+            with self._lock:
+                self.hits += 1
+            return future.result()
+
+        try:
+            embedding = self._load(key) if self.path else None
+            if embedding is None:
+                embedding = compute(text)
+                if embedding is not None and self.path:
+                    self._store(key, embedding)
+                with self._lock:
+                    self.misses += 1
+            else:
+                with self._lock:
+                    self.hits += 1
+
+            if embedding is not None:
+                with self._lock:
+                    self._remember(key, embedding)
+            future.set_result(embedding)
+            return embedding
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM query_embedding")
+        log.info("query embedding cache cleared")
+
+
+class ChunkEmbeddingCache:
+    """
+    Content-addressed store of document chunk embeddings in SQLite.
+
+    Entries are keyed by embedding engine, model and chunk text, so the same
+    chunk ingested into several collections is embedded once. The least
+    recently used entries beyond ``max_entries`` are evicted once every
+    ``evict_every`` written entries, so the table may exceed the limit by up
+    to that many entries in between.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(
+        self, path: str, max_entries: int = 1_000_000, evict_every: int = 10_000
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+        self._lock = threading.Lock()
+
+        if max_entries > 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chunk_embedding "
+                    "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS chunk_embedding_last_used "
+                    "ON chunk_embedding (last_used)"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), self.BATCH_SIZE):
+                batch = keys[i : i + self.BATCH_SIZE]
+                rows = conn.execute(
+                    "SELECT key, vector FROM chunk_embedding "
+                    f"WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(vector, dtype=np.float32).tolist())
+                    for key, vector in rows
+                )
+            conn.executemany(
+                "UPDATE chunk_embedding SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in found],
+            )
+        return found
+
+    def _put_many(self, entries: dict[str, list[float]]):
+        now = time.time()
+        with self._lock:
+            self._written += len(entries)
+            evict = self._written >= self.evict_every
+            if evict:
+                self._written = 0
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embedding (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in entries.items()
+                ],
+            )
+            if not evict:
+                return
+            (count,) = conn.execute("SELECT COUNT(*) FROM chunk_embedding").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM chunk_embedding WHERE key IN (SELECT key FROM "
+                    "chunk_embedding ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def embed(
+        self,
+        engine: str,
+        model: str,
+        texts: list[str],
+        embedding_function: Callable[[list[str]], list],
+    ) -> list[list[float]]:
+        # Embed only the chunks that are neither cached nor repeated in `texts`
+        if self.max_entries <= 0:
+            return embedding_function(texts)
+
+        keys = [embedding_cache_key(engine, model, text) for text in texts]
+        embeddings = self._get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in embeddings:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(zip(missing, embedding_function(list(missing.values()))))
+            self._put_many(computed)
+            embeddings.update(computed)
+
+        hits = len(texts) - len(missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+        log.info(
+            f"chunk embedding cache: {hits}/{len(texts)} chunks reused, "
+            f"{len(missing)} embedded"
+        )
+        return [embeddings[key] for key in keys]
+
+    def stats(self) -> dict:
+        entries = 0
+        if self.max_entries > 0:
+            with self._connect() as conn:
+                (entries,) = conn.execute(
+                    "SELECT COUNT(*) FROM chunk_embedding"
+                ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "entries": entries,
+        }
+
+    def clear(self):
+        if self.max_entries > 0:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM chunk_embedding")
+        log.info("chunk embedding cache cleared")
+
+
+QUERY_EMBEDDING_CACHE = QueryEmbeddingCache(
+    max_size=RAG_QUERY_EMBEDDING_CACHE_SIZE,
+    path=(
+        RAG_QUERY_EMBEDDING_CACHE_PATH
+        if ENABLE_RAG_QUERY_EMBEDDING_DISK_CACHE
+        else None
+    ),
+)
+
+CHUNK_EMBEDDING_CACHE = ChunkEmbeddingCache(
+    path=RAG_CHUNK_EMBEDDING_CACHE_PATH,
+    max_entries=RAG_CHUNK_EMBEDDING_CACHE_MAX_ENTRIES,
+)
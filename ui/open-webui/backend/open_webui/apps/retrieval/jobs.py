@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from open_webui.apps.socket.main import USER_POOL, sio
+from open_webui.apps.webui.models.ingestion_jobs import (
+    IngestionJobModel,
+    IngestionJobs,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+class LocalJobQueue:
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, job_id: str):
+        self.queue.put(job_id)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisJobQueue:
+    def __init__(self, redis_url: str, name: str = "open-webui:ingestion_queue"):
+        import redis
+
+        self.name = name
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def put(self, job_id: str):
+        self.redis.rpush(self.name, job_id)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        item = self.redis.blpop([self.name], timeout=int(timeout or 0))
+        return item[1] if item else None
+
+
+def get_job_queue(backend: str, redis_url: str):
+    if backend == "redis":
+        return RedisJobQueue(redis_url)
+    return LocalJobQueue()
+
+
+class IngestionWorkerPool:
+    """
+    Threads that take ingestion job ids off a queue and run them.
+
+    ``process(job, progress)`` does the work and returns the job result;
+    ``progress(stage, fraction)`` records how far along the job is. Every
+    change is persisted on the job row and pushed to the job owner's
+    socket.io sessions as an ``ingestion-events`` message.
+
+    A job only runs once it is claimed atomically on its row, so several
+    processes can share the queue and a job queued twice runs once. Running
+    jobs are heartbeated; jobs whose worker has not heartbeated for
+    ``job_timeout`` seconds are handed back to the queue.
+    """
+
+    def __init__(
+        self,
+        job_queue,
+        process: Callable[[IngestionJobModel, Callable], dict],
+        workers: int = 2,
+        job_timeout: float = 120,
+    ):
+        self.queue = job_queue
+        self.process = process
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._threads: list[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._stopped.clear()
+
+        if isinstance(self.queue, LocalJobQueue):
+            # Jobs queued in memory by a previous process are lost, the claim
+            # keeps the ones another live process also queued from running twice
+            for job in IngestionJobs.get_jobs_by_status(["pending"]):
+                log.info(f"requeueing ingestion job {job.id}")
+                self.queue.put(job.id)
+
+        for idx in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"ingestion-worker-{idx}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        thread = threading.Thread(
+            target=self._monitor, name="ingestion-monitor", daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, job: IngestionJobModel):
+        self.queue.put(job.id)
+        self._emit(job)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                job_id = self.queue.get(timeout=1)
+                if job_id:
+                    self._run_job(job_id)
+            except Exception as e:
+                log.exception(f"Ingestion worker error: {e}")
+
+    def _monitor(self):
+        # Heartbeat this process' jobs and requeue the ones whose worker died
+        while not self._stopped.is_set():
+            try:
+                IngestionJobs.heartbeat_jobs(self.owner)
+                stale = IngestionJobs.reset_stale_jobs(
+                    int(time.time() - self.job_timeout),
+                    pending=isinstance(self.queue, LocalJobQueue),
+                )
+                for job_id in stale:
+                    log.info(f"requeueing stale ingestion job {job_id}")
+                    self.queue.put(job_id)
+            except Exception as e:
+                log.exception(f"Ingestion monitor error: {e}")
+            self._stopped.wait(self.job_timeout / 4)
+
+    def _update(self, job_id: str, updated: dict):
+        job = IngestionJobs.update_job_by_id(job_id, updated)
+        if job:
+            self._emit(job)
+
+    def _run_job(self, job_id: str):
+        job = IngestionJobs.claim_job(job_id, self.owner)
+        if job is None:
+            # Finished, or claimed by another worker
+            return
+        self._emit(job)
+
+        def progress(stage: str, fraction: Optional[float] = None):
+            self._update(job.id, {"stage": stage, "progress": fraction})
+
+        try:
+            result = self.process(job, progress)
+            self._update(
+                job.id,
+                {
+                    "status": "completed",
+                    "stage": "done",
+                    "progress": 1.0,
+                    "result": result,
+                },
+            )
+        except Exception as e:
+            log.exception(f"Ingestion job {job.id} failed: {e}")
+            self._update(job.id, {"status": "failed", "error": str(e)})
+
+    def _emit(self, job: IngestionJobModel):
+        if self.loop is None:
+            return
+
+        async def emit():
+            for sid in USER_POOL.get(job.user_id, []):
+                await sio.emit(
+                    "ingestion-events",
+                    job.model_dump(exclude={"data"}),
+                    to=sid,
+                )
+
+        asyncio.run_coroutine_threadsafe(emit(), self.loop)
@@ -1,6 +1,7 @@
 import requests
 import logging
 import ftfy
+from typing import Iterator
 
 from langchain_community.document_loaders import (
     BSHTMLLoader,
@@ -112,6 +113,9 @@ class TikaLoader:
         else:
             raise Exception(f"Error calling Tika: {r.reason}")
 
+    def lazy_load(self) -> Iterator[Document]:
+        yield from self.load()
+
 
 class Loader:
     def __init__(self, engine: str = "", **kwargs):
@@ -121,15 +125,17 @@ class Loader:
     def load(
         self, filename: str, file_content_type: str, file_path: str
     ) -> list[Document]:
+        return list(self.lazy_load(filename, file_content_type, file_path))
+
+    def lazy_load(
+        self, filename: str, file_content_type: str, file_path: str
+    ) -> Iterator[Document]:
         loader = self._get_loader(filename, file_content_type, file_path)
-        docs = loader.load()
 
-        return [
-            Document(
+        for doc in loader.lazy_load():
+            yield Document(
                 page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
             )
-            for doc in docs
-        ]
 
     def _get_loader(self, filename: str, file_content_type: str, file_path: str):
         file_ext = filename.split(".")[-1].lower()
@@ -1,5 +1,8 @@
 # TODO: Merge this with the webui_app and make it a single app
 
+import collections
+import hashlib
+import itertools
 import json
 import logging
 import mimetypes
@@ -7,14 +10,21 @@ import os
 import shutil
 
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, Optional, Sequence, Union
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Union
 
 from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+from open_webui.apps.retrieval.embedding_cache import (
+    CHUNK_EMBEDDING_CACHE,
+    QUERY_EMBEDDING_CACHE,
+)
+from open_webui.apps.retrieval.jobs import IngestionWorkerPool, get_job_queue
+from open_webui.apps.retrieval.rerank_cache import RERANK_SCORE_CACHE
 from open_webui.apps.retrieval.vector.connector import VECTOR_DB_CLIENT
 
 # Document loaders
@@ -45,6 +55,10 @@ from open_webui.apps.retrieval.utils import (
 )
 
 from open_webui.apps.webui.models.files import Files
+from open_webui.apps.webui.models.ingestion_jobs import (
+    IngestionJobModel,
+    IngestionJobs,
+)
 from open_webui.config import (
     BRAVE_SEARCH_API_KEY,
     CHUNK_OVERLAP,
@@ -59,6 +73,8 @@ from open_webui.config import (
     GOOGLE_PSE_API_KEY,
     GOOGLE_PSE_ENGINE_ID,
     PDF_EXTRACT_IMAGES,
+    RAG_COLBERT_CACHE_DIR,
+    RAG_COLBERT_CACHE_MAX_ENTRIES,
     RAG_EMBEDDING_ENGINE,
     RAG_EMBEDDING_MODEL,
     RAG_EMBEDDING_MODEL_AUTO_UPDATE,
@@ -66,9 +82,14 @@ from open_webui.config import (
     RAG_EMBEDDING_OPENAI_BATCH_SIZE,
     RAG_FILE_MAX_COUNT,
     RAG_FILE_MAX_SIZE,
+    RAG_INGESTION_JOB_TIMEOUT,
+    RAG_INGESTION_QUEUE,
+    RAG_INGESTION_QUEUE_REDIS_URL,
+    RAG_INGESTION_WORKERS,
     RAG_OPENAI_API_BASE_URL,
     RAG_OPENAI_API_KEY,
     RAG_RELEVANCE_THRESHOLD,
+    RAG_RERANKING_BATCH_SIZE,
     RAG_RERANKING_MODEL,
     RAG_RERANKING_MODEL_AUTO_UPDATE,
     RAG_RERANKING_MODEL_TRUST_REMOTE_CODE,
@@ -186,6 +207,9 @@ def update_reranking_model(
     reranking_model: str,
     auto_update: bool = False,
 ):
+    # Scores cached for the previous model no longer apply
+    RERANK_SCORE_CACHE.clear()
+
     if reranking_model:
         if any(model in reranking_model for model in ["jinaai/jina-colbert-v2"]):
             try:
@@ -194,6 +218,8 @@ def update_reranking_model(
                 app.state.sentence_transformer_rf = ColBERT(
                     get_model_path(reranking_model, auto_update),
                     env="docker" if DOCKER else None,
+                    cache_dir=RAG_COLBERT_CACHE_DIR,
+                    cache_max_entries=RAG_COLBERT_CACHE_MAX_ENTRIES,
                 )
             except Exception as e:
                 log.error(f"ColBERT: {e}")
@@ -236,6 +262,9 @@ app.state.EMBEDDING_FUNCTION = get_embedding_function(
     app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
 )
 
+# Chunks split, embedded and inserted together while ingesting a document
+EMBEDDING_BATCH_SIZE = 100
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ALLOW_ORIGIN,
@@ -285,6 +314,14 @@ async def get_embedding_config(user=Depends(get_admin_user)):
     }
 
 
+@app.get("/embedding/cache")
+def get_embedding_cache_stats(user=Depends(get_admin_user)):
+    return {
+        "query": QUERY_EMBEDDING_CACHE.stats(),
+        "chunk": CHUNK_EMBEDDING_CACHE.stats(),
+    }
+
+
 @app.get("/reranking")
 async def get_reraanking_config(user=Depends(get_admin_user)):
     return {
@@ -293,6 +330,11 @@ async def get_reraanking_config(user=Depends(get_admin_user)):
     }
 
 
+@app.get("/reranking/cache")
+def get_reranking_cache_stats(user=Depends(get_admin_user)):
+    return RERANK_SCORE_CACHE.stats()
+
+
 class OpenAIConfigForm(BaseModel):
     url: str
     key: str
@@ -327,6 +369,9 @@ async def update_embedding_config(
                 )
 
         update_embedding_model(app.state.config.RAG_EMBEDDING_MODEL)
+        # The same engine and model name may now serve different embeddings
+        QUERY_EMBEDDING_CACHE.clear()
+        CHUNK_EMBEDDING_CACHE.clear()
 
         app.state.EMBEDDING_FUNCTION = get_embedding_function(
             app.state.config.RAG_EMBEDDING_ENGINE,
@@ -628,15 +673,33 @@ async def update_query_settings(
 ####################################
 
 
+def split_docs_lazily(
+    docs: Iterable[Document], split: bool = True
+) -> Iterator[tuple[int, Document]]:
+    # Yield (index of the source document, chunk) one document at a time
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=app.state.config.CHUNK_SIZE,
+        chunk_overlap=app.state.config.CHUNK_OVERLAP,
+        add_start_index=True,
+    )
+    for idx, doc in enumerate(docs):
+        for chunk in text_splitter.split_documents([doc]) if split else [doc]:
+            yield idx, chunk
+
+
 def save_docs_to_vector_db(
-    docs,
+    docs: Iterable[Document],
     collection_name,
     metadata: Optional[dict] = None,
     overwrite: bool = False,
     split: bool = True,
     add: bool = False,
+    progress: Optional[Callable[[str, Optional[float]], None]] = None,
 ) -> bool:
-    log.info(f"save_docs_to_vector_db {docs} {collection_name}")
+    # `docs` may be a generator such as `loader.lazy_load()`: documents are
+    # split, embedded and inserted EMBEDDING_BATCH_SIZE chunks at a time, and
+    # each batch is inserted while the next one is being embedded
+    log.info(f"save_docs_to_vector_db {collection_name}")
 
     # Check if entries with the same hash (metadata.hash) already exist
     if metadata and "hash" in metadata:
@@ -651,26 +714,13 @@ def save_docs_to_vector_db(
                 log.info(f"Document with hash {metadata['hash']} already exists")
                 raise ValueError(ERROR_MESSAGES.DUPLICATE_CONTENT)
 
-    if split:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=app.state.config.CHUNK_SIZE,
-            chunk_overlap=app.state.config.CHUNK_OVERLAP,
-            add_start_index=True,
-        )
-        docs = text_splitter.split_documents(docs)
+    total = len(docs) if isinstance(docs, Sequence) else None
+    chunks = split_docs_lazily(docs, split)
 
-    if len(docs) == 0:
+    first = next(chunks, None)
+    if first is None:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
-
-    texts = [doc.page_content for doc in docs]
-    metadatas = [{**doc.metadata, **(metadata if metadata else {})} for doc in docs]
-
-    # ChromaDB does not like datetime formats
-    # for meta-data so convert them to string.
-    for metadata in metadatas:
-        for key, value in metadata.items():
-            if isinstance(value, datetime):
-                metadata[key] = str(value)
+    chunks = itertools.chain([first], chunks)
 
     try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
@@ -693,24 +743,42 @@ def save_docs_to_vector_db(
             app.state.config.RAG_EMBEDDING_OPENAI_BATCH_SIZE,
         )
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts))
-        )
+        inserted_ids = []
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while batch := list(itertools.islice(chunks, EMBEDDING_BATCH_SIZE)):
+                    if progress:
+                        progress("embedding", batch[0][0] / total if total else None)
 
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
-
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
-        )
+                    items = embed_chunks(
+                        [chunk for _, chunk in batch], metadata, embedding_function
+                    )
+                    del batch
+
+                    # Keep at most one batch waiting on the vector database
+                    if pending:
+                        pending.result()
+                    pending = executor.submit(insert_chunks, collection_name, items)
+                    inserted_ids.extend(item["id"] for item in items)
+                    del items
+
+                if progress:
+                    progress("inserting", None)
+                if pending:
+                    pending.result()
+            except Exception:
+                if pending:
+                    wait([pending])
+                if inserted_ids:
+                    log.info(
+                        f"removing {len(inserted_ids)} partially inserted chunks "
+                        f"from {collection_name}"
+                    )
+                    VECTOR_DB_CLIENT.delete(
+                        collection_name=collection_name, ids=inserted_ids
+                    )
+                raise
 
         return True
     except Exception as e:
@@ -718,16 +786,93 @@ def save_docs_to_vector_db(
         return False
 
 
+def insert_chunks(collection_name: str, items: list[dict]):
+    VECTOR_DB_CLIENT.insert(collection_name=collection_name, items=items)
+
+    # Precompute the reranker's document embeddings (ColBERT token embeddings)
+    # so hybrid search only has to encode the query
+    reranking_function = app.state.sentence_transformer_rf
+    if app.state.config.ENABLE_RAG_HYBRID_SEARCH and hasattr(
+        reranking_function, "index_documents"
+    ):
+        try:
+            reranking_function.index_documents(
+                [item["id"] for item in items],
+                [item["text"] for item in items],
+                batch_size=RAG_RERANKING_BATCH_SIZE,
+            )
+        except Exception as e:
+            log.warning(f"Could not precompute reranking embeddings: {e}")
+
+
+def embed_chunks(
+    chunks: list[Document], metadata: Optional[dict], embedding_function
+) -> list[dict]:
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [
+        {**chunk.metadata, **(metadata if metadata else {})} for chunk in chunks
+    ]
+
+    # ChromaDB does not like datetime formats
+    # for meta-data so convert them to string.
+    for chunk_metadata in metadatas:
+        for key, value in chunk_metadata.items():
+            if isinstance(value, datetime):
+                chunk_metadata[key] = str(value)
+
+    embeddings = CHUNK_EMBEDDING_CACHE.embed(
+        app.state.config.RAG_EMBEDDING_ENGINE,
+        app.state.config.RAG_EMBEDDING_MODEL,
+        list(map(lambda x: x.replace("\n", " "), texts)),
+        embedding_function,
+    )
+
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "text": text,
+            "vector": embeddings[idx],
+            "metadata": metadatas[idx],
+        }
+        for idx, text in enumerate(texts)
+    ]
+
+
+class StreamedContent:
+    """
+    Joins the page contents of documents as they stream past, and hashes them
+    the same way as ``calculate_sha256_string`` of the joined text.
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.sha256 = hashlib.sha256()
+
+    def collect(self, docs: Iterable[Document]) -> Iterator[Document]:
+        for doc in docs:
+            if self.parts:
+                self.sha256.update(b" ")
+            self.sha256.update(doc.page_content.encode("utf-8"))
+            self.parts.append(doc.page_content)
+            yield doc
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.parts)
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+
 class ProcessFileForm(BaseModel):
     file_id: str
     content: Optional[str] = None
     collection_name: Optional[str] = None
 
 
-@app.post("/process/file")
-def process_file(
+def ingest_file(
     form_data: ProcessFileForm,
-    user=Depends(get_verified_user),
+    progress: Optional[Callable[[str, Optional[float]], None]] = None,
 ):
     try:
         file = Files.get_file_by_id(form_data.file_id)
@@ -737,6 +882,10 @@ def process_file(
         if collection_name is None:
             collection_name = f"file-{file.id}"
 
+        # Set when the file is loaded lazily: its text and hash are only known
+        # once every document went through save_docs_to_vector_db
+        streamed = None
+
         if form_data.content:
             # Update the content in the file
             # Usage: /files/{file_id}/data/content/update
@@ -795,14 +944,19 @@ def process_file(
 
             file_path = file.meta.get("path", None)
             if file_path:
+                if progress:
+                    progress("loading", None)
                 loader = Loader(
                     engine=app.state.config.CONTENT_EXTRACTION_ENGINE,
                     TIKA_SERVER_URL=app.state.config.TIKA_SERVER_URL,
                     PDF_EXTRACT_IMAGES=app.state.config.PDF_EXTRACT_IMAGES,
                 )
 
-                docs = loader.load(
-                    file.filename, file.meta.get("content_type"), file_path
+                streamed = StreamedContent()
+                docs = streamed.collect(
+                    loader.lazy_load(
+                        file.filename, file.meta.get("content_type"), file_path
+                    )
                 )
             else:
                 docs = [
@@ -817,29 +971,45 @@ def process_file(
                     )
                 ]
 
-            text_content = " ".join([doc.page_content for doc in docs])
+            if streamed is None:
+                text_content = " ".join([doc.page_content for doc in docs])
 
-        log.debug(f"text_content: {text_content}")
-        Files.update_file_data_by_id(
-            file.id,
-            {"content": text_content},
-        )
+        metadata = {
+            "file_id": file.id,
+            "name": file.meta.get("name", file.filename),
+        }
+        # A streamed file goes into its own new collection, so its chunks need
+        # no content hash to be checked for duplicates
+        if streamed is None:
+            log.debug(f"text_content: {text_content}")
+            Files.update_file_data_by_id(
+                file.id,
+                {"content": text_content},
+            )
 
-        hash = calculate_sha256_string(text_content)
-        Files.update_file_hash_by_id(file.id, hash)
+            hash = calculate_sha256_string(text_content)
+            Files.update_file_hash_by_id(file.id, hash)
+            metadata["hash"] = hash
 
         try:
             result = save_docs_to_vector_db(
                 docs=docs,
                 collection_name=collection_name,
-                metadata={
-                    "file_id": file.id,
-                    "name": file.meta.get("name", file.filename),
-                    "hash": hash,
-                },
+                metadata=metadata,
                 add=(True if form_data.collection_name else False),
+                progress=progress,
             )
 
+            if result and streamed is not None:
+                # Documents skipped because the collection already existed
+                collections.deque(docs, maxlen=0)
+                text_content = streamed.text
+                Files.update_file_data_by_id(
+                    file.id,
+                    {"content": text_content},
+                )
+                Files.update_file_hash_by_id(file.id, streamed.hexdigest())
+
             if result:
                 Files.update_file_metadata_by_id(
                     file.id,
@@ -870,6 +1040,72 @@ def process_file(
             )
 
 
+@app.post("/process/file")
+def process_file(
+    form_data: ProcessFileForm,
+    user=Depends(get_verified_user),
+):
+    return ingest_file(form_data)
+
+
+def run_ingestion_job(job: IngestionJobModel, progress) -> dict:
+    try:
+        result = ingest_file(ProcessFileForm(**job.data), progress=progress)
+    except HTTPException as e:
+        raise Exception(e.detail)
+
+    if not result:
+        raise Exception(ERROR_MESSAGES.DEFAULT())
+    return {
+        "collection_name": result["collection_name"],
+        "filename": result["filename"],
+    }
+
+
+app.state.INGESTION_WORKERS = IngestionWorkerPool(
+    get_job_queue(RAG_INGESTION_QUEUE, RAG_INGESTION_QUEUE_REDIS_URL),
+    run_ingestion_job,
+    workers=RAG_INGESTION_WORKERS,
+    job_timeout=RAG_INGESTION_JOB_TIMEOUT,
+)
+
+
+@app.post("/process/file/job")
+def enqueue_process_file(
+    form_data: ProcessFileForm,
+    user=Depends(get_verified_user),
+):
+    # Same as /process/file, but returns a job right away and reports progress
+    # through "ingestion-events" socket.io messages
+    file = Files.get_file_by_id(form_data.file_id)
+    if file is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    job = IngestionJobs.insert_new_job(user.id, file.id, form_data.model_dump())
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ERROR_MESSAGES.DEFAULT(),
+        )
+
+    app.state.INGESTION_WORKERS.submit(job)
+    return job.model_dump(exclude={"data"})
+
+
+@app.get("/process/file/job/{job_id}")
+def get_process_file_job(job_id: str, user=Depends(get_verified_user)):
+    job = IngestionJobs.get_job_by_id(job_id)
+    if job is None or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+    return job.model_dump(exclude={"data"})
+
+
 class ProcessTextForm(BaseModel):
     name: str
     content: str
@@ -1127,7 +1363,7 @@ def process_web_search(form_data: SearchForm, user=Depends(get_verified_user)):
         urls = [result.link for result in web_results]
 
         loader = get_web_loader(urls)
-        docs = loader.load()
+        docs = loader.lazy_load()
 
         save_docs_to_vector_db(docs, collection_name, overwrite=True)
 
@@ -1246,7 +1482,7 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 
             VECTOR_DB_CLIENT.delete(
                 collection_name=form_data.collection_name,
-                metadata={"hash": hash},
+                filter={"hash": hash},
             )
             return {"status": True}
         else:
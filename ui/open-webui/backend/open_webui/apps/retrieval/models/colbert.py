@@ -1,11 +1,86 @@
+import hashlib
 import os
+import threading
+from typing import Optional
+
 import torch
 import numpy as np
 from colbert.infra import ColBERTConfig
 from colbert.modeling.checkpoint import Checkpoint
 
 
+class DocumentEmbeddingStore:
+    """
+    Token embeddings of document chunks, one float16 .npy file per chunk id,
+    memory-mapped when read. The least recently used files are removed once
+    there are more than ``max_entries``.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.prune()
+
+    def _file(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest[:2], f"{digest}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self._file(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+            # Mark the entry as recently used
+            os.utime(path)
+            return array
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, array: np.ndarray):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial array
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array.astype(np.float16))
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        entries = []
+        for shard in os.scandir(self.path):
+            if shard.is_dir():
+                entries.extend(
+                    (entry.stat().st_mtime, entry.path)
+                    for entry in os.scandir(shard.path)
+                    if entry.name.endswith(".npy")
+                )
+
+        if len(entries) > self.max_entries:
+            entries.sort()
+            for _, path in entries[: len(entries) - self.max_entries]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
 class ColBERT:
+    # Scores are normalised over all the documents of a query, so they cannot
+    # be cached per query/document pair
+    pairwise_scores = False
+
     def __init__(self, name, **kwargs) -> None:
         print("ColBERT: Loading model", name)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -27,7 +102,20 @@ class ColBERT:
             name,
             colbert_config=ColBERTConfig(model_name=name),
         ).to(self.device)
-        pass
+
+        # Document embeddings depend on the model, so each model gets its own store
+        cache_dir = kwargs.get("cache_dir")
+        cache_max_entries = kwargs.get("cache_max_entries", 50000)
+        self.store = (
+            DocumentEmbeddingStore(
+                os.path.join(
+                    cache_dir, hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+                ),
+                max_entries=cache_max_entries,
+            )
+            if cache_dir and cache_max_entries > 0
+            else None
+        )
 
     def calculate_similarity_scores(self, query_embeddings, document_embeddings):
 
@@ -62,13 +150,49 @@ class ColBERT:
 
         return normalized_scores.detach().cpu().numpy().astype(np.float32)
 
-    def predict(self, sentences):
+    def embed_documents(
+        self,
+        docs: list[str],
+        ids: Optional[list[Optional[str]]] = None,
+        batch_size: int = 32,
+    ) -> list[torch.Tensor]:
+        # Token embeddings of each document, read from the store when the chunk
+        # was embedded before and computed (then stored) otherwise
+        ids = ids if self.store and ids else [None] * len(docs)
+
+        embeddings = [None] * len(docs)
+        for idx, id in enumerate(ids):
+            if id:
+                stored = self.store.get(id)
+                if stored is not None:
+                    embeddings[idx] = torch.from_numpy(stored.astype(np.float32))
+
+        missing = [idx for idx, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            D, doclens = self.ckpt.docFromText(
+                [docs[idx] for idx in missing], bsize=batch_size, keep_dims="flatten"
+            )
+            for idx, embedding in zip(missing, torch.split(D, doclens)):
+                embeddings[idx] = embedding.float()
+                if ids[idx]:
+                    self.store.put(ids[idx], embedding.numpy())
+
+        return embeddings
+
+    def index_documents(self, ids: list[str], docs: list[str], batch_size: int = 32):
+        # Precompute the embeddings of newly ingested chunks
+        if self.store:
+            self.embed_documents(docs, ids, batch_size)
+
+    def predict(self, sentences, batch_size: int = 32, ids=None):
 
         query = sentences[0][0]
         docs = [i[1] for i in sentences]
 
-        # Embedding the documents
-        embedded_docs = self.ckpt.docFromText(docs, bsize=32)[0]
+        # Embedding the documents, padded with zero vectors to the longest one
+        embedded_docs = torch.nn.utils.rnn.pad_sequence(
+            self.embed_documents(docs, ids, batch_size), batch_first=True
+        )
         # Embedding the queries
         embedded_queries = self.ckpt.queryFromText([query], bsize=32)
         embedded_query = embedded_queries[0]
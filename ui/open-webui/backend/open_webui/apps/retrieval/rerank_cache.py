@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from open_webui.config import RAG_RERANKING_SCORE_CACHE_SIZE
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def rerank_cache_key(query: str, chunk_id: str) -> tuple[str, str]:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest(), chunk_id
+
+
+class RerankScoreCache:
+    """
+    Bounded LRU of reranker scores keyed by (query hash, chunk id).
+
+    Only valid for rerankers that score every query/chunk pair on its own,
+    and must be cleared whenever the reranking model changes.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[tuple[str, str]]) -> dict[tuple[str, str], float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores: dict[tuple[str, str], float]):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        log.info("rerank score cache cleared")
+
+
+RERANK_SCORE_CACHE = RerankScoreCache(max_size=RAG_RERANKING_SCORE_CACHE_SIZE)
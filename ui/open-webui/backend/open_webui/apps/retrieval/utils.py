@@ -1,22 +1,31 @@
 import logging
 import os
+import time
 import uuid
-from typing import Optional, Union
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Optional, Union
 
+import numpy as np
 import requests
 
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
 
-from open_webui.apps.ollama.main import (
-    GenerateEmbeddingsForm,
-    generate_ollama_embeddings,
+from open_webui.apps.ollama.main import generate_ollama_batch_embeddings
+from open_webui.apps.retrieval.embedding_cache import QUERY_EMBEDDING_CACHE
+from open_webui.apps.retrieval.rerank_cache import (
+    RERANK_SCORE_CACHE,
+    rerank_cache_key,
 )
 from open_webui.apps.retrieval.vector.connector import VECTOR_DB_CLIENT
-from open_webui.utils.misc import get_last_user_message
+from open_webui.config import (
+    RAG_RERANKING_BATCH_SIZE,
+    RAG_RETRIEVAL_MAX_WORKERS,
+    RAG_RETRIEVAL_TIMEOUT,
+)
+from open_webui.utils.misc import calculate_sha256_string, get_last_user_message
 
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -24,6 +33,10 @@ from open_webui.env import SRC_LOG_LEVELS
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
+RETRIEVAL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=RAG_RETRIEVAL_MAX_WORKERS, thread_name_prefix="rag-retrieval"
+)
+
 
 from typing import Any
 
@@ -56,6 +69,7 @@ class VectorSearchRetriever(BaseRetriever):
         for idx in range(len(ids)):
             results.append(
                 Document(
+                    id=ids[idx],
                     metadata=metadatas[idx],
                     page_content=documents[idx],
                 )
@@ -63,6 +77,32 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class KeywordSearchRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        result = VECTOR_DB_CLIENT.keyword_search(
+            collection_name=self.collection_name,
+            query=query,
+            limit=self.top_k,
+        )
+        if not result:
+            return []
+
+        return [
+            Document(id=id, metadata=metadata, page_content=document)
+            for id, document, metadata in zip(
+                result.ids[0], result.documents[0], result.metadatas[0]
+            )
+        ]
+
+
 def query_doc(
     collection_name: str,
     query_embedding: list[float],
@@ -91,13 +131,10 @@ def query_doc_with_hybrid_search(
     r: float,
 ) -> dict:
     try:
-        result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
-
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=result.documents[0],
-            metadatas=result.metadatas[0],
+        bm25_retriever = KeywordSearchRetriever(
+            collection_name=collection_name,
+            top_k=k,
         )
-        bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -109,6 +146,7 @@ def query_doc_with_hybrid_search(
             retrievers=[bm25_retriever, vector_search_retriever], weights=[0.5, 0.5]
         )
         compressor = RerankCompressor(
+            collection_name=collection_name,
             embedding_function=embedding_function,
             top_n=k,
             reranking_function=reranking_function,
@@ -175,31 +213,57 @@ def merge_and_sort_query_results(
     return result
 
 
+def search_collections(
+    search: Callable[[str], dict],
+    collection_names,
+    timeout: Optional[float] = None,
+) -> tuple[dict, dict]:
+    # Run search(collection_name) for all collections concurrently. Searches still
+    # running after `timeout` seconds are abandoned, so callers get partial results.
+    futures = {
+        RETRIEVAL_EXECUTOR.submit(search, collection_name): collection_name
+        for collection_name in collection_names
+    }
+    done, pending = wait(futures, timeout=timeout)
+
+    for future in pending:
+        future.cancel()
+        log.warning(
+            f"Search of collection {futures[future]} did not finish within {timeout}s"
+        )
+
+    results = {}
+    errors = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            errors[futures[future]] = e
+    return results, errors
+
+
 def query_collection(
     collection_names: list[str],
     query: str,
     embedding_function,
     k: int,
+    timeout: Optional[float] = None,
 ) -> dict:
-
-    results = []
     query_embedding = embedding_function(query)
 
-    for collection_name in collection_names:
-        if collection_name:
-            try:
-                result = query_doc(
-                    collection_name=collection_name,
-                    k=k,
-                    query_embedding=query_embedding,
-                )
-                results.append(result.model_dump())
-            except Exception as e:
-                log.exception(f"Error when querying the collection: {e}")
-        else:
-            pass
+    results, errors = search_collections(
+        lambda collection_name: query_doc(
+            collection_name=collection_name,
+            k=k,
+            query_embedding=query_embedding,
+        ).model_dump(),
+        [collection_name for collection_name in collection_names if collection_name],
+        timeout=timeout,
+    )
+    for e in errors.values():
+        log.exception(f"Error when querying the collection: {e}", exc_info=e)
 
-    return merge_and_sort_query_results(results, k=k)
+    return merge_and_sort_query_results(list(results.values()), k=k)
 
 
 def query_collection_with_hybrid_search(
@@ -209,32 +273,32 @@ def query_collection_with_hybrid_search(
     k: int,
     reranking_function,
     r: float,
+    timeout: Optional[float] = None,
 ) -> dict:
-    results = []
-    error = False
-    for collection_name in collection_names:
-        try:
-            result = query_doc_with_hybrid_search(
-                collection_name=collection_name,
-                query=query,
-                embedding_function=embedding_function,
-                k=k,
-                reranking_function=reranking_function,
-                r=r,
-            )
-            results.append(result)
-        except Exception as e:
-            log.exception(
-                "Error when querying the collection with " f"hybrid_search: {e}"
-            )
-            error = True
+    results, errors = search_collections(
+        lambda collection_name: query_doc_with_hybrid_search(
+            collection_name=collection_name,
+            query=query,
+            embedding_function=embedding_function,
+            k=k,
+            reranking_function=reranking_function,
+            r=r,
+        ),
+        collection_names,
+        timeout=timeout,
+    )
+    for e in errors.values():
+        log.exception(
+            "Error when querying the collection with " f"hybrid_search: {e}",
+            exc_info=e,
+        )
 
-    if error:
+    if errors:
         raise Exception(
             "Hybrid search failed for all collections. Using Non hybrid search as fallback."
         )
 
-    return merge_and_sort_query_results(results, k=k, reverse=True)
+    return merge_and_sort_query_results(list(results.values()), k=k, reverse=True)
 
 
 def rag_template(template: str, context: str, query: str):
@@ -268,16 +332,17 @@ def get_embedding_function(
     batch_size,
 ):
     if embedding_engine == "":
-        return lambda query: embedding_function.encode(query).tolist()
+        return cache_query_embeddings(
+            embedding_engine,
+            embedding_model,
+            lambda query: embedding_function.encode(query).tolist(),
+        )
     elif embedding_engine in ["ollama", "openai"]:
         if embedding_engine == "ollama":
-            func = lambda query: generate_ollama_embeddings(
-                GenerateEmbeddingsForm(
-                    **{
-                        "model": embedding_model,
-                        "prompt": query,
-                    }
-                )
+            func = lambda query: (
+                generate_ollama_batch_embeddings(embedding_model, query)
+                if isinstance(query, list)
+                else generate_ollama_batch_embeddings(embedding_model, [query])[0]
             )
         elif embedding_engine == "openai":
             func = lambda query: generate_openai_embeddings(
@@ -295,11 +360,28 @@ def get_embedding_function(
                         embeddings.extend(f(query[i : i + batch_size]))
                     return embeddings
                 else:
-                    return [f(q) for q in query]
+                    return f(query)
             else:
                 return f(query)
 
-        return lambda query: generate_multiple(query, func)
+        return cache_query_embeddings(
+            embedding_engine,
+            embedding_model,
+            lambda query: generate_multiple(query, func),
+        )
+
+
+def cache_query_embeddings(embedding_engine, embedding_model, func):
+    # Single texts are queries and go through the shared cache; lists are
+    # document chunks being ingested and are always embedded
+    def embed(query):
+        if isinstance(query, list):
+            return func(query)
+        return QUERY_EMBEDDING_CACHE.get_or_compute(
+            embedding_engine, embedding_model, query, func
+        )
+
+    return embed
 
 
 def get_rag_context(
@@ -310,12 +392,19 @@ def get_rag_context(
     reranking_function,
     r,
     hybrid_search,
+    timeout: Optional[float] = RAG_RETRIEVAL_TIMEOUT,
 ):
     log.debug(f"files: {files} {messages} {embedding_function} {reranking_function}")
     query = get_last_user_message(messages)
 
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def remaining() -> Optional[float]:
+        return max(0, deadline - time.monotonic()) if deadline else None
+
     extracted_collections = []
-    relevant_contexts = []
+    # (file, context, collection names still to be searched for it)
+    file_contexts = []
 
     for file in files:
         if file.get("context") == "full":
@@ -323,9 +412,8 @@ def get_rag_context(
                 "documents": [[file.get("file").get("data", {}).get("content")]],
                 "metadatas": [[{"file_id": file.get("id"), "name": file.get("name")}]],
             }
+            file_contexts.append((file, context, None))
         else:
-            context = None
-
             collection_names = []
             if file.get("type") == "collection":
                 if file.get("legacy"):
@@ -345,39 +433,76 @@ def get_rag_context(
                 log.debug(f"skipping {file} as it has already been extracted")
                 continue
 
-            try:
-                context = None
-                if file.get("type") == "text":
-                    context = file["content"]
-                else:
-                    if hybrid_search:
-                        try:
-                            context = query_collection_with_hybrid_search(
-                                collection_names=collection_names,
-                                query=query,
-                                embedding_function=embedding_function,
-                                k=k,
-                                reranking_function=reranking_function,
-                                r=r,
-                            )
-                        except Exception as e:
-                            log.debug(
-                                "Error when using hybrid search, using"
-                                " non hybrid search as fallback."
-                            )
-
-                    if (not hybrid_search) or (context is None):
-                        context = query_collection(
-                            collection_names=collection_names,
-                            query=query,
-                            embedding_function=embedding_function,
-                            k=k,
-                        )
-            except Exception as e:
-                log.exception(e)
+            if file.get("type") == "text":
+                file_contexts.append((file, file["content"], None))
+            else:
+                file_contexts.append((file, None, collection_names))
 
             extracted_collections.extend(collection_names)
 
+    # All collections of all files are searched at once, within one time budget
+    collection_names = {
+        name for _, context, names in file_contexts if names for name in names
+    }
+
+    hybrid_results = {}
+    fallback_collections = set()
+    if hybrid_search and collection_names:
+        hybrid_results, errors = search_collections(
+            lambda collection_name: query_doc_with_hybrid_search(
+                collection_name=collection_name,
+                query=query,
+                embedding_function=embedding_function,
+                k=k,
+                reranking_function=reranking_function,
+                r=r,
+            ),
+            collection_names,
+            timeout=remaining(),
+        )
+        # A file falls back to non hybrid search if any of its collections failed
+        for _, context, names in file_contexts:
+            if names and names.intersection(errors):
+                log.debug(
+                    "Error when using hybrid search, using"
+                    " non hybrid search as fallback."
+                )
+                fallback_collections.update(names)
+    else:
+        fallback_collections = collection_names
+
+    results = {}
+    if fallback_collections:
+        try:
+            query_embedding = embedding_function(query)
+            results, errors = search_collections(
+                lambda collection_name: query_doc(
+                    collection_name=collection_name,
+                    k=k,
+                    query_embedding=query_embedding,
+                ).model_dump(),
+                fallback_collections,
+                timeout=remaining(),
+            )
+            for e in errors.values():
+                log.exception(f"Error when querying the collection: {e}", exc_info=e)
+        except Exception as e:
+            log.exception(e)
+
+    relevant_contexts = []
+    for file, context, names in file_contexts:
+        if names:
+            if names.intersection(fallback_collections):
+                context = merge_and_sort_query_results(
+                    [results[name] for name in names if name in results], k=k
+                )
+            else:
+                context = merge_and_sort_query_results(
+                    [hybrid_results[name] for name in names if name in hybrid_results],
+                    k=k,
+                    reverse=True,
+                )
+
         if context:
             relevant_contexts.append({**context, "file": file})
 
@@ -493,6 +618,7 @@ class RerankCompressor(BaseDocumentCompressor):
     top_n: int
     reranking_function: Any
     r_score: float
+    collection_name: Optional[str] = None
 
     class Config:
         extra = "forbid"
@@ -504,20 +630,21 @@ class RerankCompressor(BaseDocumentCompressor):
         query: str,
         callbacks: Optional[Callbacks] = None,
     ) -> Sequence[Document]:
+        if len(documents) == 0:
+            return []
+
         reranking = self.reranking_function is not None
 
         if reranking:
-            scores = self.reranking_function.predict(
-                [(query, doc.page_content) for doc in documents]
-            )
+            scores = self.rerank(documents, query)
         else:
-            from sentence_transformers import util
-
-            query_embedding = self.embedding_function(query)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents]
+            query_embedding = np.asarray(self.embedding_function(query))
+            document_embeddings = np.asarray(self.get_document_embeddings(documents))
+            scores = (document_embeddings @ query_embedding) / np.maximum(
+                np.linalg.norm(document_embeddings, axis=1)
+                * np.linalg.norm(query_embedding),
+                1e-12,
             )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
 
         docs_with_scores = list(zip(documents, scores.tolist()))
         if self.r_score:
@@ -536,3 +663,57 @@ class RerankCompressor(BaseDocumentCompressor):
             )
             final_results.append(doc)
         return final_results
+
+    def get_document_embeddings(self, documents: Sequence[Document]) -> list:
+        # Reuse the vectors stored with the chunks and only embed the documents
+        # that have none, e.g. when the vector database cannot return them
+        vectors = {}
+        ids = [doc.id for doc in documents if doc.id]
+        if self.collection_name and ids:
+            try:
+                vectors = VECTOR_DB_CLIENT.get_vectors(
+                    collection_name=self.collection_name, ids=ids
+                )
+            except Exception as e:
+                log.warning(f"Could not fetch stored vectors: {e}")
+
+        missing = [doc.page_content for doc in documents if doc.id not in vectors]
+        computed = iter(self.embedding_function(missing) if missing else [])
+        return [
+            vectors[doc.id] if doc.id in vectors else next(computed)
+            for doc in documents
+        ]
+
+    def rerank(self, documents: Sequence[Document], query: str) -> np.ndarray:
+        pairs = [(query, doc.page_content) for doc in documents]
+
+        if not getattr(self.reranking_function, "pairwise_scores", True):
+            # ColBERT reuses the document embeddings it stored for these chunk ids
+            return np.asarray(
+                self.reranking_function.predict(
+                    pairs,
+                    batch_size=RAG_RERANKING_BATCH_SIZE,
+                    ids=[doc.id for doc in documents],
+                )
+            )
+
+        keys = [
+            rerank_cache_key(query, doc.id or calculate_sha256_string(doc.page_content))
+            for doc in documents
+        ]
+        scores = RERANK_SCORE_CACHE.get_many(keys)
+
+        missing = [idx for idx, key in enumerate(keys) if key not in scores]
+        if missing:
+            # Score pairs of similar length together so batches carry little padding
+            missing.sort(key=lambda idx: len(pairs[idx][1]))
+            predicted = self.reranking_function.predict(
+                [pairs[idx] for idx in missing], batch_size=RAG_RERANKING_BATCH_SIZE
+            )
+            computed = {
+                keys[idx]: float(score) for idx, score in zip(missing, predicted)
+            }
+            RERANK_SCORE_CACHE.put_many(computed)
+            scores.update(computed)
+
+        return np.asarray([scores[key] for key in keys])
@@ -0,0 +1,504 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+from open_webui.apps.retrieval.vector.main import SearchResult, VectorItem
+from open_webui.env import SRC_LOG_LEVELS
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class _Segment:
+    # An immutable batch of indexed chunks. Postings and per-document arrays are
+    # memory-mapped so every worker process shares the same pages; only the
+    # vocabulary and the live mask are held in memory.
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "vocab.json")) as f:
+            self.vocab = json.load(f)
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "lengths.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.load_live()
+
+    def load_live(self):
+        self.live = _load_live(self.path)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.vocab.get(term, (0, 0))
+        return self.docs[start:end], self.tfs[start:end]
+
+    def read(self, idx: int) -> dict:
+        with open(os.path.join(self.path, "store.jsonl"), "rb") as f:
+            f.seek(int(self.offsets[idx]))
+            return json.loads(f.read(int(self.offsets[idx + 1] - self.offsets[idx])))
+
+
+def _load_live(path: str) -> np.ndarray:
+    return np.load(os.path.join(path, "live.npy"))
+
+
+def _read_live_chunks(path: str):
+    live = _load_live(path)
+    with open(os.path.join(path, "store.jsonl"), "rb") as f:
+        for idx, line in enumerate(f):
+            if live[idx]:
+                yield json.loads(line)
+
+
+def _save_array(path: str, name: str, array: np.ndarray):
+    tmp = os.path.join(path, f".{name}.{uuid.uuid4().hex}")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, os.path.join(path, name))
+
+
+def _write_json(path: str, data):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class _CollectionReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.version = None
+        self.segments: dict[str, _Segment] = {}
+
+    def refresh(self):
+        # The manifest is replaced atomically by writers; re-open only what changed
+        for attempt in range(3):
+            try:
+                with open(os.path.join(self.path, "manifest.json")) as f:
+                    manifest = json.load(f)
+                if manifest["version"] == self.version:
+                    return
+                segments = {}
+                for name in manifest["segments"]:
+                    segment = self.segments.get(name)
+                    if segment is None:
+                        segment = _Segment(os.path.join(self.path, name))
+                    else:
+                        segment.load_live()
+                    segments[name] = segment
+                self.segments = segments
+                self.version = manifest["version"]
+                return
+            except FileNotFoundError:
+                # A concurrent compaction removed a segment listed in the manifest we read
+                if attempt == 2:
+                    raise
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index, one directory per collection.
+
+    Every insert writes a new immutable segment; deletes only flip the
+    segment's live mask. Segments are grouped in tiers by their number of
+    live chunks, each tier ``segments_per_tier`` times larger than the one
+    below, and the segments of a tier are merged once it holds
+    ``segments_per_tier`` of them. A chunk is thus rewritten once per tier
+    rather than on every insert. The whole index is only rewritten once too
+    many of its chunks are deleted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        segments_per_tier: int = 8,
+        max_deleted_ratio: float = 0.3,
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.segments_per_tier = segments_per_tier
+        self.max_deleted_ratio = max_deleted_ratio
+        self._readers: dict[str, _CollectionReader] = {}
+        self._lock = threading.RLock()
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.path, re.sub(r"[^\w.-]", "_", collection_name))
+
+    def _reader(self, collection_name: str) -> _CollectionReader:
+        with self._lock:
+            path = self._collection_path(collection_name)
+            reader = self._readers.get(collection_name)
+            if reader is None or reader.path != path:
+                reader = self._readers[collection_name] = _CollectionReader(path)
+            reader.refresh()
+            return reader
+
+    @contextmanager
+    def _write_lock(self, collection_name: str):
+        path = self._collection_path(collection_name)
+        os.makedirs(path, exist_ok=True)
+        with self._lock, open(os.path.join(path, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self, path: str) -> dict:
+        try:
+            with open(os.path.join(path, "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": None, "segments": []}
+
+    def _write_segment(self, path: str, chunks: list[dict]) -> str:
+        name = f"seg-{uuid.uuid4().hex}"
+        tmp = os.path.join(path, f".{name}")
+        os.makedirs(tmp)
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = np.zeros(len(chunks), dtype=np.int32)
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        with open(os.path.join(tmp, "store.jsonl"), "wb") as f:
+            for idx, chunk in enumerate(chunks):
+                tokens = tokenize(chunk["text"])
+                lengths[idx] = len(tokens)
+                for term, tf in Counter(tokens).items():
+                    postings.setdefault(term, []).append((idx, tf))
+
+                line = json.dumps(chunk, default=str).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets[idx + 1] = offsets[idx] + len(line)
+
+        vocab = {}
+        docs, tfs = [], []
+        for term in sorted(postings):
+            vocab[term] = (len(docs), len(docs) + len(postings[term]))
+            for idx, tf in postings[term]:
+                docs.append(idx)
+                tfs.append(tf)
+
+        _save_array(tmp, "docs.npy", np.asarray(docs, dtype=np.int32))
+        _save_array(tmp, "tfs.npy", np.asarray(tfs, dtype=np.float32))
+        _save_array(tmp, "lengths.npy", lengths)
+        _save_array(tmp, "offsets.npy", offsets)
+        _save_array(tmp, "live.npy", np.ones(len(chunks), dtype=bool))
+        _write_json(os.path.join(tmp, "vocab.json"), vocab)
+        _write_json(os.path.join(tmp, "ids.json"), [chunk["id"] for chunk in chunks])
+
+        os.rename(tmp, os.path.join(path, name))
+        return name
+
+    def _commit(self, path: str, segments: list[str]):
+        # A fresh version on every write tells readers in all workers to refresh,
+        # also when a collection is dropped and created again
+        _write_json(
+            os.path.join(path, "manifest.json"),
+            {"version": uuid.uuid4().hex, "segments": segments},
+        )
+
+    def _tier(self, size: int) -> int:
+        tier = 0
+        while size >= self.segments_per_tier:
+            size //= self.segments_per_tier
+            tier += 1
+        return tier
+
+    def _maybe_compact(self, path: str, collection_name: str):
+        manifest = self._read_manifest(path)
+        lives = {
+            name: _load_live(os.path.join(path, name)) for name in manifest["segments"]
+        }
+        sizes = {name: int(live.sum()) for name, live in lives.items()}
+        total = sum(len(live) for live in lives.values())
+        deleted = total - sum(sizes.values())
+        if total and deleted / total > self.max_deleted_ratio:
+            log.info(
+                f"compacting bm25 index {collection_name}: "
+                f"{len(sizes)} segments, {deleted}/{total} deleted"
+            )
+            chunks = [
+                chunk
+                for name in manifest["segments"]
+                for chunk in _read_live_chunks(os.path.join(path, name))
+            ]
+            self._replace(path, manifest, [self._write_segment(path, chunks)])
+            return
+
+        # Merge the lowest full tier, which may fill the tier above it
+        segments = list(manifest["segments"])
+        while True:
+            tiers: dict[int, list[str]] = {}
+            for name, size in sizes.items():
+                tiers.setdefault(self._tier(size), []).append(name)
+            full = [
+                tier
+                for tier, names in tiers.items()
+                if len(names) >= self.segments_per_tier
+            ]
+            if not full:
+                return
+
+            merged = tiers[min(full)]
+            chunks = [
+                chunk
+                for name in merged
+                for chunk in _read_live_chunks(os.path.join(path, name))
+            ]
+            log.debug(
+                f"merging {len(merged)} bm25 segments of {collection_name} "
+                f"({len(chunks)} chunks)"
+            )
+            name = self._write_segment(path, chunks)
+            for old in merged:
+                del sizes[old]
+            sizes[name] = len(chunks)
+
+            segments = [old for old in segments if old not in merged] + [name]
+            self._commit(path, segments)
+            for old in merged:
+                shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+    def _replace(self, path: str, manifest: dict, segments: list[str]):
+        self._commit(path, segments)
+        for name in manifest["segments"]:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    def exists(self, collection_name: str) -> bool:
+        return os.path.exists(
+            os.path.join(self._collection_path(collection_name), "manifest.json")
+        )
+
+    def add(self, collection_name: str, items: list[VectorItem], replace: bool = False):
+        # With replace=True the items become the whole content of the collection's index
+        chunks = [
+            {"id": item["id"], "text": item["text"], "metadata": item["metadata"]}
+            for item in items
+        ]
+        with self._write_lock(collection_name) as path:
+            manifest = self._read_manifest(path)
+            if replace:
+                self._replace(path, manifest, [self._write_segment(path, chunks)])
+                return
+
+            segments = list(manifest["segments"])
+            if chunks:
+                segments.append(self._write_segment(path, chunks))
+            self._commit(path, segments)
+            self._maybe_compact(path, collection_name)
+
+    def delete(self, collection_name: str, ids: list[str]):
+        if not self.exists(collection_name):
+            return
+
+        ids = set(ids)
+        with self._write_lock(collection_name) as path:
+            manifest = self._read_manifest(path)
+            for name in manifest["segments"]:
+                segment_path = os.path.join(path, name)
+                with open(os.path.join(segment_path, "ids.json")) as f:
+                    positions = [
+                        idx for idx, id in enumerate(json.load(f)) if id in ids
+                    ]
+                if positions:
+                    live = _load_live(segment_path)
+                    live[positions] = False
+                    _save_array(segment_path, "live.npy", live)
+            self._commit(path, manifest["segments"])
+            self._maybe_compact(path, collection_name)
+
+    def drop(self, collection_name: str):
+        with self._lock:
+            self._readers.pop(collection_name, None)
+            shutil.rmtree(self._collection_path(collection_name), ignore_errors=True)
+
+    def reset(self):
+        with self._lock:
+            self._readers.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def search(self, collection_name: str, query: str, limit: int) -> list[tuple]:
+        """
+        :return: ``(score, chunk)`` pairs of the best matching live chunks,
+            where ``chunk`` holds the ``id``, ``text`` and ``metadata``
+        """
+        terms = Counter(tokenize(query))
+        segments = list(self._reader(collection_name).segments.values())
+
+        n = sum(int(segment.live.sum()) for segment in segments)
+        if not terms or n == 0:
+            return []
+        avgdl = (
+            sum(int(segment.lengths[segment.live].sum()) for segment in segments) / n
+        )
+
+        scores = [np.zeros(len(segment.live), dtype=np.float32) for segment in segments]
+        for term, query_tf in terms.items():
+            postings = [segment.postings(term) for segment in segments]
+            df = sum(
+                int(segment.live[docs].sum())
+                for segment, (docs, _) in zip(segments, postings)
+            )
+            if df == 0:
+                continue
+
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for segment, segment_scores, (docs, tfs) in zip(segments, scores, postings):
+                if len(docs) == 0:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs] / avgdl)
+                segment_scores[docs] += (
+                    query_tf * idf * tfs * (self.k1 + 1) / (tfs + norm)
+                )
+
+        candidates = []
+        for segment, segment_scores in zip(segments, scores):
+            segment_scores[~segment.live] = 0
+            top = np.flatnonzero(segment_scores)
+            if len(top) > limit:
+                top = top[np.argpartition(-segment_scores[top], limit - 1)[:limit]]
+            candidates.extend((float(segment_scores[idx]), segment, idx) for idx in top)
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [
+            (score, segment.read(int(idx)))
+            for score, segment, idx in candidates[:limit]
+        ]
+
+
+class BM25IndexedClient:
+    """
+    Wraps a vector database client so every write also maintains the BM25
+    index used by hybrid search. All other calls are passed through.
+    """
+
+    def __init__(self, client, index: BM25Index):
+        self.client = client
+        self.index = index
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _update_index(self, collection_name: str, update):
+        # The vector database stays the source of truth: a broken index is
+        # dropped and rebuilt from it on the next keyword search
+        try:
+            update()
+        except Exception as e:
+            log.exception(f"Error updating the bm25 index of {collection_name}: {e}")
+            self.index.drop(collection_name)
+
+    def _build_index(self, collection_name: str):
+        result = self.client.get(collection_name=collection_name)
+        items = []
+        if result and result.ids:
+            items = [
+                {"id": id, "text": text, "metadata": metadata}
+                for id, text, metadata in zip(
+                    result.ids[0], result.documents[0], result.metadatas[0]
+                )
+            ]
+        log.info(f"building bm25 index for {collection_name} ({len(items)} chunks)")
+        self.index.add(collection_name, items, replace=True)
+
+    def delete_collection(self, collection_name: str):
+        self.index.drop(collection_name)
+        return self.client.delete_collection(collection_name=collection_name)
+
+    def _is_indexed(self, collection_name: str) -> bool:
+        # Collections created from now on are indexed as they are filled; older
+        # ones are indexed in one go by their first keyword search
+        return self.index.exists(collection_name) or not self.client.has_collection(
+            collection_name=collection_name
+        )
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        indexed = self._is_indexed(collection_name)
+        result = self.client.insert(collection_name=collection_name, items=items)
+        if indexed:
+            self._update_index(
+                collection_name, lambda: self.index.add(collection_name, items)
+            )
+        return result
+
+    def upsert(self, collection_name: str, items: list[VectorItem]):
+        indexed = self._is_indexed(collection_name)
+        result = self.client.upsert(collection_name=collection_name, items=items)
+        if indexed:
+
+            def update():
+                self.index.delete(collection_name, [item["id"] for item in items])
+                self.index.add(collection_name, items)
+
+            self._update_index(collection_name, update)
+        return result
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        if self.index.exists(collection_name) and not ids and filter:
+            # Resolve the filter before the matching chunks are gone
+            result = self.client.query(collection_name=collection_name, filter=filter)
+            deleted_ids = result.ids[0] if result and result.ids else []
+        else:
+            deleted_ids = ids or []
+
+        result = self.client.delete(
+            collection_name=collection_name, ids=ids, filter=filter
+        )
+        if deleted_ids:
+            self._update_index(
+                collection_name, lambda: self.index.delete(collection_name, deleted_ids)
+            )
+        return result
+
+    def reset(self):
+        self.index.reset()
+        return self.client.reset()
+
+    def keyword_search(
+        self, collection_name: str, query: str, limit: int
+    ) -> Optional[SearchResult]:
+        # Search the collection by BM25 score, indexing it first if it predates the index
+        if not self.index.exists(collection_name):
+            if not self.client.has_collection(collection_name=collection_name):
+                return None
+            self._build_index(collection_name)
+
+        results = self.index.search(collection_name, query, limit)
+        return SearchResult(
+            **{
+                "ids": [[chunk["id"] for _, chunk in results]],
+                "distances": [[score for score, _ in results]],
+                "documents": [[chunk["text"] for _, chunk in results]],
+                "metadatas": [[chunk["metadata"] for _, chunk in results]],
+            }
+        )
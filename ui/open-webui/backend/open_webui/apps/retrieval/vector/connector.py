@@ -1,10 +1,17 @@
-from open_webui.config import VECTOR_DB
+from open_webui.apps.retrieval.vector.bm25 import BM25Index, BM25IndexedClient
+from open_webui.config import BM25_INDEX_DIR, VECTOR_DB
 
 if VECTOR_DB == "milvus":
     from open_webui.apps.retrieval.vector.dbs.milvus import MilvusClient
 
     VECTOR_DB_CLIENT = MilvusClient()
+elif VECTOR_DB == "hnsw":
+    from open_webui.apps.retrieval.vector.dbs.hnsw import HNSWClient
+
+    VECTOR_DB_CLIENT = HNSWClient()
 else:
     from open_webui.apps.retrieval.vector.dbs.chroma import ChromaClient
 
     VECTOR_DB_CLIENT = ChromaClient()
+
+VECTOR_DB_CLIENT = BM25IndexedClient(VECTOR_DB_CLIENT, BM25Index(BM25_INDEX_DIR))
@@ -107,6 +107,17 @@ class ChromaClient:
             )
         return None
 
+    def get_vectors(self, collection_name: str, ids: list[str]) -> dict:
+        # Get the stored vectors of the items with the given ids.
+        collection = self.client.get_collection(name=collection_name)
+        if collection:
+            result = collection.get(ids=ids, include=["embeddings"])
+            return {
+                id: list(embedding)
+                for id, embedding in zip(result["ids"], result["embeddings"])
+            }
+        return {}
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection = self.client.get_or_create_collection(name=collection_name)
@@ -0,0 +1,563 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import hnswlib
+import numpy as np
+
+from open_webui.apps.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.config import (
+    HNSW_DATA_PATH,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Filtered searches matching at most this many items are scored exactly
+EXACT_SEARCH_LIMIT = 4096
+# Labels added since the last saved graph before a new one is saved
+CHECKPOINT_EVERY = 10000
+# Bound on the variables of a single SQLite statement
+SQL_BATCH_SIZE = 500
+
+
+class _ReadWriteLock:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(os.path.join(path, "items.db"), timeout=30)
+
+
+def _read_state(conn: sqlite3.Connection) -> dict:
+    state = dict(conn.execute("SELECT key, value FROM state").fetchall())
+    (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM deletions").fetchone()
+    return {
+        "uid": state["uid"],
+        "dim": int(state["dim"]),
+        "next_label": int(state["next_label"]),
+        "seq": seq,
+    }
+
+
+def _select_in(
+    conn: sqlite3.Connection, select: str, column: str, values: list
+) -> list[tuple]:
+    rows = []
+    for i in range(0, len(values), SQL_BATCH_SIZE):
+        batch = values[i : i + SQL_BATCH_SIZE]
+        rows.extend(
+            conn.execute(
+                f"{select} WHERE {column} IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+        )
+    return rows
+
+
+def _filter_clause(filter: Optional[dict]) -> tuple[str, list]:
+    if not filter:
+        return "", []
+    return (
+        " AND ".join("json_extract(metadata, ?) = ?" for _ in filter),
+        [value for key, value in filter.items() for value in (f'$."{key}"', value)],
+    )
+
+
+class _Collection:
+    """
+    HNSW graph of one collection, held in memory by every process.
+
+    The SQLite sidecar is the source of truth: items get increasing labels,
+    their vectors are appended to a memory-mapped file at that row, and
+    deletions are logged. Each process catches its graph up from there before
+    searching, so writes from any uvicorn worker are visible to all of them.
+    """
+
+    def __init__(self, path: str, uid: str, dim: int):
+        self.path = path
+        self.uid = uid
+        self.dim = dim
+        self.lock = _ReadWriteLock()
+
+        self.next_label = 0
+        self.seq = 0
+        self.deleted = 0
+        self.checkpoint_label = 0
+        self._vectors = None
+
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        if not self._load_checkpoint():
+            self.index.init_index(
+                max_elements=1024, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M
+            )
+        self.index.set_ef(HNSW_EF_SEARCH)
+
+    def _load_checkpoint(self) -> bool:
+        try:
+            with open(os.path.join(self.path, "checkpoint.json")) as f:
+                checkpoint = json.load(f)
+            if checkpoint["uid"] != self.uid:
+                return False
+            self.index.load_index(
+                os.path.join(self.path, checkpoint["file"]),
+                max_elements=checkpoint["next_label"] + 1024,
+            )
+        except (FileNotFoundError, RuntimeError, ValueError, KeyError):
+            return False
+
+        self.next_label = self.checkpoint_label = checkpoint["next_label"]
+        self.seq = checkpoint["seq"]
+        self.deleted = checkpoint["deleted"]
+        return True
+
+    def save_checkpoint(self):
+        # Called with the collection's write lock held, so one process saves at a time
+        name = f"index-{uuid.uuid4().hex}.bin"
+        with self.lock.read():
+            self.index.save_index(os.path.join(self.path, name))
+            checkpoint = {
+                "uid": self.uid,
+                "file": name,
+                "next_label": self.next_label,
+                "seq": self.seq,
+                "deleted": self.deleted,
+            }
+
+        checkpoint_path = os.path.join(self.path, "checkpoint.json")
+        tmp_path = f"{checkpoint_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, checkpoint_path)
+
+        for entry in os.scandir(self.path):
+            if entry.name.startswith("index-") and entry.name != name:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        self.checkpoint_label = checkpoint["next_label"]
+
+    def vectors(self, next_label: int) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) < next_label:
+            self._vectors = np.memmap(
+                os.path.join(self.path, "vectors.f32"), dtype=np.float32, mode="r"
+            ).reshape(-1, self.dim)
+        return self._vectors
+
+    def catch_up(self, conn: sqlite3.Connection, state: dict):
+        if state["next_label"] == self.next_label and state["seq"] == self.seq:
+            return
+
+        with self.lock.write():
+            if state["next_label"] > self.next_label:
+                labels = [
+                    label
+                    for (label,) in conn.execute(
+                        "SELECT label FROM items WHERE label >= ? AND label < ? "
+                        "ORDER BY label",
+                        (self.next_label, state["next_label"]),
+                    )
+                ]
+                if labels:
+                    if self.index.element_count + len(labels) > self.index.max_elements:
+                        self.index.resize_index(
+                            max(
+                                2 * self.index.max_elements,
+                                self.index.element_count + len(labels),
+                            )
+                        )
+                    self.index.add_items(
+                        self.vectors(state["next_label"])[labels], labels
+                    )
+                self.next_label = state["next_label"]
+
+            for (label,) in conn.execute(
+                "SELECT label FROM deletions WHERE seq > ? AND seq <= ?",
+                (self.seq, state["seq"]),
+            ):
+                try:
+                    self.index.mark_deleted(label)
+                    self.deleted += 1
+                except RuntimeError:
+                    # Added and deleted since the last catch up, so never added
+                    pass
+            self.seq = max(self.seq, state["seq"])
+
+    def knn(
+        self, vector: np.ndarray, limit: int, allowed: Optional[list[int]] = None
+    ) -> tuple[list[int], list[float]]:
+        if allowed is not None and len(allowed) <= EXACT_SEARCH_LIMIT:
+            return self.exact(vector, limit, allowed)
+
+        live = self.index.element_count - self.deleted
+        k = min(limit, live if allowed is None else len(allowed))
+        if k <= 0:
+            return [], []
+
+        allowed_labels = set(allowed) if allowed is not None else None
+        try:
+            self.index.set_ef(max(HNSW_EF_SEARCH, k))
+            labels, distances = self.index.knn_query(
+                vector,
+                k=k,
+                filter=allowed_labels.__contains__ if allowed_labels else None,
+            )
+            return labels[0].tolist(), distances[0].tolist()
+        except RuntimeError:
+            # The graph could not reach k items (e.g. a very selective filter)
+            if allowed is None:
+                allowed = [
+                    label
+                    for label in self.index.get_ids_list()
+                    if label < self.next_label
+                ]
+            return self.exact(vector, limit, allowed)
+
+    def exact(
+        self, vector: np.ndarray, limit: int, allowed: list[int]
+    ) -> tuple[list[int], list[float]]:
+        if not allowed:
+            return [], []
+
+        labels = np.asarray(sorted(allowed))
+        candidates = np.asarray(self.vectors(self.next_label)[labels])
+        norms = np.linalg.norm(candidates, axis=1) * np.linalg.norm(vector)
+        distances = 1 - (candidates @ vector) / np.maximum(norms, 1e-12)
+        order = np.argsort(distances)[:limit]
+        return labels[order].tolist(), distances[order].tolist()
+
+
+class HNSWClient:
+    def __init__(self):
+        self.path = HNSW_DATA_PATH
+        self._collections: dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+        self._write_mutex = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.path, re.sub(r"[^\w.-]", "_", collection_name))
+
+    @contextmanager
+    def _write_lock(self, collection_name: str):
+        path = self._collection_path(collection_name)
+        os.makedirs(path, exist_ok=True)
+        with self._write_mutex, open(os.path.join(path, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _collection(
+        self, collection_name: str, conn: sqlite3.Connection, state: dict
+    ) -> _Collection:
+        # Return the caught up graph, rebuilt if the collection was recreated
+        with self._lock:
+            path = self._collection_path(collection_name)
+            collection = self._collections.get(collection_name)
+            if collection is None or collection.uid != state["uid"]:
+                collection = self._collections[collection_name] = _Collection(
+                    path, state["uid"], state["dim"]
+                )
+        collection.catch_up(conn, state)
+        return collection
+
+    @contextmanager
+    def _open(self, collection_name: str):
+        path = self._collection_path(collection_name)
+        if not os.path.exists(os.path.join(path, "items.db")):
+            yield None
+            return
+
+        conn = _connect(path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _rows(self, conn: sqlite3.Connection, labels: list[int]) -> dict:
+        rows = _select_in(
+            conn, "SELECT label, id, text, metadata FROM items", "label", labels
+        )
+        return {
+            label: (id, text, json.loads(metadata))
+            for label, id, text, metadata in rows
+        }
+
+    def has_collection(self, collection_name: str) -> bool:
+        # Check if the collection exists based on the collection name.
+        return os.path.exists(
+            os.path.join(self._collection_path(collection_name), "items.db")
+        )
+
+    def delete_collection(self, collection_name: str):
+        # Delete the collection based on the collection name.
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            shutil.rmtree(self._collection_path(collection_name), ignore_errors=True)
+
+    def search(
+        self,
+        collection_name: str,
+        vectors: list[list[float | int]],
+        limit: int,
+        filter: Optional[dict] = None,
+    ) -> Optional[SearchResult]:
+        # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
+        with self._open(collection_name) as conn:
+            if conn is None:
+                return None
+
+            collection = self._collection(collection_name, conn, _read_state(conn))
+            allowed = None
+            if filter:
+                clause, params = _filter_clause(filter)
+                allowed = [
+                    label
+                    for (label,) in conn.execute(
+                        f"SELECT label FROM items WHERE label < ? AND {clause}",
+                        [collection.next_label, *params],
+                    )
+                ]
+
+            ids, distances, documents, metadatas = [], [], [], []
+            for vector in vectors:
+                with collection.lock.read():
+                    labels, scores = collection.knn(
+                        np.asarray(vector, dtype=np.float32), limit, allowed
+                    )
+
+                # Items deleted since the graph was caught up are left out
+                rows = self._rows(conn, labels) if labels else {}
+                matches = [
+                    (rows[label], score)
+                    for label, score in zip(labels, scores)
+                    if label in rows
+                ]
+                ids.append([row[0] for row, _ in matches])
+                distances.append([score for _, score in matches])
+                documents.append([row[1] for row, _ in matches])
+                metadatas.append([row[2] for row, _ in matches])
+
+            return SearchResult(
+                **{
+                    "ids": ids,
+                    "distances": distances,
+                    "documents": documents,
+                    "metadatas": metadatas,
+                }
+            )
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        # Query the items from the collection based on the filter.
+        with self._open(collection_name) as conn:
+            if conn is None:
+                return None
+
+            clause, params = _filter_clause(filter)
+            rows = conn.execute(
+                "SELECT id, text, metadata FROM items"
+                + (f" WHERE {clause}" if clause else "")
+                + " ORDER BY label"
+                + (" LIMIT ?" if limit is not None else ""),
+                params + ([limit] if limit is not None else []),
+            ).fetchall()
+
+            return GetResult(
+                **{
+                    "ids": [[row[0] for row in rows]],
+                    "documents": [[row[1] for row in rows]],
+                    "metadatas": [[json.loads(row[2]) for row in rows]],
+                }
+            )
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        # Get all the items in the collection.
+        return self.query(collection_name, filter={})
+
+    def get_vectors(self, collection_name: str, ids: list[str]) -> dict:
+        # Get the stored vectors of the items with the given ids.
+        with self._open(collection_name) as conn:
+            if conn is None or not ids:
+                return {}
+
+            state = _read_state(conn)
+            rows = _select_in(conn, "SELECT id, label FROM items", "id", ids)
+            vectors = np.memmap(
+                os.path.join(self._collection_path(collection_name), "vectors.f32"),
+                dtype=np.float32,
+                mode="r",
+            ).reshape(-1, state["dim"])
+            return {id: vectors[label].tolist() for id, label in rows}
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        # Insert the items into the collection, if the collection does not exist, it will be created.
+        self.upsert(collection_name, items)
+
+    def upsert(self, collection_name: str, items: list[VectorItem]):
+        # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
+        if not items:
+            return
+
+        vectors = np.asarray([item["vector"] for item in items], dtype=np.float32)
+        with self._write_lock(collection_name) as path:
+            conn = _connect(path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS items (label INTEGER PRIMARY KEY, "
+                    "id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS deletions "
+                    "(seq INTEGER PRIMARY KEY AUTOINCREMENT, label INTEGER NOT NULL)"
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO state (key, value) VALUES (?, ?)",
+                    [
+                        ("uid", uuid.uuid4().hex),
+                        ("dim", str(vectors.shape[1])),
+                        ("next_label", "0"),
+                    ],
+                )
+                state = _read_state(conn)
+                if vectors.shape[1] != state["dim"]:
+                    raise ValueError(
+                        f"Collection {collection_name} holds {state['dim']} "
+                        f"dimensional vectors, got {vectors.shape[1]}"
+                    )
+
+                self._delete_labels(
+                    conn,
+                    _select_in(
+                        conn,
+                        "SELECT label FROM items",
+                        "id",
+                        [item["id"] for item in items],
+                    ),
+                )
+
+                # Vectors are written before the rows that point at them are committed
+                next_label = state["next_label"]
+                with open(os.path.join(path, "vectors.f32"), "ab") as f:
+                    f.truncate(next_label * state["dim"] * 4)
+                    f.write(vectors.tobytes())
+
+                conn.executemany(
+                    "INSERT INTO items (label, id, text, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            next_label + idx,
+                            item["id"],
+                            item["text"],
+                            json.dumps(item["metadata"]),
+                        )
+                        for idx, item in enumerate(items)
+                    ],
+                )
+                conn.execute(
+                    "UPDATE state SET value = ? WHERE key = 'next_label'",
+                    (str(next_label + len(items)),),
+                )
+                conn.commit()
+
+                self._maybe_checkpoint(collection_name, conn)
+            finally:
+                conn.close()
+
+    def _delete_labels(self, conn: sqlite3.Connection, rows: list[tuple]):
+        # Deletions are logged so every process can drop them from its graph
+        conn.executemany("DELETE FROM items WHERE label = ?", rows)
+        conn.executemany("INSERT INTO deletions (label) VALUES (?)", rows)
+
+    def _maybe_checkpoint(self, collection_name: str, conn: sqlite3.Connection):
+        collection = self._collection(collection_name, conn, _read_state(conn))
+        if collection.next_label - collection.checkpoint_label >= CHECKPOINT_EVERY:
+            log.info(f"saving hnsw index of {collection_name}")
+            collection.save_checkpoint()
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        # Delete the items from the collection based on the ids.
+        if not self.has_collection(collection_name) or not (ids or filter):
+            return
+
+        with self._write_lock(collection_name) as path:
+            conn = _connect(path)
+            try:
+                if ids:
+                    rows = _select_in(conn, "SELECT label FROM items", "id", ids)
+                else:
+                    clause, params = _filter_clause(filter)
+                    rows = conn.execute(
+                        f"SELECT label FROM items WHERE {clause}", params
+                    ).fetchall()
+                self._delete_labels(conn, rows)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def reset(self):
+        # Resets the database. This will delete all collections and item entries.
+        with self._lock:
+            self._collections.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
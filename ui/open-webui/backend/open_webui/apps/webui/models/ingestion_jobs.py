@@ -0,0 +1,200 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.apps.webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Float, Text, JSON
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Ingestion Job DB Schema
+####################
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+
+    id = Column(Text, unique=True, primary_key=True)
+    user_id = Column(Text)
+    file_id = Column(Text)
+
+    # pending, running, completed or failed
+    status = Column(Text)
+    stage = Column(Text, nullable=True)
+    progress = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+
+    data = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    # Worker running the job and when it last reported being alive
+    owner = Column(Text, nullable=True)
+    heartbeat_at = Column(BigInteger, nullable=True)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+
+class IngestionJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    file_id: str
+
+    status: str
+    stage: Optional[str] = None
+    progress: Optional[float] = None
+    error: Optional[str] = None
+
+    data: Optional[dict] = None
+    result: Optional[dict] = None
+
+    owner: Optional[str] = None
+    heartbeat_at: Optional[int] = None
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+class IngestionJobsTable:
+    def insert_new_job(
+        self, user_id: str, file_id: str, data: Optional[dict] = None
+    ) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = IngestionJobModel(
+                **{
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "file_id": file_id,
+                    "status": "pending",
+                    "progress": 0.0,
+                    "data": data,
+                    "created_at": int(time.time()),
+                    "updated_at": int(time.time()),
+                }
+            )
+
+            try:
+                result = IngestionJob(**job.model_dump())
+                db.add(result)
+                db.commit()
+                db.refresh(result)
+                if result:
+                    return IngestionJobModel.model_validate(result)
+                else:
+                    return None
+            except Exception as e:
+                log.exception(e)
+                return None
+
+    def get_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        try:
+            with get_db() as db:
+                job = db.query(IngestionJob).filter_by(id=id).first()
+                return IngestionJobModel.model_validate(job) if job else None
+        except Exception:
+            return None
+
+    def get_jobs_by_status(self, statuses: list[str]) -> list[IngestionJobModel]:
+        with get_db() as db:
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in db.query(IngestionJob)
+                .filter(IngestionJob.status.in_(statuses))
+                .order_by(IngestionJob.created_at)
+                .all()
+            ]
+
+    def claim_job(self, id: str, owner: str) -> Optional[IngestionJobModel]:
+        # Atomic, so a job queued twice or seen by several workers runs once
+        try:
+            with get_db() as db:
+                now = int(time.time())
+                claimed = (
+                    db.query(IngestionJob)
+                    .filter_by(id=id, status="pending")
+                    .update(
+                        {
+                            "status": "running",
+                            "stage": "queued",
+                            "owner": owner,
+                            "heartbeat_at": now,
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                return self.get_job_by_id(id) if claimed == 1 else None
+        except Exception as e:
+            log.exception(e)
+            return None
+
+    def heartbeat_jobs(self, owner: str) -> int:
+        with get_db() as db:
+            count = (
+                db.query(IngestionJob)
+                .filter_by(owner=owner, status="running")
+                .update({"heartbeat_at": int(time.time())}, synchronize_session=False)
+            )
+            db.commit()
+            return count
+
+    def reset_stale_jobs(self, before: int, pending: bool = False) -> list[str]:
+        """
+        Hand running jobs whose owner stopped heartbeating before ``before``
+        back to pending, and with ``pending`` also pending jobs untouched
+        since then, e.g. queued in memory by a process that is gone.
+
+        :return: The ids of the reset jobs, each reset by one caller only
+        """
+        stale = IngestionJob.status == "running"
+        stale &= (IngestionJob.heartbeat_at < before) | (
+            IngestionJob.heartbeat_at.is_(None)
+        )
+        if pending:
+            stale |= (IngestionJob.status == "pending") & (
+                IngestionJob.updated_at < before
+            )
+
+        reset = []
+        with get_db() as db:
+            ids = [id for (id,) in db.query(IngestionJob.id).filter(stale).all()]
+            for id in ids:
+                count = (
+                    db.query(IngestionJob)
+                    .filter(IngestionJob.id == id, stale)
+                    .update(
+                        {
+                            "status": "pending",
+                            "owner": None,
+                            "updated_at": int(time.time()),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if count == 1:
+                    reset.append(id)
+        return reset
+
+    def update_job_by_id(self, id: str, updated: dict) -> Optional[IngestionJobModel]:
+        try:
+            with get_db() as db:
+                db.query(IngestionJob).filter_by(id=id).update(
+                    {**updated, "updated_at": int(time.time())}
+                )
+                db.commit()
+                return self.get_job_by_id(id)
+        except Exception as e:
+            log.exception(e)
+            return None
+
+
+IngestionJobs = IngestionJobsTable()
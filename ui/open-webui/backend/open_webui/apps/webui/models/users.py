@@ -3,8 +3,9 @@ from typing import Optional
 
 from open_webui.apps.webui.internal.db import Base, JSONField, get_db
 from open_webui.apps.webui.models.chats import Chats
+from open_webui.utils.auth_cache import AUTH_USER_CACHE
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text
+from sqlalchemy import BigInteger, Column, String, Text, case
 
 ####################
 # User DB Schema
@@ -165,6 +166,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -179,6 +181,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -198,6 +201,23 @@ class UsersTable:
         except Exception:
             return None
 
+    def update_users_last_active(self, last_active: dict[str, int]) -> bool:
+        # Sets last_active_at of many users ({id: timestamp}), one UPDATE per
+        # 1000 users to stay under the databases' bound parameter limits
+        try:
+            items = list(last_active.items())
+            with get_db() as db:
+                for i in range(0, len(items), 1000):
+                    chunk = dict(items[i : i + 1000])
+                    db.query(User).filter(User.id.in_(chunk)).update(
+                        {"last_active_at": case(chunk, value=User.id)},
+                        synchronize_session=False,
+                    )
+                db.commit()
+                return True
+        except Exception:
+            return False
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -205,6 +225,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -216,6 +237,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -233,6 +255,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
 
                 return True
             else:
@@ -245,6 +268,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                AUTH_USER_CACHE.invalidate_user(id)
                 return True if result == 1 else False
         except Exception:
             return False
@@ -14,11 +14,13 @@ from open_webui.apps.webui.internal.db import Base, get_db
 from open_webui.env import (
     OPEN_WEBUI_DIR,
     DATA_DIR,
+    DEVICE_TYPE,
     ENV,
     FRONTEND_BUILD_DIR,
     WEBUI_AUTH,
     WEBUI_FAVICON_URL,
     WEBUI_NAME,
+    WEBSOCKET_REDIS_URL,
     log,
 )
 from pydantic import BaseModel
@@ -583,6 +585,33 @@ OLLAMA_BASE_URLS = PersistentConfig(
     "OLLAMA_BASE_URLS", "ollama.base_urls", OLLAMA_BASE_URLS
 )
 
+# Texts per embedding batch, batches in flight per Ollama instance when
+# embedding documents and seconds before an embedding request times out
+OLLAMA_EMBEDDING_BATCH_SIZE = int(os.environ.get("OLLAMA_EMBEDDING_BATCH_SIZE", "32"))
+OLLAMA_EMBEDDING_CONCURRENCY = int(os.environ.get("OLLAMA_EMBEDDING_CONCURRENCY", "2"))
+OLLAMA_EMBEDDING_TIMEOUT = int(os.environ.get("OLLAMA_EMBEDDING_TIMEOUT", "120"))
+
+# Ollama endpoint used for both documents and queries. "embed" batches texts
+# and returns normalised vectors, "embeddings" returns the model's raw vectors
+# as collections created before batching were built with. Collections must be
+# re-embedded when this changes, as query and document vectors would differ,
+# so existing installs stay on "embeddings" unless they opt in.
+OLLAMA_EMBEDDING_API = os.environ.get("OLLAMA_EMBEDDING_API", "embeddings").lower()
+
+# Routing across OLLAMA_BASE_URLS: seconds between /api/ps health checks,
+# consecutive failures before an instance is skipped and for how long, and
+# the cost (in seconds) of sending a model to an instance that has not loaded it
+OLLAMA_ROUTER_HEALTH_CHECK_INTERVAL = int(
+    os.environ.get("OLLAMA_ROUTER_HEALTH_CHECK_INTERVAL", "10")
+)
+OLLAMA_ROUTER_FAILURE_THRESHOLD = int(
+    os.environ.get("OLLAMA_ROUTER_FAILURE_THRESHOLD", "3")
+)
+OLLAMA_ROUTER_COOLDOWN = int(os.environ.get("OLLAMA_ROUTER_COOLDOWN", "30"))
+OLLAMA_ROUTER_MODEL_LOAD_PENALTY = float(
+    os.environ.get("OLLAMA_ROUTER_MODEL_LOAD_PENALTY", "5")
+)
+
 ####################################
 # OPENAI_API
 ####################################
@@ -740,6 +769,9 @@ MODEL_FILTER_LIST = PersistentConfig(
     [model.strip() for model in MODEL_FILTER_LIST.split(";")],
 )
 
+# Seconds the models of every backend are cached for /api/models (0 disables it)
+MODELS_CACHE_TTL = float(os.environ.get("MODELS_CACHE_TTL", "30"))
+
 WEBHOOK_URL = PersistentConfig(
     "WEBHOOK_URL", "webhook_url", os.environ.get("WEBHOOK_URL", "")
 )
@@ -901,6 +933,16 @@ CHROMA_HTTP_SSL = os.environ.get("CHROMA_HTTP_SSL", "false").lower() == "true"
 
 MILVUS_URI = os.environ.get("MILVUS_URI", f"{DATA_DIR}/vector_db/milvus.db")
 
+# HNSW (in-process index, for single node deployments)
+
+HNSW_DATA_PATH = os.environ.get("HNSW_DATA_PATH", f"{DATA_DIR}/vector_db/hnsw")
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "64"))
+
+# BM25 keyword index for hybrid search, derived from the vector database
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", f"{CACHE_DIR}/bm25")
+
 ####################################
 # Information Retrieval (RAG)
 ####################################
@@ -933,6 +975,12 @@ ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     os.environ.get("ENABLE_RAG_HYBRID_SEARCH", "").lower() == "true",
 )
 
+# Collections referenced by a chat are searched concurrently on a shared thread pool
+RAG_RETRIEVAL_MAX_WORKERS = int(os.environ.get("RAG_RETRIEVAL_MAX_WORKERS", "8"))
+# Seconds a chat waits for retrieval before going on with the results found so far
+# (0 disables the limit)
+RAG_RETRIEVAL_TIMEOUT = float(os.environ.get("RAG_RETRIEVAL_TIMEOUT", "30"))
+
 RAG_FILE_MAX_COUNT = PersistentConfig(
     "RAG_FILE_MAX_COUNT",
     "rag.file.max_count",
@@ -992,6 +1040,34 @@ RAG_EMBEDDING_OPENAI_BATCH_SIZE = PersistentConfig(
     int(os.environ.get("RAG_EMBEDDING_OPENAI_BATCH_SIZE", "1")),
 )
 
+# Query embeddings are cached by engine, model and text (0 disables the cache)
+RAG_QUERY_EMBEDDING_CACHE_SIZE = int(
+    os.environ.get("RAG_QUERY_EMBEDDING_CACHE_SIZE", "1024")
+)
+# Also keep them on disk, where they outlive restarts and are shared between workers
+ENABLE_RAG_QUERY_EMBEDDING_DISK_CACHE = (
+    os.environ.get("ENABLE_RAG_QUERY_EMBEDDING_DISK_CACHE", "").lower() == "true"
+)
+RAG_QUERY_EMBEDDING_CACHE_PATH = f"{CACHE_DIR}/embeddings/queries.db"
+
+# Embeddings of ingested chunks, keyed by content, so chunks already embedded for
+# another collection or an earlier version of a file are not embedded again
+# (0 disables the cache)
+RAG_CHUNK_EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.environ.get("RAG_CHUNK_EMBEDDING_CACHE_MAX_ENTRIES", "1000000")
+)
+RAG_CHUNK_EMBEDDING_CACHE_PATH = f"{CACHE_DIR}/embeddings/chunks.db"
+
+# Background file ingestion (/process/file/job)
+RAG_INGESTION_WORKERS = int(os.environ.get("RAG_INGESTION_WORKERS", "2"))
+# "local" keeps queued jobs in process, "redis" shares them between instances
+RAG_INGESTION_QUEUE = os.environ.get("RAG_INGESTION_QUEUE", "local").lower()
+RAG_INGESTION_QUEUE_REDIS_URL = os.environ.get(
+    "RAG_INGESTION_QUEUE_REDIS_URL", WEBSOCKET_REDIS_URL
+)
+# Seconds without a heartbeat after which a running job is handed to another worker
+RAG_INGESTION_JOB_TIMEOUT = int(os.environ.get("RAG_INGESTION_JOB_TIMEOUT", "120"))
+
 RAG_RERANKING_MODEL = PersistentConfig(
     "RAG_RERANKING_MODEL",
     "rag.reranking_model",
@@ -1008,6 +1084,22 @@ RAG_RERANKING_MODEL_TRUST_REMOTE_CODE = (
     os.environ.get("RAG_RERANKING_MODEL_TRUST_REMOTE_CODE", "").lower() == "true"
 )
 
+# Query/chunk pairs scored per reranker forward pass. Pairs are batched by length,
+# and small batches keep padding cheap on CPU
+RAG_RERANKING_BATCH_SIZE = int(
+    os.environ.get("RAG_RERANKING_BATCH_SIZE", "16" if DEVICE_TYPE == "cpu" else "32")
+)
+# Cross-encoder scores are cached by query and chunk (0 disables the cache)
+RAG_RERANKING_SCORE_CACHE_SIZE = int(
+    os.environ.get("RAG_RERANKING_SCORE_CACHE_SIZE", "10000")
+)
+# ColBERT token embeddings of chunks, stored as float16 so queries only encode the
+# query itself (0 disables the cache)
+RAG_COLBERT_CACHE_MAX_ENTRIES = int(
+    os.environ.get("RAG_COLBERT_CACHE_MAX_ENTRIES", "50000")
+)
+RAG_COLBERT_CACHE_DIR = f"{CACHE_DIR}/colbert"
+
 CHUNK_SIZE = PersistentConfig(
     "CHUNK_SIZE", "rag.chunk_size", int(os.environ.get("CHUNK_SIZE", "1000"))
 )
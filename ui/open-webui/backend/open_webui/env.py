@@ -337,6 +337,11 @@ WEBUI_SESSION_COOKIE_SECURE = os.environ.get(
 if WEBUI_AUTH and WEBUI_SECRET_KEY == "":
     raise ValueError(ERROR_MESSAGES.ENV_VAR_NOT_FOUND)
 
+# Seconds an authenticated user is reused for the same token, and between
+# writes of the users' last_active_at (0 disables either)
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "5"))
+USER_ACTIVITY_FLUSH_INTERVAL = int(os.environ.get("USER_ACTIVITY_FLUSH_INTERVAL", "10"))
+
 ENABLE_WEBSOCKET_SUPPORT = (
     os.environ.get("ENABLE_WEBSOCKET_SUPPORT", "True").lower() == "true"
 )
@@ -355,3 +360,19 @@ else:
         AIOHTTP_CLIENT_TIMEOUT = int(AIOHTTP_CLIENT_TIMEOUT)
     except Exception:
         AIOHTTP_CLIENT_TIMEOUT = 300
+
+# Connections to each upstream (Ollama, OpenAI, ...) are pooled for the lifetime of the app
+AIOHTTP_CLIENT_LIMIT_PER_HOST = int(
+    os.environ.get("AIOHTTP_CLIENT_LIMIT_PER_HOST", "100")
+)
+AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = float(
+    os.environ.get("AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT", "30")
+)
+AIOHTTP_CLIENT_DNS_CACHE_TTL = int(
+    os.environ.get("AIOHTTP_CLIENT_DNS_CACHE_TTL", "300")
+)
+
+# Timeout for quick upstream API calls (listing, showing, copying or deleting models)
+AIOHTTP_CLIENT_METADATA_TIMEOUT = int(
+    os.environ.get("AIOHTTP_CLIENT_METADATA_TIMEOUT", "10")
+)
@@ -73,6 +73,7 @@ from open_webui.config import (
     ENV,
     FRONTEND_BUILD_DIR,
     MODEL_FILTER_LIST,
+    MODELS_CACHE_TTL,
     OAUTH_MERGE_ACCOUNTS_BY_EMAIL,
     OAUTH_PROVIDERS,
     ENABLE_SEARCH_QUERY,
@@ -125,6 +126,9 @@ from starlette.responses import RedirectResponse, Response, StreamingResponse
 
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 
+from open_webui.utils.models import ModelRegistry
+from open_webui.utils.http import HTTP_SESSIONS
+from open_webui.utils.activity import USER_ACTIVITY
 from open_webui.utils.misc import (
     add_or_update_system_message,
     get_last_user_message,
@@ -199,7 +203,14 @@ async def lifespan(app: FastAPI):
         reset_config()
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    asyncio.create_task(MODEL_REGISTRY.run())
+    asyncio.create_task(ollama_app.state.ROUTER.run())
+    asyncio.create_task(USER_ACTIVITY.run())
+    retrieval_app.state.INGESTION_WORKERS.start(asyncio.get_running_loop())
     yield
+    retrieval_app.state.INGESTION_WORKERS.stop()
+    await HTTP_SESSIONS.close()
+    USER_ACTIVITY.flush()
 
 
 app = FastAPI(
@@ -501,7 +512,10 @@ async def chat_completion_files_handler(body) -> tuple[dict, dict[str, list]]:
     citations = []
 
     if files := body.get("metadata", {}).get("files", None):
-        contexts, citations = get_rag_context(
+        # Retrieval blocks on the vector database and the embedding model,
+        # so run it outside the event loop
+        contexts, citations = await asyncio.to_thread(
+            get_rag_context,
             files=files,
             messages=body["messages"],
             embedding_function=retrieval_app.state.EMBEDDING_FUNCTION,
@@ -858,6 +872,35 @@ async def check_url(request: Request, call_next):
     return response
 
 
+# Requests that change the models offered by /api/models
+MODEL_REGISTRY_UPDATE_PATHS = [
+    "/api/v1/models/",
+    "/api/v1/functions/",
+    "/api/pipelines/",
+    "/api/config/model/filter",
+    "/ollama/config/update",
+    "/ollama/urls/update",
+    "/ollama/api/pull",
+    "/ollama/api/create",
+    "/ollama/api/copy",
+    "/ollama/api/delete",
+    "/ollama/models/",
+    "/openai/config/update",
+    "/openai/urls/update",
+    "/openai/keys/update",
+]
+
+
+@app.middleware("http")
+async def invalidate_model_registry(request: Request, call_next):
+    response = await call_next(request)
+    if request.method != "GET" and any(
+        request.url.path.startswith(path) for path in MODEL_REGISTRY_UPDATE_PATHS
+    ):
+        MODEL_REGISTRY.invalidate()
+    return response
+
+
 @app.middleware("http")
 async def update_embedding_function(request: Request, call_next):
     response = await call_next(request)
@@ -898,89 +941,94 @@ app.mount("/api/v1", webui_app)
 webui_app.state.EMBEDDING_FUNCTION = retrieval_app.state.EMBEDDING_FUNCTION
 
 
-async def get_all_models():
-    # TODO: Optimize this function
-    pipe_models = []
-    openai_models = []
-    ollama_models = []
+async def get_openai_base_models() -> list:
+    if not app.state.config.ENABLE_OPENAI_API:
+        return []
 
-    pipe_models = await get_pipe_models()
+    openai_models = await get_openai_models()
+    return openai_models["data"]
 
-    if app.state.config.ENABLE_OPENAI_API:
-        openai_models = await get_openai_models()
-        openai_models = openai_models["data"]
 
-    if app.state.config.ENABLE_OLLAMA_API:
-        ollama_models = await get_ollama_models()
-        ollama_models = [
-            {
-                "id": model["model"],
-                "name": model["name"],
-                "object": "model",
-                "created": int(time.time()),
-                "owned_by": "ollama",
-                "ollama": model,
-            }
-            for model in ollama_models["models"]
-        ]
+async def get_ollama_base_models() -> list:
+    if not app.state.config.ENABLE_OLLAMA_API:
+        return []
+
+    ollama_models = await get_ollama_models()
+    return [
+        {
+            "id": model["model"],
+            "name": model["name"],
+            "object": "model",
+            "created": int(time.time()),
+            "owned_by": "ollama",
+            "ollama": model,
+        }
+        for model in ollama_models["models"]
+    ]
+
+
+def build_models(base_models: list[list]) -> list:
+    # Copy the backend models, they are cached and reused by the next build
+    models = [dict(model) for source_models in base_models for model in source_models]
 
-    models = pipe_models + openai_models + ollama_models
+    # Models by id and by id without tag, in list order
+    models_by_id = {}
+
+    def index_model(model):
+        for key in {model["id"], model["id"].split(":")[0]}:
+            models_by_id.setdefault(key, []).append(model)
+
+    for model in models:
+        index_model(model)
 
     global_action_ids = [
         function.id for function in Functions.get_global_action_functions()
     ]
-    enabled_action_ids = [
-        function.id
+    enabled_actions = {
+        function.id: function
         for function in Functions.get_functions_by_type("action", active_only=True)
-    ]
+    }
 
     custom_models = Models.get_all_models()
     for custom_model in custom_models:
         if custom_model.base_model_id is None:
-            for model in models:
-                if (
-                    custom_model.id == model["id"]
-                    or custom_model.id == model["id"].split(":")[0]
-                ):
-                    model["name"] = custom_model.name
-                    model["info"] = custom_model.model_dump()
-
-                    action_ids = []
-                    if "info" in model and "meta" in model["info"]:
-                        action_ids.extend(model["info"]["meta"].get("actionIds", []))
-
-                    model["action_ids"] = action_ids
+            for model in models_by_id.get(custom_model.id, []):
+                model["name"] = custom_model.name
+                model["info"] = custom_model.model_dump()
+
+                action_ids = []
+                if "info" in model and "meta" in model["info"]:
+                    action_ids.extend(model["info"]["meta"].get("actionIds", []))
+
+                model["action_ids"] = action_ids
         else:
             owned_by = "openai"
             pipe = None
             action_ids = []
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model["owned_by"]
-                    if "pipe" in model:
-                        pipe = model["pipe"]
+            base_models = models_by_id.get(custom_model.base_model_id)
+            if base_models:
+                model = base_models[0]
+                owned_by = model["owned_by"]
+                if "pipe" in model:
+                    pipe = model["pipe"]
 
-                    if "info" in model and "meta" in model["info"]:
-                        action_ids.extend(model["info"]["meta"].get("actionIds", []))
-                    break
+                if "info" in model and "meta" in model["info"]:
+                    action_ids.extend(model["info"]["meta"].get("actionIds", []))
 
-            models.append(
-                {
-                    "id": custom_model.id,
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
-                }
-            )
+            model = {
+                "id": custom_model.id,
+                "name": custom_model.name,
+                "object": "model",
+                "created": custom_model.created_at,
+                "owned_by": owned_by,
+                "info": custom_model.model_dump(),
+                "preset": True,
+                **({"pipe": pipe} if pipe is not None else {}),
+                "action_ids": action_ids,
+            }
+            models.append(model)
+            index_model(model)
 
     for model in models:
         action_ids = []
@@ -991,14 +1039,12 @@ async def get_all_models():
         action_ids = action_ids + global_action_ids
         action_ids = list(set(action_ids))
         action_ids = [
-            action_id for action_id in action_ids if action_id in enabled_action_ids
+            action_id for action_id in action_ids if action_id in enabled_actions
         ]
 
         model["actions"] = []
         for action_id in action_ids:
-            action = Functions.get_function_by_id(action_id)
-            if action is None:
-                raise Exception(f"Action not found: {action_id}")
+            action = enabled_actions[action_id]
 
             if action_id in webui_app.state.FUNCTIONS:
                 function_module = webui_app.state.FUNCTIONS[action_id]
@@ -1045,6 +1091,21 @@ async def get_all_models():
     return models
 
 
+MODEL_REGISTRY = ModelRegistry(
+    sources={
+        "pipe": get_pipe_models,
+        "openai": get_openai_base_models,
+        "ollama": get_ollama_base_models,
+    },
+    build=build_models,
+    ttl=MODELS_CACHE_TTL,
+)
+
+
+async def get_all_models():
+    return await MODEL_REGISTRY.get()
+
+
 @app.get("/api/models")
 async def get_models(user=Depends(get_verified_user)):
     models = await get_all_models()
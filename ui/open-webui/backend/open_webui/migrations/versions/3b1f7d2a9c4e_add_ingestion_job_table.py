@@ -0,0 +1,39 @@
+"""Add ingestion job table
+
+Revision ID: 3b1f7d2a9c4e
+Revises: 6a39f3d8e55c
+Create Date: 2024-10-08 11:24:17.512093
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "3b1f7d2a9c4e"
+down_revision = "6a39f3d8e55c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_job",
+        sa.Column("id", sa.Text(), primary_key=True),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("file_id", sa.Text(), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("stage", sa.Text(), nullable=True),
+        sa.Column("progress", sa.Float(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+    )
+    op.create_index("ingestion_job_status_idx", "ingestion_job", ["status"])
+
+
+def downgrade():
+    op.drop_index("ingestion_job_status_idx", table_name="ingestion_job")
+    op.drop_table("ingestion_job")
@@ -0,0 +1,27 @@
+"""Add ingestion job owner and heartbeat
+
+Revision ID: 9d4e6b1c2f8a
+Revises: 3b1f7d2a9c4e
+Create Date: 2024-10-14 09:12:43.201754
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9d4e6b1c2f8a"
+down_revision = "3b1f7d2a9c4e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("ingestion_job", sa.Column("owner", sa.Text(), nullable=True))
+    op.add_column(
+        "ingestion_job", sa.Column("heartbeat_at", sa.BigInteger(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("ingestion_job", "heartbeat_at")
+    op.drop_column("ingestion_job", "owner")
@@ -0,0 +1,180 @@
+import math
+import os
+
+import pytest
+
+from open_webui.apps.retrieval.vector.bm25 import (
+    BM25Index,
+    BM25IndexedClient,
+    tokenize,
+)
+from test.util.mock_vector_db import InMemoryVectorClient
+
+CORPUS = {
+    "cats": "the cat sat on the mat",
+    "dogs": "the dog chased the cat around the garden",
+    "birds": "a bird sang in the garden",
+    "fish": "fish swim in the sea",
+}
+
+
+def items(corpus):
+    return [
+        {"id": id, "text": text, "vector": [0.0], "metadata": {"source": id}}
+        for id, text in corpus.items()
+    ]
+
+
+def bm25_scores(corpus, query, k1=1.5, b=0.75):
+    docs = {id: tokenize(text) for id, text in corpus.items()}
+    avgdl = sum(len(tokens) for tokens in docs.values()) / len(docs)
+    scores = {}
+    for id, tokens in docs.items():
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in docs.values())
+            if df == 0:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = tokens.count(term)
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        if score:
+            scores[id] = score
+    return scores
+
+
+class TestBM25Index:
+    @pytest.fixture
+    def index(self, tmp_path):
+        return BM25Index(str(tmp_path), segments_per_tier=4)
+
+    def segments(self, index, collection_name):
+        return list(index._reader(collection_name).segments.values())
+
+    def test_search_scores(self, index):
+        index.add("docs", items(CORPUS))
+
+        results = index.search("docs", "cat garden", limit=10)
+
+        expected = bm25_scores(CORPUS, "cat garden")
+        assert [chunk["id"] for _, chunk in results] == sorted(
+            expected, key=expected.get, reverse=True
+        )
+        for score, chunk in results:
+            assert score == pytest.approx(expected[chunk["id"]], rel=1e-5)
+            assert chunk["text"] == CORPUS[chunk["id"]]
+            assert chunk["metadata"] == {"source": chunk["id"]}
+
+    def test_search_limit_and_unknown_terms(self, index):
+        index.add("docs", items(CORPUS))
+
+        assert len(index.search("docs", "the", limit=2)) == 2
+        assert index.search("docs", "unicorn", limit=10) == []
+        assert index.search("docs", "", limit=10) == []
+
+    def test_scores_span_segments(self, tmp_path):
+        index = BM25Index(str(tmp_path), segments_per_tier=8)
+        for id, text in CORPUS.items():
+            index.add("docs", items({id: text}))
+
+        results = index.search("docs", "cat garden", limit=10)
+
+        assert len(self.segments(index, "docs")) == len(CORPUS)
+        expected = bm25_scores(CORPUS, "cat garden")
+        assert {chunk["id"]: score for score, chunk in results} == pytest.approx(
+            expected, rel=1e-5
+        )
+
+    def test_delete(self, index):
+        index.add("docs", items(CORPUS))
+
+        index.delete("docs", ["dogs"])
+
+        remaining = {id: text for id, text in CORPUS.items() if id != "dogs"}
+        results = index.search("docs", "cat garden", limit=10)
+        assert {chunk["id"]: score for score, chunk in results} == pytest.approx(
+            bm25_scores(remaining, "cat garden"), rel=1e-5
+        )
+
+    def test_replace(self, index):
+        index.add("docs", items(CORPUS))
+
+        index.add("docs", items({"fish": CORPUS["fish"]}), replace=True)
+
+        assert index.search("docs", "cat", limit=10) == []
+        assert len(self.segments(index, "docs")) == 1
+
+    def test_segments_of_a_tier_are_merged(self, index):
+        for i in range(3):
+            index.add("docs", items({f"{i}": f"chunk {i}"}))
+        assert len(self.segments(index, "docs")) == 3
+
+        index.add("docs", items({"3": "chunk 3"}))
+
+        segments = self.segments(index, "docs")
+        assert [len(segment.live) for segment in segments] == [4]
+        assert len(index.search("docs", "chunk", limit=10)) == 4
+
+    def test_large_segments_are_not_rewritten_by_small_inserts(self, index):
+        index.add("docs", items({f"big {i}": f"big chunk {i}" for i in range(64)}))
+        big = self.segments(index, "docs")[0].path
+
+        for i in range(10):
+            index.add("docs", items({f"{i}": f"small chunk {i}"}))
+
+        segments = self.segments(index, "docs")
+        assert big in [segment.path for segment in segments]
+        assert os.path.exists(big)
+        assert len(segments) < 10
+        assert len(index.search("docs", "chunk", limit=100)) == 74
+
+    def test_deleted_chunks_are_compacted(self, index):
+        index.add("docs", items({f"{i}": f"chunk {i}" for i in range(10)}))
+        index.add("docs", items(CORPUS))
+
+        index.delete("docs", [f"{i}" for i in range(10)])
+
+        segments = self.segments(index, "docs")
+        assert [len(segment.live) for segment in segments] == [len(CORPUS)]
+        assert index.search("docs", "chunk", limit=10) == []
+        results = index.search("docs", "the", limit=10)
+        assert {chunk["id"] for _, chunk in results} == set(CORPUS)
+
+
+class TestBM25IndexedClient:
+    @pytest.fixture
+    def client(self, tmp_path):
+        return BM25IndexedClient(InMemoryVectorClient(), BM25Index(str(tmp_path)))
+
+    def test_insert_and_keyword_search(self, client):
+        client.insert("docs", items(CORPUS))
+
+        result = client.keyword_search("docs", "garden", limit=10)
+
+        assert sorted(result.ids[0]) == ["birds", "dogs"]
+        assert result.metadatas[0][0] == {"source": result.ids[0][0]}
+        assert result.distances[0] == sorted(result.distances[0], reverse=True)
+
+    def test_upsert_replaces_chunks(self, client):
+        client.insert("docs", items(CORPUS))
+
+        client.upsert("docs", items({"fish": "the cat caught a fish"}))
+
+        result = client.keyword_search("docs", "cat", limit=10)
+        assert sorted(result.ids[0]) == ["cats", "dogs", "fish"]
+        assert result.ids[0].count("fish") == 1
+
+    def test_delete_by_filter(self, client):
+        client.insert("docs", items(CORPUS))
+
+        client.delete("docs", filter={"source": "cats"})
+
+        assert client.keyword_search("docs", "cat", limit=10).ids[0] == ["dogs"]
+
+    def test_existing_collection_is_indexed_on_first_search(self, client):
+        client.client.insert("docs", items(CORPUS))
+
+        result = client.keyword_search("docs", "sea", limit=10)
+
+        assert result.ids[0] == ["fish"]
+        assert client.keyword_search("missing", "sea", limit=10) is None
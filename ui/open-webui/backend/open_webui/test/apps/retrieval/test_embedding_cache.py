@@ -0,0 +1,43 @@
+from open_webui.apps.retrieval.embedding_cache import ChunkEmbeddingCache
+
+
+def embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestChunkEmbeddingCache:
+    def count(self, cache):
+        with cache._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunk_embedding").fetchone()[0]
+
+    def test_reuses_cached_chunks(self, tmp_path):
+        cache = ChunkEmbeddingCache(str(tmp_path / "chunks.db"))
+        calls = []
+
+        def counting_embed(texts):
+            calls.append(texts)
+            return embed(texts)
+
+        cache.embed("ollama", "model", ["a", "bb"], counting_embed)
+        result = cache.embed("ollama", "model", ["bb", "ccc", "ccc"], counting_embed)
+
+        assert calls == [["a", "bb"], ["ccc"]]
+        assert result == [[2.0, 1.0], [3.0, 1.0], [3.0, 1.0]]
+        assert cache.stats()["hits"] == 2
+
+    def test_evicts_least_recently_used_every_n_entries(self, tmp_path):
+        cache = ChunkEmbeddingCache(
+            str(tmp_path / "chunks.db"), max_entries=3, evict_every=5
+        )
+
+        cache.embed("ollama", "model", ["a", "b", "c"], embed)
+        cache.embed("ollama", "model", ["a"], embed)
+        cache.embed("ollama", "model", ["d"], embed)
+        assert self.count(cache) == 4
+
+        cache.embed("ollama", "model", ["e", "f", "g"], embed)
+
+        assert self.count(cache) == 3
+        calls = []
+        cache.embed("ollama", "model", ["e", "f", "g"], lambda t: calls.append(t))
+        assert calls == []
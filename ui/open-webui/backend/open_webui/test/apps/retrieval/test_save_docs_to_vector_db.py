@@ -0,0 +1,130 @@
+import uuid
+
+import pytest
+from langchain_core.documents import Document
+
+from open_webui.apps.retrieval import main as retrieval
+from open_webui.apps.retrieval.vector.bm25 import BM25Index, BM25IndexedClient
+from test.util.mock_vector_db import InMemoryVectorClient
+
+BATCH_SIZE = 2
+FAILING_BATCH = 3
+
+
+class FailingVectorClient(InMemoryVectorClient):
+    # Stores its part of the failing batch before raising, like a database
+    # that dies halfway through an insert
+    def __init__(self, fail_on_insert: int = 0):
+        super().__init__()
+        self.inserts = 0
+        self.fail_on_insert = fail_on_insert
+
+    def insert(self, collection_name, items):
+        self.inserts += 1
+        if self.inserts == self.fail_on_insert:
+            super().insert(collection_name, items[:1])
+            raise RuntimeError("insert failed")
+        super().insert(collection_name, items)
+
+
+@pytest.fixture
+def docs():
+    # Unique texts so no embedding comes from the chunk embedding cache
+    return [
+        Document(page_content=f"chunk {i} of file {uuid.uuid4().hex}")
+        for i in range(BATCH_SIZE * FAILING_BATCH + 1)
+    ]
+
+
+def use_vector_db(monkeypatch, tmp_path, vector_client, fail_on_embed=0):
+    client = BM25IndexedClient(vector_client, BM25Index(str(tmp_path)))
+    monkeypatch.setattr(retrieval, "VECTOR_DB_CLIENT", client)
+    monkeypatch.setattr(retrieval, "EMBEDDING_BATCH_SIZE", BATCH_SIZE)
+
+    calls = []
+
+    def embedding_function(texts):
+        calls.append(texts)
+        if len(calls) == fail_on_embed:
+            raise RuntimeError("embedding failed")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    monkeypatch.setattr(
+        retrieval, "get_embedding_function", lambda *args: embedding_function
+    )
+    return client
+
+
+def assert_nothing_saved(client, collection_name):
+    assert client.client.collections.get(collection_name, {}) == {}
+    result = client.keyword_search(collection_name, "chunk file", limit=100)
+    assert result is None or result.ids == [[]]
+
+
+class TestSaveDocsToVectorDB:
+    def test_saves_all_batches(self, monkeypatch, tmp_path, docs):
+        client = use_vector_db(monkeypatch, tmp_path, InMemoryVectorClient())
+
+        assert retrieval.save_docs_to_vector_db(
+            docs, "file-1", metadata={"file_id": "1"}, split=False
+        )
+
+        assert len(client.client.collections["file-1"]) == len(docs)
+        result = client.keyword_search("file-1", "chunk file", limit=100)
+        assert len(result.ids[0]) == len(docs)
+
+    def test_rollback_when_a_batch_fails_to_embed(self, monkeypatch, tmp_path, docs):
+        client = use_vector_db(
+            monkeypatch, tmp_path, InMemoryVectorClient(), fail_on_embed=FAILING_BATCH
+        )
+
+        assert not retrieval.save_docs_to_vector_db(
+            docs, "file-1", metadata={"file_id": "1"}, split=False
+        )
+
+        assert_nothing_saved(client, "file-1")
+
+    def test_rollback_when_a_batch_fails_to_insert(self, monkeypatch, tmp_path, docs):
+        client = use_vector_db(
+            monkeypatch, tmp_path, FailingVectorClient(fail_on_insert=FAILING_BATCH)
+        )
+
+        assert not retrieval.save_docs_to_vector_db(
+            docs, "file-1", metadata={"file_id": "1"}, split=False
+        )
+
+        assert_nothing_saved(client, "file-1")
+
+    def test_rollback_keeps_other_files(self, monkeypatch, tmp_path, docs):
+        client = use_vector_db(
+            monkeypatch, tmp_path, FailingVectorClient(fail_on_insert=FAILING_BATCH + 1)
+        )
+        assert retrieval.save_docs_to_vector_db(
+            docs[:BATCH_SIZE], "knowledge", metadata={"file_id": "1"}, split=False
+        )
+
+        assert not retrieval.save_docs_to_vector_db(
+            docs[BATCH_SIZE:],
+            "knowledge",
+            metadata={"file_id": "2"},
+            split=False,
+            add=True,
+        )
+
+        remaining = client.client.collections["knowledge"].values()
+        assert [item["metadata"]["file_id"] for item in remaining] == ["1"] * BATCH_SIZE
+        result = client.keyword_search("knowledge", "chunk file", limit=100)
+        assert sorted(result.ids[0]) == sorted(
+            item["id"] for item in client.client.collections["knowledge"].values()
+        )
+
+
+class TestStreamedContent:
+    def test_matches_the_joined_text(self, docs):
+        streamed = retrieval.StreamedContent()
+
+        assert list(streamed.collect(iter(docs))) == docs
+
+        text = " ".join(doc.page_content for doc in docs)
+        assert streamed.text == text
+        assert streamed.hexdigest() == retrieval.calculate_sha256_string(text)
@@ -0,0 +1,50 @@
+from open_webui.apps.retrieval.vector.main import GetResult
+
+
+class InMemoryVectorClient:
+    def __init__(self):
+        self.collections = {}
+
+    def has_collection(self, collection_name):
+        return collection_name in self.collections
+
+    def insert(self, collection_name, items):
+        collection = self.collections.setdefault(collection_name, {})
+        for item in items:
+            collection[item["id"]] = item
+
+    upsert = insert
+
+    def get(self, collection_name):
+        collection = self.collections.get(collection_name, {})
+        return GetResult(
+            ids=[list(collection)],
+            documents=[[item["text"] for item in collection.values()]],
+            metadatas=[[item["metadata"] for item in collection.values()]],
+        )
+
+    def query(self, collection_name, filter, limit=None):
+        collection = self.collections.get(collection_name, {})
+        matches = [
+            item
+            for item in collection.values()
+            if all(item["metadata"].get(key) == value for key, value in filter.items())
+        ]
+        return GetResult(
+            ids=[[item["id"] for item in matches]],
+            documents=[[item["text"] for item in matches]],
+            metadatas=[[item["metadata"] for item in matches]],
+        )
+
+    def delete(self, collection_name, ids=None, filter=None):
+        collection = self.collections.get(collection_name, {})
+        if filter:
+            ids = self.query(collection_name, filter).ids[0]
+        for id in ids or []:
+            collection.pop(id, None)
+
+    def delete_collection(self, collection_name):
+        self.collections.pop(collection_name, None)
+
+    def reset(self):
+        self.collections.clear()
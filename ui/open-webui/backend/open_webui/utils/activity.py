@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import threading
+import time
+
+from open_webui.apps.webui.models.users import Users
+from open_webui.env import SRC_LOG_LEVELS, USER_ACTIVITY_FLUSH_INTERVAL
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class UserActivityTracker:
+    """
+    Coalesces the last_active_at updates of authenticated users in memory and
+    writes them in a single bulk UPDATE every ``interval`` seconds, instead of
+    one write per authenticated request.
+    """
+
+    def __init__(self, interval: float = 10):
+        self.interval = interval
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id: str):
+        if self.interval <= 0:
+            Users.update_user_last_active_by_id(user_id)
+            return
+
+        with self._lock:
+            self._pending[user_id] = int(time.time())
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        if not Users.update_users_last_active(pending):
+            log.warning(f"Could not update last_active_at of {len(pending)} users")
+            with self._lock:
+                # Retry on the next flush unless the users were active since
+                for user_id, last_active_at in pending.items():
+                    self._pending.setdefault(user_id, last_active_at)
+
+    async def run(self):
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                log.exception(f"Flushing user activity failed: {e}")
+
+
+USER_ACTIVITY = UserActivityTracker(interval=USER_ACTIVITY_FLUSH_INTERVAL)
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+from open_webui.env import AUTH_USER_CACHE_TTL
+
+
+class AuthUserCache:
+    """
+    Short-lived cache of the user a token (JWT or API key) authenticates, so
+    the several authentications of a single chat turn do not each read the
+    user from the database.
+
+    Entries of a user are dropped as soon as it is updated or deleted through
+    Users; other workers see the change once their entries expire.
+    """
+
+    def __init__(self, ttl: float = 5, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[token]
+                return None
+            return user
+
+    def set(self, token: str, user):
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for token, (_, user) in list(self._entries.items()):
+                if user.id == user_id:
+                    del self._entries[token]
+
+
+AUTH_USER_CACHE = AuthUserCache(ttl=AUTH_USER_CACHE_TTL)
@@ -0,0 +1,76 @@
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_LIMIT_PER_HOST,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class ClientSessionPool:
+    """
+    One aiohttp.ClientSession per upstream origin, kept open for the lifetime
+    of the app so keep-alive connections are reused across requests.
+
+    Sessions are created lazily on first use (inside the running event loop)
+    and closed by ``close()`` on shutdown. Timeouts are per request, pass them
+    to ``session.get/post/request``.
+    """
+
+    def __init__(
+        self,
+        limit_per_host: int = 100,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: Optional[int] = 300,
+    ):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+
+    def get(self, url: str) -> aiohttp.ClientSession:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            session = aiohttp.ClientSession(connector=connector, trust_env=True)
+            self._sessions[origin] = session
+            log.debug(f"opened client session for {origin}")
+        return session
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        for origin, session in sessions.items():
+            try:
+                await session.close()
+            except Exception as e:
+                log.warning(f"Error closing client session for {origin}: {e}")
+
+
+HTTP_SESSIONS = ClientSessionPool(
+    limit_per_host=AIOHTTP_CLIENT_LIMIT_PER_HOST,
+    keepalive_timeout=AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=AIOHTTP_CLIENT_DNS_CACHE_TTL,
+)
+
+
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # Hands the connection back to the pool, or drops it if the body was not
+    # fully read (e.g. the client went away mid-stream)
+    if response:
+        response.release()
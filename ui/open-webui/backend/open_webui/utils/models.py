@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class ModelRegistry:
+    """
+    TTL cache of the models offered by every backend.
+
+    ``sources`` map a backend name to a coroutine listing its models; each one
+    is fetched on its own, and a backend that fails or times out keeps serving
+    the models it listed last. ``build`` turns the lists of every backend, in
+    ``sources`` order, into the final model list.
+
+    Expired models are served while they are refreshed in the background, so
+    only the first request and requests right after ``invalidate()`` wait on
+    the backends.
+    """
+
+    def __init__(
+        self,
+        sources: dict[str, Callable[[], Awaitable[list]]],
+        build: Callable[[list[list]], list],
+        ttl: float = 30,
+        timeout: float = 10,
+    ):
+        self.sources = sources
+        self.build = build
+        self.ttl = ttl
+        self.timeout = timeout
+
+        self.models: Optional[list] = None
+        self.expires_at = 0.0
+        self._source_models: dict[str, list] = {}
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _fetch(self, name: str, source: Callable[[], Awaitable[list]]):
+        try:
+            self._source_models[name] = await asyncio.wait_for(source(), self.timeout)
+        except Exception as e:
+            stale = self._source_models.get(name, [])
+            log.warning(
+                f"Could not list {name} models, serving {len(stale)} cached: {e!r}"
+            )
+
+    async def refresh(self, force: bool = True) -> list:
+        async with self._lock:
+            if not force and self.models is not None and not self._expired():
+                # Refreshed while this request was waiting for the lock
+                return self.models
+
+            version = self._version
+            await asyncio.gather(
+                *[self._fetch(name, source) for name, source in self.sources.items()]
+            )
+            self.models = self.build(
+                [self._source_models.get(name, []) for name in self.sources]
+            )
+
+            # Keep the cache expired if it was invalidated during the refresh
+            if version == self._version:
+                self.expires_at = time.monotonic() + self.ttl
+            return self.models
+
+    def _expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    async def get(self) -> list:
+        if self.models is None or self.expires_at == 0 or self.ttl <= 0:
+            return await self.refresh(force=False)
+
+        if self._expired() and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self.refresh(force=False))
+        return self.models
+
+    def invalidate(self):
+        # The next get() waits for fresh models, e.g. after a model was added
+        self._version += 1
+        self.expires_at = 0
+
+    async def run(self):
+        # Refresh in the background so requests rarely find the cache expired
+        while self.ttl > 0:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.exception(f"Model registry refresh failed: {e}")
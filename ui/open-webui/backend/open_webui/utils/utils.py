@@ -7,6 +7,8 @@ import jwt
 from open_webui.apps.webui.models.users import Users
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import WEBUI_SECRET_KEY
+from open_webui.utils.activity import USER_ACTIVITY
+from open_webui.utils.auth_cache import AUTH_USER_CACHE
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
@@ -93,14 +95,17 @@ def get_current_user(
     # auth by jwt token
     data = decode_token(token)
     if data is not None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = AUTH_USER_CACHE.get(token)
         if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=ERROR_MESSAGES.INVALID_TOKEN,
-            )
-        else:
-            Users.update_user_last_active_by_id(user.id)
+            user = Users.get_user_by_id(data["id"])
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail=ERROR_MESSAGES.INVALID_TOKEN,
+                )
+            AUTH_USER_CACHE.set(token, user)
+
+        USER_ACTIVITY.touch(user.id)
         return user
     else:
         raise HTTPException(
@@ -110,15 +115,17 @@ def get_current_user(
 
 
 def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
-
+    user = AUTH_USER_CACHE.get(api_key)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=ERROR_MESSAGES.INVALID_TOKEN,
-        )
-    else:
-        Users.update_user_last_active_by_id(user.id)
+        user = Users.get_user_by_api_key(api_key)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=ERROR_MESSAGES.INVALID_TOKEN,
+            )
+        AUTH_USER_CACHE.set(api_key, user)
+
+    USER_ACTIVITY.touch(user.id)
 
     return user
 